@@ -0,0 +1,103 @@
+"""
+Embeddings-per-second benchmark for the OmniLog embedding backends.
+
+Builds a synthetic OmniLog-like corpus in which a share of documents repeat
+(the same git_status or help output logged turn after turn) and times:
+
+  * Chroma's default embedding function, called per document as add_entry used to
+  * each available Embedder, batched, without a cache
+  * each Embedder behind the on-disk EmbeddingCache, cold and warm
+
+Usage:
+    python benchmarks/bench_embeddings.py [--docs 2000] [--repeat-ratio 0.5]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.embedding import (
+    EmbeddingCache,
+    CachedEmbeddingFunction,
+    OnnxMiniLMEmbedder,
+    SentenceTransformerEmbedder,
+)
+
+REPEATED_OUTPUTS = [
+    "On branch main\nYour branch is up to date with 'origin/main'.\nnothing to commit, working tree clean",
+    "Available commands: cat_file, git_status, git_diff, search, help, get_project_files, run_python_file",
+    "Function 'get_project_files' called with arguments: directory=.",
+]
+
+def build_corpus(size, repeat_ratio, seed=7):
+    rng = random.Random(seed)
+    words = "file function error commit branch query result module class token cache index".split()
+    corpus = []
+    for i in range(size):
+        if rng.random() < repeat_ratio:
+            corpus.append(rng.choice(REPEATED_OUTPUTS))
+        else:
+            corpus.append(f"entry {i}: " + " ".join(rng.choice(words) for _ in range(40)))
+    return corpus
+
+def rate(count, seconds):
+    return count / seconds if seconds > 0 else float('inf')
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def bench_chroma_default(corpus):
+    from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+    default_fn = DefaultEmbeddingFunction()
+    # add_entry used to embed one document per call
+    return time_call(lambda: [default_fn([doc]) for doc in corpus])
+
+def bench_embedder(label, embedder, corpus, batch_size):
+    results = []
+
+    def batched(fn):
+        for start in range(0, len(corpus), batch_size):
+            fn(corpus[start:start + batch_size])
+
+    results.append((f"{label} (batched, no cache)", time_call(batched, embedder.embed)))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = EmbeddingCache(cache_dir)
+        cached_fn = CachedEmbeddingFunction(embedder, cache)
+        results.append((f"{label} (batched, cold cache)", time_call(batched, cached_fn)))
+        results.append((f"{label} (batched, warm cache)", time_call(batched, cached_fn)))
+        cache.close()
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--repeat-ratio", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.docs, args.repeat_ratio)
+    results = [("chroma default (per document)", bench_chroma_default(corpus))]
+
+    results.extend(bench_embedder("onnx MiniLM", OnnxMiniLMEmbedder(), corpus, args.batch_size))
+
+    try:
+        results.extend(bench_embedder("sentence_transformers int8", SentenceTransformerEmbedder(quantize=True), corpus, args.batch_size))
+    except ImportError as e:
+        print(f"Skipping sentence_transformers: {e}")
+
+    baseline = results[0][1]
+    print(f"{len(corpus)} documents, {args.repeat_ratio:.0%} repeated")
+    print(f"{'backend':<45} {'seconds':>9} {'emb/s':>10} {'speedup':>8}")
+    for label, seconds in results:
+        print(f"{label:<45} {seconds:>9.2f} {rate(len(corpus), seconds):>10.1f} {baseline / seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
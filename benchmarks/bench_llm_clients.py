@@ -0,0 +1,109 @@
+"""
+Per-call latency of fresh versus pooled LLM provider clients.
+
+Starts the local stub server (benchmarks/stub_llm_server.py) and makes the
+same sequential chat calls two ways for each provider:
+
+  * fresh: a new AsyncOpenAI / AsyncAnthropic client or aiohttp session per
+    call, as llm_wrapper used to do
+  * pooled: the long-lived clients from lib.llm_clients.client_pool
+
+Over plain HTTP on localhost the difference is TCP setup and client
+construction only. Pass --certfile/--keyfile (a self-signed pair, trusted via
+SSL_CERT_FILE=cert.pem) to include TLS handshakes, and --latency-ms to
+simulate server think time.
+
+Usage:
+    python benchmarks/bench_llm_clients.py [--calls 200] [--latency-ms 0]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+from openai import AsyncOpenAI
+from anthropic import AsyncAnthropic
+
+from lib.llm_clients import client_pool, close_clients
+from benchmarks.stub_llm_server import start_stub, load_ssl_context
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+async def openai_call(client):
+    await client.chat.completions.create(model="stub", messages=MESSAGES)
+
+async def anthropic_call(client):
+    await client.messages.create(model="stub", messages=MESSAGES, max_tokens=16)
+
+def ollama_call(endpoint):
+    async def call(session):
+        async with session.post(f"{endpoint}/api/chat", json={"model": "stub", "messages": MESSAGES, "stream": False}) as response:
+            await response.json()
+    return call
+
+async def timed(calls, make_client, call, pooled):
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        client = make_client()
+        await call(client)
+        if not pooled:
+            await client.close()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+async def run(args):
+    ssl_context = load_ssl_context(args.certfile, args.keyfile)
+    runner, base_url = await start_stub(latency=args.latency_ms / 1000, ssl_context=ssl_context)
+    providers = [
+        ("openai",
+         lambda: AsyncOpenAI(api_key="stub", base_url=f"{base_url}/v1"),
+         lambda: client_pool.openai("stub", f"{base_url}/v1"),
+         openai_call),
+        ("anthropic",
+         lambda: AsyncAnthropic(api_key="stub", base_url=base_url),
+         lambda: client_pool.anthropic("stub", base_url),
+         anthropic_call),
+        ("ollama",
+         lambda: aiohttp.ClientSession(),
+         lambda: client_pool.ollama(base_url),
+         ollama_call(base_url)),
+    ]
+
+    print(f"{args.calls} sequential calls per mode against {base_url}")
+    print(f"{'provider':<10} {'mode':<7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    try:
+        for name, fresh, pooled, call in providers:
+            # Warm up imports and the pooled connection before timing
+            await call(pooled())
+            results = {
+                "fresh": await timed(args.calls, fresh, call, pooled=False),
+                "pooled": await timed(args.calls, pooled, call, pooled=True),
+            }
+            for mode, stats in results.items():
+                print(f"{name:<10} {mode:<7} {stats['mean_ms']:>9.2f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f}")
+            saved = results["fresh"]["mean_ms"] - results["pooled"]["mean_ms"]
+            print(f"{name:<10} saved   {saved:>9.2f} ms per call")
+    finally:
+        await close_clients()
+        await runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
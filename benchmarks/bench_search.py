@@ -0,0 +1,101 @@
+"""
+Recall and latency benchmark for OmniLog search on a synthetic log corpus.
+
+Each synthetic tool output mentions one unique identifier (a file name,
+function name or error code) inside generic log text. Queries ask for the
+identifier, optionally with some surrounding words. The entry holding the
+identifier is the single relevant result, so recall@k is the share of
+queries whose target appears in the top k.
+
+Runs the same queries with lexical_weight 0 (vector only), 1 (lexical only)
+and the hybrid weights given on the command line.
+
+Usage:
+    python benchmarks/bench_search.py [--entries 2000] [--queries 200] [--top-k 5]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.omnilog import OmniLogVectorStore
+
+FILLER = (
+    "running command output processed successfully warning retry connection module "
+    "loaded request finished cache miss handler worker queue status updated"
+).split()
+
+def make_identifier(rng, i):
+    kind = i % 3
+    if kind == 0:
+        return f"{rng.choice(['parse', 'load', 'render', 'sync'])}_{rng.choice(['config', 'index', 'token', 'session'])}_{i}"
+    if kind == 1:
+        return f"module_{i}.py"
+    return f"E{1000 + i}"
+
+def build_store(path, entries, seed=11):
+    rng = random.Random(seed)
+    store = OmniLogVectorStore(path, write_behind=True, flush_batch_size=256)
+    start = datetime(2024, 1, 1)
+    targets = []
+    for i in range(entries):
+        identifier = make_identifier(rng, i)
+        text = " ".join(rng.choice(FILLER) for _ in range(30))
+        position = rng.randrange(len(text.split()))
+        words = text.split()
+        words.insert(position, identifier)
+        entry_id = store.add_entry({
+            "content": " ".join(words),
+            "type": "tool_call",
+            "timestamp": (start + timedelta(seconds=i)).isoformat()
+        })
+        targets.append((identifier, entry_id))
+    store.flush()
+    return store, targets
+
+def run(store, queries, top_k, weight):
+    found = 0
+    latencies = []
+    for query, target_id in queries:
+        started = time.perf_counter()
+        results = store.search_entries_with_context(query, top_k=top_k, lexical_weight=weight)
+        latencies.append(time.perf_counter() - started)
+        result_timestamps = {entry["timestamp"] for entry, _ in results}
+        if target_id in result_timestamps:
+            found += 1
+    latencies.sort()
+    return {
+        "recall": found / len(queries),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--weights", type=float, nargs="*", default=[0.3, 0.5, 0.7])
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as path:
+        store, targets = build_store(path, args.entries)
+        sample = rng.sample(targets, min(args.queries, len(targets)))
+        # Entry ids default to the timestamp, which the results carry
+        queries = [(f"where did {identifier} fail", entry_id) for identifier, entry_id in sample]
+
+        print(f"{args.entries} entries, {len(queries)} queries, recall@{args.top_k}")
+        print(f"{'mode':<24} {'recall':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for label, weight in [("vector only", 0.0), ("lexical only", 1.0)] + [(f"hybrid w={w}", w) for w in args.weights]:
+            stats = run(store, queries, args.top_k, weight)
+            print(f"{label:<24} {stats['recall']:>8.2%} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f}")
+        store.close()
+
+if __name__ == "__main__":
+    main()
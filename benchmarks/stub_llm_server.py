@@ -0,0 +1,240 @@
+"""
+Local stand-in for the OpenAI, Anthropic and Ollama chat endpoints.
+
+Answers /v1/chat/completions, /v1/messages and /api/chat with a fixed,
+correctly shaped completion after an optional delay, so client-side costs
+(connection setup, request building, response parsing) can be measured
+without network noise or API spend. Requests with "stream": true get the
+reply word by word as SSE (OpenAI, Anthropic) or NDJSON (Ollama), with
+--token-ms between words. Anthropic requests carrying cache_control
+breakpoints report their tools + system prefix as a cache write the first
+time and a cache read after that. Ollama requests sent with tools get a
+call to the first tool in reply to a user turn.
+
+Faults can be injected to exercise retries and the circuit breaker:
+--fail-rate answers that share of requests with --fail-status (and an
+optional Retry-After header), and tests can queue exact faults on
+app[FAULTS] as (status, retry_after) pairs served before normal replies.
+
+Usage:
+    python benchmarks/stub_llm_server.py [--port 8765] [--latency-ms 0] [--token-ms 0]
+        [--fail-rate 0.2 --fail-status 529 --retry-after 1]
+        [--certfile cert.pem --keyfile key.pem]
+
+Point webwright at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1,
+ANTHROPIC_BASE_URL=http://127.0.0.1:8765 or OLLAMA_API_ENDPOINT=http://127.0.0.1:8765.
+"""
+import ssl
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import deque
+
+from aiohttp import web
+
+REPLY = "Stub reply from the local test server."
+
+def openai_completion(body):
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": REPLY},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 8, "total_tokens": 18}
+    }
+
+# Prompt prefixes seen with cache_control breakpoints, to mimic Anthropic prompt caching
+_prompt_cache = set()
+
+def estimate_tokens(value):
+    return len(json.dumps(value)) // 4
+
+def anthropic_usage(body):
+    """
+    Reports the tools + system prefix as a cache write the first time it is
+    seen with cache_control breakpoints and as a cache read afterwards.
+    """
+    prefix = [body.get("tools"), body.get("system")]
+    usage = {"input_tokens": estimate_tokens(body.get("messages")), "output_tokens": 8,
+             "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+    if "cache_control" not in json.dumps(prefix):
+        usage["input_tokens"] += estimate_tokens(prefix)
+        return usage
+    key = json.dumps(prefix, sort_keys=True)
+    if key in _prompt_cache:
+        usage["cache_read_input_tokens"] = estimate_tokens(prefix)
+    else:
+        _prompt_cache.add(key)
+        usage["cache_creation_input_tokens"] = estimate_tokens(prefix)
+    return usage
+
+def anthropic_message(body):
+    return {
+        "id": "msg_stub",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "stub"),
+        "content": [{"type": "text", "text": REPLY}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": anthropic_usage(body)
+    }
+
+def ollama_tool_calls(body):
+    """
+    Ollama answers a user turn sent with tools by calling the first tool,
+    so the tool-calling round trip can be exercised without a model.
+    """
+    messages = body.get("messages") or []
+    if not body.get("tools") or not messages or messages[-1].get("role") != "user":
+        return []
+    return [{"function": {"name": body["tools"][0]["function"]["name"], "arguments": {}}}]
+
+def ollama_counts(body):
+    return {"prompt_eval_count": estimate_tokens(body.get("messages")), "eval_count": len(REPLY.split(" ")), "load_duration": 0}
+
+def ollama_chat(body):
+    tool_calls = ollama_tool_calls(body)
+    message = {"role": "assistant", "content": "" if tool_calls else REPLY}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return {
+        "model": body.get("model", "stub"),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "message": message,
+        "done": True,
+        **ollama_counts(body)
+    }
+
+def reply_words():
+    words = REPLY.split(" ")
+    return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+def openai_events(body):
+    for word in reply_words():
+        yield {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+               "model": body.get("model", "stub"),
+               "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+    yield {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+           "model": body.get("model", "stub"),
+           "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+
+def anthropic_events(body):
+    message = anthropic_message(body)
+    message.update({"content": [], "stop_reason": None})
+    yield {"type": "message_start", "message": message}
+    yield {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+    for word in reply_words():
+        yield {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": word}}
+    yield {"type": "content_block_stop", "index": 0}
+    yield {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": 8}}
+    yield {"type": "message_stop"}
+
+def ollama_events(body):
+    tool_calls = ollama_tool_calls(body)
+    if tool_calls:
+        yield {"model": body.get("model", "stub"), "message": {"role": "assistant", "content": "", "tool_calls": tool_calls}, "done": False}
+    else:
+        for word in reply_words():
+            yield {"model": body.get("model", "stub"), "message": {"role": "assistant", "content": word}, "done": False}
+    yield {"model": body.get("model", "stub"), "message": {"role": "assistant", "content": ""}, "done": True, **ollama_counts(body)}
+
+async def stream_response(request, events, token_delay, ndjson=False):
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson" if ndjson else "text/event-stream"})
+    await response.prepare(request)
+    for event in events:
+        if ndjson:
+            await response.write((json.dumps(event) + "\n").encode())
+        else:
+            name = f"event: {event['type']}\n" if "type" in event else ""
+            await response.write(f"{name}data: {json.dumps(event)}\n\n".encode())
+        if token_delay:
+            await asyncio.sleep(token_delay)
+    if not ndjson and "type" not in event:
+        await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
+
+def fault_response(status, retry_after=None):
+    headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+    body = {"type": "error", "error": {"type": "stub_error", "message": f"Injected fault {status}"}}
+    return web.json_response(body, status=status, headers=headers)
+
+# Typed application keys; tests read request counts from STATS and queue faults on FAULTS
+STATS = web.AppKey("stats", dict)
+FAULTS = web.AppKey("faults", deque)
+
+def make_app(latency: float = 0.0, token_delay: float = 0.0, fail_rate: float = 0.0,
+             fail_status: int = 529, retry_after=None) -> web.Application:
+    app = web.Application()
+    app[STATS] = {"requests": 0, "faults": 0}
+    app[FAULTS] = deque()
+
+    def handler(build, events, ndjson=False):
+        async def handle(request):
+            body = await request.json()
+            app[STATS]["requests"] += 1
+            if app[FAULTS]:
+                app[STATS]["faults"] += 1
+                return fault_response(*app[FAULTS].popleft())
+            if fail_rate and random.random() < fail_rate:
+                app[STATS]["faults"] += 1
+                return fault_response(fail_status, retry_after)
+            if latency:
+                await asyncio.sleep(latency)
+            if body.get("stream"):
+                return await stream_response(request, events(body), token_delay, ndjson)
+            return web.json_response(build(body))
+        return handle
+
+    app.router.add_post("/v1/chat/completions", handler(openai_completion, openai_events))
+    app.router.add_post("/v1/messages", handler(anthropic_message, anthropic_events))
+    app.router.add_post("/api/chat", handler(ollama_chat, ollama_events, ndjson=True))
+    return app
+
+async def start_stub(host="127.0.0.1", port=0, latency=0.0, ssl_context=None, token_delay=0.0, **faults):
+    """
+    Starts the stub on the running loop and returns (runner, base_url).
+    Port 0 picks a free port; runner.app gives access to stats and faults.
+    """
+    runner = web.AppRunner(make_app(latency, token_delay, **faults))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port, ssl_context=ssl_context)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    scheme = "https" if ssl_context else "http"
+    return runner, f"{scheme}://{host}:{bound_port}"
+
+def load_ssl_context(certfile, keyfile):
+    if not certfile:
+        return None
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(certfile, keyfile)
+    return context
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--token-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=529)
+    parser.add_argument("--retry-after", type=float)
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args()
+
+    ssl_context = load_ssl_context(args.certfile, args.keyfile)
+    app = make_app(args.latency_ms / 1000, args.token_ms / 1000, args.fail_rate, args.fail_status, args.retry_after)
+    web.run_app(app, host=args.host, port=args.port, ssl_context=ssl_context)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from prompt_toolkit.formatted_text import FormattedText
+
+from lib.util import get_logger
+
+logger = get_logger()
+
+DEFAULT_MAX_STEPS = 8
+DEFAULT_MAX_SECONDS = 300.0
+DEFAULT_TOKEN_BUDGET = 200000
+
+class AgentBudget:
+    """
+    Limits for one user turn of the agent loop: model steps, wall-clock
+    seconds and tokens (input plus output, summed over every step).
+    """
+
+    def __init__(self, max_steps: int = DEFAULT_MAX_STEPS, max_seconds: float = DEFAULT_MAX_SECONDS,
+                 max_tokens: int = DEFAULT_TOKEN_BUDGET):
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+
+    @classmethod
+    def from_config(cls, config=None) -> 'AgentBudget':
+        """
+        Reads AGENT_MAX_STEPS, AGENT_MAX_SECONDS and AGENT_TOKEN_BUDGET from
+        the [config] section. AGENT_MAX_STEPS = 1 restores a single
+        model -> tools -> summary hop.
+        """
+        budget = cls()
+        if config is not None:
+            for attribute, key, cast in (('max_steps', 'AGENT_MAX_STEPS', int),
+                                         ('max_seconds', 'AGENT_MAX_SECONDS', float),
+                                         ('max_tokens', 'AGENT_TOKEN_BUDGET', int)):
+                value = config.get_config_value("config", key)
+                if value:
+                    setattr(budget, attribute, cast(value))
+        budget.max_steps = max(budget.max_steps, 1)
+        return budget
+
+class StepTrace:
+    """
+    Timing and token use of one model call and the tools it asked for.
+    """
+
+    def __init__(self, number: int):
+        self.number = number
+        self.llm_seconds = 0.0
+        self.tool_seconds = 0.0
+        self.tools: List[str] = []
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def record_llm(self, seconds: float, usage: Optional[Dict[str, int]]):
+        self.llm_seconds += seconds
+        self.input_tokens += (usage or {}).get("input_tokens", 0) or 0
+        self.output_tokens += (usage or {}).get("output_tokens", 0) or 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "step": self.number,
+            "llm_seconds": round(self.llm_seconds, 3),
+            "tool_seconds": round(self.tool_seconds, 3),
+            "tools": self.tools,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+    def describe(self) -> str:
+        tools = f", tools {self.tool_seconds:.2f}s ({', '.join(self.tools)})" if self.tools else ""
+        return f"step {self.number}: model {self.llm_seconds:.2f}s{tools}, {self.input_tokens + self.output_tokens} tokens"
+
+def call_signature(function_calls: List[Dict[str, Any]]) -> tuple:
+    return tuple((call["name"], json.dumps(call.get("arguments"), sort_keys=True, default=str)) for call in function_calls)
+
+class AgentTrace:
+    """
+    Steps of one agent turn, checked against its budget between steps.
+    """
+
+    def __init__(self, budget: AgentBudget):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.steps: List[StepTrace] = []
+        self.stop_reason: Optional[str] = None
+        self._last_calls: Optional[tuple] = None
+
+    @property
+    def tokens(self) -> int:
+        return sum(step.input_tokens + step.output_tokens for step in self.steps)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def begin_step(self) -> StepTrace:
+        step = StepTrace(len(self.steps) + 1)
+        self.steps.append(step)
+        return step
+
+    def check(self, function_calls: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Called after a step's tools have run. Returns why the loop should
+        stop instead of sending the results back for another step, if it should.
+        """
+        signature = call_signature(function_calls)
+        repeated = signature == self._last_calls
+        self._last_calls = signature
+
+        if repeated:
+            self.stop_reason = "the same tool calls were repeated"
+        elif len(self.steps) >= self.budget.max_steps:
+            self.stop_reason = f"the {self.budget.max_steps} step limit was reached"
+        elif self.elapsed() >= self.budget.max_seconds:
+            self.stop_reason = f"the {self.budget.max_seconds:.0f}s time limit was reached"
+        elif self.tokens >= self.budget.max_tokens:
+            self.stop_reason = f"the {self.budget.max_tokens} token budget was used"
+        return self.stop_reason
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "seconds": round(self.elapsed(), 3),
+            "tokens": self.tokens,
+            "stop_reason": self.stop_reason,
+            "steps": [step.to_dict() for step in self.steps],
+        }
+
+    def log(self):
+        for step in self.steps:
+            logger.info(f"Agent {step.describe()}")
+        logger.info(f"Agent turn: {len(self.steps)} steps in {self.elapsed():.2f}s, {self.tokens} tokens"
+                    + (f"; stopped because {self.stop_reason}" if self.stop_reason else ""))
+
+    def render(self) -> FormattedText:
+        lines = [('class:instruction', f"  {step.describe()}\n") for step in self.steps]
+        lines.append(('class:instruction', f"  {len(self.steps)} steps in {self.elapsed():.2f}s, {self.tokens} tokens\n"))
+        return FormattedText(lines)
@@ -1,5 +1,6 @@
 import json
 import os
+import time
 import asyncio
 
 from halo import Halo
@@ -7,6 +8,8 @@ from datetime import datetime
 
 from lib.util import get_logger
 from lib.util import setup_function_logging
+from lib.util import StreamRenderer
+from lib.util import custom_style
 
 # Import helper functions and decorators
 from lib.function_wrapper import tools, callable_registry
@@ -16,6 +19,11 @@ from prompt_toolkit import print_formatted_text
 
 from lib.llm import llm_wrapper
 from lib.omnilog import OmniLogVectorStore
+from lib.context_builder import ContextBuilder
+from lib.tool_scheduler import ToolScheduler
+from lib.agent_loop import AgentBudget, AgentTrace
+from lib.spill_store import get_spill_store
+from lib.tool_executor import get_tool_executor
 
 import traceback
 import inspect
@@ -39,6 +47,7 @@ async def execute_function_by_name(function_name, f_llm, olog_history, **kwargs)
         func_logger = setup_function_logging(function_name)
         func_logger.info(f"Function {function_name} called with arguments: {kwargs}")
         function_to_call = callable_registry[function_name]
+        spill_store = get_spill_store(getattr(f_llm, 'config', None))
         
         # Check if the function accepts 'olog' as a parameter
         function_params = inspect.signature(function_to_call).parameters
@@ -48,7 +57,11 @@ async def execute_function_by_name(function_name, f_llm, olog_history, **kwargs)
         if 'llm' in function_params:
             kwargs['llm'] = f_llm
 
-        if asyncio.iscoroutinefunction(function_to_call):
+        executor = get_tool_executor(getattr(f_llm, 'config', None))
+        if not executor.in_process(function_name):
+            # Sync tools run in a worker process that can be timed out or cancelled
+            result = await executor.run(function_name, kwargs)
+        elif asyncio.iscoroutinefunction(function_to_call):
             # If it's a coroutine function, await it
             result = await function_to_call(**kwargs)
         else:
@@ -56,12 +69,34 @@ async def execute_function_by_name(function_name, f_llm, olog_history, **kwargs)
             result = await asyncio.to_thread(function_to_call, **kwargs)
         
         func_logger.info(f"Function {function_name} executed successfully with result: {result}")
-        return json.dumps(result) if not isinstance(result, str) else result
+        result = json.dumps(result) if not isinstance(result, str) else result
     
     except Exception as e:
         func_logger.error(f"Function {function_name} failed with error: {e}")
         return json.dumps({"error": str(e)})
 
+    # Oversized results go to disk; the transcript gets a handle and a preview.
+    # The tool has already succeeded, so a full disk only costs the middle
+    try:
+        return spill_store.spill(function_name, result)
+    except OSError as e:
+        logger.warning(f"Could not spill {function_name} result: {e}")
+        return spill_store.truncate(result)
+
+def tool_progress_line(function_name, result, seconds):
+    """
+    One line reporting a finished tool, built without calling the LLM.
+    """
+    try:
+        parsed = json.loads(result)
+    except (json.JSONDecodeError, TypeError):
+        parsed = None
+    error = parsed.get("error") if isinstance(parsed, dict) else None
+    if error:
+        return FormattedText([('class:error', f"  {function_name} failed after {seconds:.1f}s: {error}")])
+    size = len(result) if isinstance(result, str) else 0
+    return FormattedText([('class:success', f"  {function_name} done in {seconds:.1f}s ({size:,} chars)")])
+
 def function_calls_to_text(function_calls):
     text_descriptions = []
     for call in function_calls:
@@ -71,28 +106,82 @@ def function_calls_to_text(function_calls):
 
 async def ai(username="anonymous", config=None, olog: OmniLogVectorStore = None):
     llm = llm_wrapper(config=config)
+    context = ContextBuilder(olog, config=config)
+
+    # Streaming is on unless STREAM_RESPONSES = false in the config
+    streaming = (config.get_config_value("config", "STREAM_RESPONSES") or "true").lower() != "false"
+
+    # TOOL_PROGRESS = false hides the line printed as each tool finishes;
+    # AGENT_TRACE = true prints each step's timing at the end of a turn
+    show_progress = (config.get_config_value("config", "TOOL_PROGRESS") or "true").lower() != "false"
+    show_trace = (config.get_config_value("config", "AGENT_TRACE") or "false").lower() == "true"
 
     async def call_llm_with_spinner(messages, system_prompt=None, use_tools=True):
         spinner = Halo(text='Calling LLM...', spinner='dots')
         spinner.start()
+        # The spinner only covers the wait for the first token
+        renderer = StreamRenderer(on_first_token=spinner.stop) if streaming else None
         try:
             return await llm.call_llm_api(
                 messages=messages,
                 system_prompt=system_prompt,
-                tools=tools if use_tools else None
+                tools=tools if use_tools else None,
+                on_text=renderer.feed if renderer else None
             )
         except Exception as e:
             raise Exception(f"Failed to get a response from LLM: {str(e)}")
         finally:
             spinner.stop()
+            if renderer:
+                renderer.finish()
 
-    # Get message history (olog) and then call the LLM
-    messages = olog.get_recent_entries(10)
-    llm_response = await call_llm_with_spinner(messages)
-    logger.info(f"LLM response: {llm_response}")
+    def print_response(response):
+        # A failed call has no formatted response; show why it failed
+        if response.get("error"):
+            print_formatted_text(FormattedText([('class:error', f"Error calling the LLM: {response['error']}")]))
+            return
+        # Streamed responses were rendered as they arrived
+        if response.get("formatted_response") and not response.get("streamed"):
+            print_formatted_text(response["formatted_response"])
+
+    async def execute(func_call):
+        logger.info(f"Processing function call: {func_call}")
+        print_formatted_text(FormattedText([('class:bold', f"Executing function: {func_call['name']}")]))
 
-    if llm_response.get("function_calls"):
-        content = llm_response.get("content") or function_calls_to_text(llm_response["function_calls"])
+        if func_call["name"] == "set_api_config_dialog":
+            func_call["arguments"]["spinner"] = Halo(text='Configuring API...', spinner='dots')
+
+        started = time.monotonic()
+        result = await execute_function_by_name(func_call["name"], llm, olog, **func_call["arguments"])
+        if show_progress:
+            print_formatted_text(tool_progress_line(func_call["name"], result, time.monotonic() - started))
+        return result
+
+    # Independent read-only calls run concurrently; results are handled in the model's order
+    scheduler = ToolScheduler.from_config(execute, config)
+    trace = AgentTrace(AgentBudget.from_config(config))
+
+    # Each step packs the history (olog) into the model's token budget and calls the LLM;
+    # tool results go back to the model until it answers without calling tools
+    while True:
+        step = trace.begin_step()
+        messages = context.build() if step.number == 1 else context.build(retrieve_k=0)
+        started = time.monotonic()
+        llm_response = await call_llm_with_spinner(messages)
+        step.record_llm(time.monotonic() - started, llm_response.get("usage"))
+        logger.info(f"LLM response: {llm_response}")
+
+        function_calls = llm_response.get("function_calls")
+        if not function_calls:
+            olog.add_entry({
+                'content': llm_response["content"],
+                'type': 'llm_response',
+                'timestamp': datetime.now().isoformat()
+            })
+            print_response(llm_response)
+            break
+
+        content = llm_response.get("content") or function_calls_to_text(function_calls)
         olog.add_entry({
             'content': [
                 {"type": "text", "text": content},
@@ -101,63 +190,71 @@ async def ai(username="anonymous", config=None, olog: OmniLogVectorStore = None)
                     "id": call['id'],
                     "name": call['name'],
                     "input": call['arguments']
-                } for call in llm_response["function_calls"]]
+                } for call in function_calls]
             ],
             'type': 'llm_response',
             'timestamp': datetime.now().isoformat(),
         })
-    else:
-        olog.add_entry({
-            'content': llm_response["content"],
-            'type': 'llm_response',
-            'timestamp': datetime.now().isoformat()
-        })
-        if llm_response.get("formatted_response"):
-            print_formatted_text(llm_response["formatted_response"])
-        return True
 
-    for func_call in llm_response["function_calls"]:
-        logger.info(f"Processing function call: {func_call}")
+        started = time.monotonic()
         try:
-            print_formatted_text(FormattedText([('class:bold', f"Executing function: {func_call['name']}")]))
-            
-            if func_call["name"] == "set_api_config_dialog":
-                func_call["arguments"]["spinner"] = Halo(text='Configuring API...', spinner='dots')
-            
-            result = await execute_function_by_name(func_call["name"], llm, olog, **func_call["arguments"])
-            logger.info(f"Function {func_call['name']} executed with result: {result}")
-    
-            log_entry = {
+            results = await scheduler.run(function_calls)
+        except asyncio.CancelledError:
+            # Ctrl-C: answer every tool_use so the history stays valid for the next turn
+            olog.add_entry({
                 'content': [{
                     "type": "tool_result",
-                    "tool_call_id": func_call['id'],
-                    "name": func_call["name"],
-                    "output": result
-                }],
+                    "tool_call_id": call['id'],
+                    "name": call["name"],
+                    "output": json.dumps({"error": "Cancelled by the user"})
+                } for call in function_calls],
                 'type': 'tool_call',
                 'timestamp': datetime.now().isoformat()
-            }
-            logger.info(f"Logging function result: {log_entry}")
-            olog.add_entry(log_entry)
-
-            messages = olog.get_recent_entries(10)
-            system_prompt = "Using the last tool response, summarize the results."
-            summary_response = await call_llm_with_spinner(messages, system_prompt=system_prompt, use_tools=False)
-            
-            if not summary_response:
-                raise Exception("Empty response from LLM during summarization")
-            
-            if summary_response.get("formatted_response"):
-                print_formatted_text(summary_response["formatted_response"])
-        
-        except json.JSONDecodeError as e:
-            error_message = f"Failed to parse function arguments for {func_call['name']}: {str(e)}"
-            print_formatted_text(FormattedText([('class:error', error_message)]))
-            logger.error(error_message)
-        except Exception as e:
-            error_message = f"Error executing function {func_call['name']}: {str(e)}"
-            print_formatted_text(FormattedText([('class:error', error_message)]))
-            print_formatted_text(FormattedText([('class:error', traceback.format_exc())]))
-            logger.error(error_message, exc_info=True)
+            })
+            raise
+        step.tools = [call['name'] for call in function_calls]
+        step.tool_seconds = time.monotonic() - started
+
+        # All of a step's results go into one tool_call entry, sent back as tool_result messages
+        tool_results = []
+        for func_call, result in zip(function_calls, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error executing function {func_call['name']}: {str(result)}")
+                print_formatted_text(FormattedText([('class:error', f"Error executing function {func_call['name']}: {str(result)}")]))
+                result = json.dumps({"error": str(result)})
+            tool_results.append({
+                "type": "tool_result",
+                "tool_call_id": func_call['id'],
+                "name": func_call["name"],
+                "output": result
+            })
+        olog.add_entry({
+            'content': tool_results,
+            'type': 'tool_call',
+            'timestamp': datetime.now().isoformat()
+        })
+
+        stop_reason = trace.check(function_calls)
+        if stop_reason:
+            # Out of budget: one last call to report on what the tools returned.
+            # Tools stay in the request (Anthropic requires them once the history
+            # has tool_use blocks), but any further calls are ignored.
+            logger.info(f"Stopping agent loop: {stop_reason}")
+            step = trace.begin_step()
+            system_prompt = f"Using the tool responses above, summarize the results. Do not call any more tools; stopped because {stop_reason}."
+            started = time.monotonic()
+            summary_response = await call_llm_with_spinner(context.build(retrieve_k=0), system_prompt=system_prompt)
+            step.record_llm(time.monotonic() - started, summary_response.get("usage"))
+            olog.add_entry({
+                'content': summary_response.get("content") or f"Stopped because {stop_reason}.",
+                'type': 'llm_response',
+                'timestamp': datetime.now().isoformat()
+            })
+            print_response(summary_response)
+            break
+
+    trace.log()
+    if show_trace:
+        print_formatted_text(trace.render(), style=custom_style)
 
     return True
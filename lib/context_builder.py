@@ -0,0 +1,261 @@
+import json
+from typing import Any, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from lib.util import get_logger
+
+logger = get_logger()
+
+# Context windows by model name prefix; the longest matching prefix wins
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "gpt-4.1": 1047576,
+    "gpt-5": 400000,
+    "o1": 128000,
+    "o3": 200000,
+    "o4-mini": 200000,
+    "claude": 200000,
+    "claude-3": 200000,
+    "claude-3-5": 200000,
+    "claude-3-7": 200000,
+    "claude-sonnet-4": 200000,
+    "claude-opus-4": 200000,
+    "claude-haiku-4": 200000,
+    "llama2": 4096,
+    "llama3": 8192,
+    "mistral": 32768,
+    "codellama": 16384,
+    "mixtral": 32768,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# History never takes more than this share of the window, leaving room for
+# the system prompt, tool schemas and the response
+HISTORY_SHARE = 0.5
+MAX_HISTORY_TOKENS = 24000
+
+# A single entry may use at most this share of the budget before it is truncated
+MAX_ENTRY_SHARE = 0.25
+
+# Rough characters-per-token ratio used when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+
+class ContextBuilder:
+    """
+    Packs OmniLog history into a per-model token budget.
+
+    The turn in progress (the latest user query and everything after it) is
+    always included, cut down to the budget if it must be; earlier entries
+    are then taken newest first until the budget is spent. Entries
+    larger than their share of the budget (usually cat_file or get_project_files
+    dumps) are cut down to their head and tail and marked `truncated`. Token
+    counts are cached in the OmniLog index so each entry is counted once.
+    When CONTEXT_RETRIEVE_K is set, earlier query/response pairs found by
+    searching for the latest query are packed in front of the recent history.
+    """
+
+    def __init__(self, olog, config=None, budget: Optional[int] = None):
+        self.olog = olog
+        self.config = config
+        self.budget = budget
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding, estimating tokens: {str(e)}")
+
+    def _config_value(self, key: str) -> Optional[str]:
+        if self.config is None:
+            return None
+        return self.config.get_config_value("config", key)
+
+    def resolve_model(self, model: Optional[str] = None) -> Optional[str]:
+        if model:
+            return model
+        service_api = self._config_value("PREFERRED_API")
+        key = {"openai": "OPENAI_MODEL", "anthropic": "ANTHROPIC_MODEL", "ollama": "OLLAMA_MODEL"}.get(service_api)
+        return self._config_value(key) if key else None
+
+    def budget_for(self, model: Optional[str] = None) -> int:
+        if self.budget:
+            return self.budget
+        configured = self._config_value("CONTEXT_TOKEN_BUDGET")
+        if configured:
+            return int(configured)
+
+        window = DEFAULT_CONTEXT_WINDOW
+        if model and model == self._config_value("OLLAMA_MODEL"):
+            # A local model only has the window it was loaded with (num_ctx)
+            window = int(self._config_value("OLLAMA_NUM_CTX") or DEFAULT_CONTEXT_WINDOW)
+        elif model:
+            matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if model.startswith(prefix)]
+            if matches:
+                window = MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+        return min(int(window * HISTORY_SHARE), MAX_HISTORY_TOKENS)
+
+    def count_tokens(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return len(text) // CHARS_PER_TOKEN + 1
+
+    def entry_tokens(self, entry: Dict[str, Any]) -> int:
+        content = entry.get("content")
+        text = content if isinstance(content, str) else json.dumps(content, default=str)
+        return self.count_tokens(text)
+
+    def _cached_tokens(self, entries: List[Dict[str, Any]]) -> List[int]:
+        ids = [entry["id"] for entry in entries if "id" in entry]
+        cached = self.olog.index.get_tokens(ids)
+        counted = {}
+        tokens = []
+        for entry in entries:
+            entry_id = entry.get("id")
+            if entry_id in cached:
+                tokens.append(cached[entry_id])
+                continue
+            count = self.entry_tokens(entry)
+            if entry_id:
+                counted[entry_id] = count
+            tokens.append(count)
+        if counted:
+            self.olog.index.set_tokens(counted)
+        return tokens
+
+    def _truncate_text(self, text: str, max_tokens: int) -> str:
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        # Keep the head and tail; errors and summaries tend to sit at either end
+        keep = max(max_tokens * CHARS_PER_TOKEN // 2, 1)
+        while True:
+            omitted = len(text) - 2 * keep
+            truncated = f"{text[:keep]}\n... [{omitted} characters truncated] ...\n{text[-keep:]}"
+            if self.count_tokens(truncated) <= max_tokens or keep <= 64:
+                return truncated
+            keep = keep * 3 // 4
+
+    def truncate_entry(self, entry: Dict[str, Any], max_tokens: int) -> Dict[str, Any]:
+        """
+        Returns a copy of the entry whose content fits in max_tokens.
+        Tool results are truncated output by output; other content as text.
+        """
+        entry = dict(entry)
+        content = entry.get("content")
+        if entry.get("type") == "tool_call" and isinstance(content, list):
+            share = max(max_tokens // max(len(content), 1), 1)
+            results = []
+            for result in content:
+                result = dict(result)
+                output = result.get("output")
+                if not isinstance(output, str):
+                    output = json.dumps(output, default=str)
+                result["output"] = self._truncate_text(output, share)
+                results.append(result)
+            entry["content"] = results
+        elif isinstance(content, str):
+            entry["content"] = self._truncate_text(content, max_tokens)
+        else:
+            # Structured llm_response content is small; keep it whole
+            return entry
+        entry["truncated"] = True
+        entry["truncated_to"] = max_tokens
+        return entry
+
+    def _fit(self, entries: List[Dict[str, Any]], budget: int) -> List[Dict[str, Any]]:
+        # Cuts entries down to share `budget`: those under an even share keep
+        # their size and the larger ones split what is left
+        counts = [self.entry_tokens(entry) for entry in entries]
+        fitted = list(entries)
+        remaining, left = budget, len(entries)
+        for i in sorted(range(len(entries)), key=lambda i: counts[i]):
+            share = max(remaining // left, 1)
+            if counts[i] > share:
+                fitted[i] = self.truncate_entry(entries[i], share)
+            remaining -= min(counts[i], share)
+            left -= 1
+        return fitted
+
+    def _retrieved_pairs(self, query: str, retrieve_k: int, exclude: set) -> List[Dict[str, Any]]:
+        pairs = []
+        seen = set(exclude)
+        for entry, adjacent in self.olog.search_entries_with_context(query, top_k=retrieve_k):
+            if adjacent is None:
+                continue
+            by_type = {entry["type"]: entry, adjacent["type"]: adjacent}
+            user_entry, assistant_entry = by_type.get("user_query"), by_type.get("llm_response")
+            if not user_entry or not assistant_entry or not isinstance(assistant_entry.get("content"), str):
+                continue
+            key = (user_entry.get("timestamp"), assistant_entry.get("timestamp"))
+            if key in seen or user_entry.get("timestamp") in exclude:
+                continue
+            seen.add(key)
+            pairs.append([user_entry, assistant_entry])
+        pairs.sort(key=lambda pair: pair[0].get("timestamp") or "")
+        return pairs
+
+    def build(self, model: Optional[str] = None, query: Optional[str] = None, retrieve_k: Optional[int] = None,
+              max_entries: int = 50, scope: str = 'project') -> List[Dict[str, Any]]:
+        """
+        Returns OmniLog entries, oldest first, that fit the token budget for `model`.
+        `query` defaults to the latest user query.
+        """
+        model = self.resolve_model(model)
+        if retrieve_k is None:
+            retrieve_k = int(self._config_value("CONTEXT_RETRIEVE_K") or 0)
+        budget = self.budget_for(model)
+        entry_limit = max(int(budget * MAX_ENTRY_SHARE), 1)
+
+        recent = self.olog.get_recent_entries(max_entries, scope=scope)
+        tokens = self._cached_tokens(recent)
+
+        user_queries = [entry for entry in recent if entry.get("type") == "user_query"]
+        turn_start = max((i for i, entry in enumerate(recent) if entry.get("type") == "user_query"), default=len(recent))
+
+        # The turn in progress (the latest query and everything after it) is
+        # always sent whole: dropping part of it would orphan its tool results
+        turn = [self.truncate_entry(entry, entry_limit) if count > entry_limit else entry
+                for entry, count in zip(recent[turn_start:], tokens[turn_start:])]
+        used = sum(self.entry_tokens(entry) for entry in turn)
+        if used > budget:
+            turn = self._fit(turn, budget)
+            used = sum(self.entry_tokens(entry) for entry in turn)
+
+        selected = list(reversed(turn))
+        for entry, count in zip(reversed(recent[:turn_start]), reversed(tokens[:turn_start])):
+            if count > entry_limit:
+                entry = self.truncate_entry(entry, entry_limit)
+                count = self.entry_tokens(entry)
+            if used + count > budget:
+                break
+            selected.append(entry)
+            used += count
+        selected.reverse()
+
+        # Providers expect the history to open with a user turn
+        while selected and selected[0].get("type") != "user_query":
+            used -= self.entry_tokens(selected.pop(0))
+
+        if query is None and user_queries and isinstance(user_queries[-1].get("content"), str):
+            query = user_queries[-1]["content"]
+
+        if query and retrieve_k > 0:
+            exclude = {entry.get("timestamp") for entry in selected}
+            retrieved = []
+            for pair in reversed(self._retrieved_pairs(query, retrieve_k, exclude)):
+                pair = [self.truncate_entry(e, entry_limit) if self.entry_tokens(e) > entry_limit else e for e in pair]
+                count = sum(self.entry_tokens(e) for e in pair)
+                if used + count > budget:
+                    break
+                retrieved = pair + retrieved
+                used += count
+            selected = retrieved + selected
+
+        logger.info(f"Built context of {len(selected)} entries, ~{used}/{budget} tokens for {model}")
+        return selected
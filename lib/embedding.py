@@ -0,0 +1,180 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+import logging
+logger = logging.getLogger(__name__)
+
+CACHE_FILENAME = 'embedding_cache.sqlite3'
+
+class Embedder:
+    """
+    Base class for OmniLog embedding backends.
+
+    Subclasses set `name` (used to key the embedding cache, so it must change
+    whenever the vectors would) and implement `embed` for a batch of texts.
+    """
+    name = "base"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+class OnnxMiniLMEmbedder(Embedder):
+    """
+    all-MiniLM-L6-v2 through Chroma's bundled ONNX runtime on CPU. This is the
+    model Chroma uses by default, so existing collections stay compatible.
+    """
+    name = "onnx-all-MiniLM-L6-v2"
+
+    def __init__(self):
+        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+        self._embedding_function = ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [[float(value) for value in vector] for vector in self._embedding_function(texts)]
+
+class SentenceTransformerEmbedder(Embedder):
+    """
+    Local sentence_transformers model, optionally with int8 dynamic quantization
+    of the linear layers for faster CPU inference.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 32, quantize: bool = True, device: str = "cpu"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device=device)
+        if quantize:
+            import torch
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.batch_size = batch_size
+        self.name = f"st-{model_name}" + ("-int8" if quantize else "")
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+def create_embedder(name: Optional[str] = None) -> Embedder:
+    """
+    Builds an embedder from its config name: 'onnx' (default), 'sentence_transformers' or 'sentence_transformers_fp32'.
+    """
+    if name in (None, "", "onnx"):
+        return OnnxMiniLMEmbedder()
+    if name == "sentence_transformers":
+        return SentenceTransformerEmbedder(quantize=True)
+    if name == "sentence_transformers_fp32":
+        return SentenceTransformerEmbedder(quantize=False)
+    logger.warning(f"Unknown embedder '{name}', falling back to onnx")
+    return OnnxMiniLMEmbedder()
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by a hash of (embedder name, text), with LRU eviction.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        os.makedirs(path, exist_ok=True)
+        self.db_path = os.path.join(path, CACHE_FILENAME)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+
+    @staticmethod
+    def key(embedder_name: str, text: str) -> str:
+        return hashlib.sha256(f"{embedder_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        unique_keys = list(set(keys))
+        found = {}
+        with self._lock, self.conn:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array('f', blob).tolist()
+            if found:
+                now = time.time()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, vectors: Dict[str, List[float]]):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array('f', vector).tobytes(), now) for key, vector in vectors.items()]
+            )
+            self._evict()
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+            logger.debug(f"Evicted {overflow} cached embeddings")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Chroma embedding function that serves repeated texts from the EmbeddingCache
+    and embeds the remaining unique texts in one batch.
+    """
+
+    def __init__(self, embedder: Embedder, cache: EmbeddingCache):
+        self.embedder = embedder
+        self.cache = cache
+
+    def __call__(self, input: Documents) -> Embeddings:
+        keys = [EmbeddingCache.key(self.embedder.name, text) for text in input]
+        vectors = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, input):
+            if key not in vectors:
+                missing[key] = text
+
+        if missing:
+            embedded = self.embedder.embed(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), embedded))
+            self.cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+
+        return [vectors[key] for key in keys]
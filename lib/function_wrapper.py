@@ -7,6 +7,7 @@ from typing import get_origin, get_args
 
 tools = []  # A registry to hold all decorated functions' info
 callable_registry = {}  # A registry to hold the functions themselves
+registry_generation = 0  # Bumped on every registration so compiled tool schemas know to rebuild
 
 # Set up logging
 from lib.util import get_logger
@@ -14,10 +15,12 @@ logger = get_logger()
 
 class FunctionWrapper:
     def __init__(self, func):
+        global registry_generation
         self.func = func
         self.info = self.extract_function_info()
         callable_registry[func.__name__] = func
         tools.append({"type": "function", "function": self.info})
+        registry_generation += 1
 
     def extract_function_info(self):
         source = inspect.getsource(inspect.unwrap(self.func))
@@ -195,6 +198,23 @@ def strict(func):
     func.is_strict = True
     return func
 
+def read_only(func):
+    # Marks a tool without side effects, which the tool scheduler may run alongside others
+    func.is_read_only = True
+    return func
+
+def timeout(seconds):
+    # Declares how long a tool may run before the tool executor stops it
+    def mark(func):
+        func.timeout = seconds
+        return func
+    return mark
+
+def in_process(func):
+    # Marks a tool that must run in the shell's own process (it changes its state or talks to the terminal)
+    func.in_process = True
+    return func
+
 def function_info_decorator(func):
     wrapped_function = FunctionWrapper(func)
     def wrapper(*args, **kwargs):
@@ -203,7 +223,8 @@ def function_info_decorator(func):
     return wrapper
 
 def load_functions_from_directory(directory):
-    for filename in os.listdir(directory):
+    # Sorted so the tool list, and any provider prompt cache built on it, is identical across runs
+    for filename in sorted(os.listdir(directory)):
         if filename.endswith(".py") and filename != "__init__.py":
             module_name = filename[:-3]
             module_path = os.path.join(directory, filename)
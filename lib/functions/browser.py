@@ -1,6 +1,6 @@
 import subprocess
 import os
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, in_process
 import platform
 
 def find_chrome_executable() -> str:
@@ -85,6 +85,7 @@ def find_safari_executable() -> str:
     return ""
 
 @function_info_decorator
+@in_process # must come after function decorator
 def browser(url: str) -> dict:
     """
     Opens Google Chrome to a specified URL on Windows or macOS.
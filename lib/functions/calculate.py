@@ -1,9 +1,10 @@
 # lib/functions/calculate.py
 
 import math
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, read_only
 
 @function_info_decorator
+@read_only # must come after function decorator
 def calculate(expression: str) -> dict:
     """
     Calculates the result of a given mathematical expression. 
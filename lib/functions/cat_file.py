@@ -1,7 +1,8 @@
 import os
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, read_only
 
 @function_info_decorator
+@read_only # must come after function decorator
 def cat_file(file_path: str) -> dict:
     """
     Reads the contents of a file and returns them as a string.
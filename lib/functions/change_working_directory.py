@@ -1,7 +1,8 @@
 import os
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, in_process
 
 @function_info_decorator
+@in_process # must come after function decorator
 def change_working_directory(new_directory: str) -> dict:
     """
     Changes the current working directory of the application.
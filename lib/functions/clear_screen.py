@@ -8,9 +8,10 @@ try:
 except ImportError:
     cowsay = None
 
-from lib.function_wrapper import function_info_decorator, strict
+from lib.function_wrapper import function_info_decorator, strict, in_process
 
 @function_info_decorator
+@in_process
 @strict # must come after function dectorator
 def clear_screen(cowsay_option: bool = False) -> Dict[str, str]:
     """
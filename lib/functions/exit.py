@@ -1,7 +1,8 @@
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, in_process
 import sys
 
 @function_info_decorator
+@in_process # must come after function decorator
 def exit():
     """
     Forces an exit of the Webwright application.
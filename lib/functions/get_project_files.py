@@ -1,7 +1,8 @@
 import os
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, read_only
 
 @function_info_decorator
+@read_only # must come after function decorator
 def get_project_files(project_directory: str = None) -> dict:
     """
     Lists all the files in the specified project directory (or current directory if not specified) and returns them as a directory listing,
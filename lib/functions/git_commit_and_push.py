@@ -1,11 +1,12 @@
 from git import Repo
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, timeout
 from lib.util import get_logger
 from lib.config import Config
 
 logger = get_logger()
 
 @function_info_decorator
+@timeout(180) # must come after function decorator
 def git_commit_and_push(commit_message: str, branch_name: str = None) -> dict:
     """
     Automatically stages all changes, commits them with the provided message,
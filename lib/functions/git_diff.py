@@ -1,13 +1,14 @@
 import os
 from git import Repo
 from github import Github
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, read_only
 from lib.util import get_logger
 from lib.config import Config
 
 logger = get_logger()
 
 @function_info_decorator
+@read_only # must come after function decorator
 def git_diff() -> dict:
     """
     Retrieves the diff of the current git repository and additional repository information.
@@ -1,11 +1,12 @@
 from git import Repo
 from git.exc import GitCommandError
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, timeout
 from lib.util import get_logger
 
 logger = get_logger()
 
 @function_info_decorator
+@timeout(120) # must come after function decorator
 def git_pull(branch_name: str = None, remote_name: str = 'origin') -> dict:
     """
     Performs a git pull operation to fetch and merge changes from the remote repository for the current branch.
@@ -1,7 +1,8 @@
 # lib/functions/help.py
-from lib.function_wrapper import function_info_decorator, tools
+from lib.function_wrapper import function_info_decorator, tools, read_only
 
 @function_info_decorator
+@read_only # must come after function decorator
 def help() -> dict:
     """
     Provides help information about the available functions.
@@ -1,9 +1,10 @@
 import subprocess
 import sys
 import logging
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, timeout
 
 @function_info_decorator
+@timeout(600) # must come after function decorator
 def install_package(package: str) -> dict:
     """
     Allows the local Mitta agent to install a Python package using pip.
@@ -1,5 +1,6 @@
 from lib.function_wrapper import function_info_decorator
 from lib.llm import llm_wrapper
+from lib.context_builder import ContextBuilder
 from datetime import datetime
 import json
 
@@ -23,8 +24,8 @@ async def llm_write_code(description: str, olog=None, llm=None) -> dict:
         "timestamp": datetime.now().isoformat()
     })
 
-    # Retrieve recent entries
-    messages = olog.get_recent_entries(5)
+    # Retrieve as much recent context as fits the code model's budget
+    messages = ContextBuilder(olog, config=llm.config).build(model="o1-preview")
     
     # Call the LLM API
     response = await llm.call_llm_api(messages=messages, service_api="openai", model="o1-preview")
@@ -1,6 +1,6 @@
 import subprocess
 import platform
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, read_only, timeout
 
 def get_ping_command(host: str, count: int = 4) -> list:
     """
@@ -12,6 +12,8 @@ def get_ping_command(host: str, count: int = 4) -> list:
         return ["ping", "-c", str(count), host]
 
 @function_info_decorator
+@read_only # must come after function decorator
+@timeout(60)
 def ping(host: str = "google.com", count: int = 4) -> dict:
     """
     Pings a specified host (default is google.com) and returns the result.
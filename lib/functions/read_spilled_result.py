@@ -0,0 +1,66 @@
+from lib.function_wrapper import function_info_decorator, read_only, in_process
+from lib.spill_store import get_spill_store, DEFAULT_THRESHOLD
+
+@function_info_decorator
+@read_only # must come after function decorator
+@in_process # reads this shell's spill store
+def read_spilled_result(handle: str, start_line: int = None, end_line: int = None, offset: int = None, length: int = None) -> dict:
+    """
+    Reads part of a tool result that was too large to include and was replaced by a spill handle.
+    Pass start_line and end_line (1-based, inclusive) to read lines, or offset and length to read a character range.
+    With neither, reads from the start. At most one spill threshold of text is returned per call.
+
+    :param handle: The handle from the "spilled" field of the tool result, e.g. spill:3fa2...
+    :type handle: str
+    :param start_line: First line to read, counting from 1.
+    :type start_line: int
+    :param end_line: Last line to read, inclusive.
+    :type end_line: int
+    :param offset: Character offset to start reading at.
+    :type offset: int
+    :param length: Number of characters to read.
+    :type length: int
+    :return: A dictionary containing the success status, the requested text and where it sits in the full result.
+    :rtype: dict
+    """
+    try:
+        text = get_spill_store().read(handle)
+    except KeyError:
+        return {
+            "success": False,
+            "error": "Spill not found",
+            "reason": f"No spilled result with handle '{handle}'. Spills are kept for a week."
+        }
+
+    # Spilling may be off (threshold 0) while older spills are still read back
+    limit = get_spill_store().threshold or DEFAULT_THRESHOLD
+    if start_line is not None or end_line is not None:
+        lines = text.splitlines(keepends=True)
+        start = max(int(start_line or 1), 1)
+        end = min(int(end_line or len(lines)), len(lines))
+        chunk = ""
+        last = start - 1
+        for line in lines[start - 1:end]:
+            if len(chunk) + len(line) > limit:
+                break
+            chunk += line
+            last += 1
+        # A single line longer than the limit is cut rather than skipped
+        if last < start <= end:
+            chunk = lines[start - 1][:limit]
+            last = start
+        truncated = last < end or len(chunk) < len("".join(lines[start - 1:last]))
+        position = {"start_line": start, "end_line": last, "total_lines": len(lines)}
+    else:
+        start = max(int(offset or 0), 0)
+        requested = text[start:start + int(length or limit)]
+        chunk = requested[:limit]
+        truncated = len(chunk) < len(requested)
+        position = {"offset": start, "length": len(chunk), "total_chars": len(text)}
+
+    return {
+        "success": True,
+        "text": chunk,
+        "truncated": truncated,
+        **position
+    }
@@ -1,8 +1,9 @@
 import os
 import subprocess
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, timeout
 
 @function_info_decorator
+@timeout(600) # must come after function decorator
 def run_python_file(file_path: str, blocking: bool = True) -> dict:
     """
     Runs a Python file and captures the output. Can run in blocking or non-blocking mode.
@@ -1,7 +1,7 @@
 from bs4 import BeautifulSoup
 import os
 from typing import Dict, List
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, read_only
 from lib.util import get_logger
 
 logger = get_logger()
@@ -27,6 +27,7 @@ def analyze_html_file(file_path: str) -> Dict[str, List[str]]:
 
 
 @function_info_decorator
+@read_only # must come after function decorator
 def scan_html_repository(code_path: str) -> Dict[str, Dict[str, List[str]]]:
     """
     Scans a repository directory for HTML files, analyzes them, and generates a summary.
@@ -1,7 +1,7 @@
 import ast
 import os
 from typing import Dict, List, Any
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, read_only
 from lib.util import get_logger
 
 logger = get_logger()
@@ -63,6 +63,7 @@ def analyze_file(file_path: str) -> Dict[str, List[str]]:
             return {}
 
 @function_info_decorator
+@read_only # must come after function decorator
 def scan_python_code(path: str) -> Dict[str, Any]:
     """
     Scans a directory or a single Python file, analyzes them, and generates a function file.
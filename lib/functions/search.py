@@ -1,10 +1,11 @@
 # lib/functions/search.py
 
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, read_only
 from lib.llm import llm_wrapper
 
 @function_info_decorator
-def search(search_term: str, top_k: int, olog=None) -> dict:
+@read_only # must come after function decorator
+def search(search_term: str, top_k: int, all_projects: bool = False, olog=None) -> dict:
     """
     Uses an instance of Omnilog class defined in aifunc.py to search local memory for entries with context.
     Use this function to search historic chat entries and memories for a specific term.
@@ -14,13 +15,17 @@ def search(search_term: str, top_k: int, olog=None) -> dict:
 
     :param top_k: The number of results to return.
     :type top_k: int
+
+    :param all_projects: Search the history of every project instead of only the current one. Default is False.
+    :type all_projects: bool
     
     :return: A dictionary containing local memory search results in a prompt format.
     :rtype: dict
     """
 
     # Use the search_entries_with_context method to search
-    results = olog.search_entries_with_context(search_term)
+    scope = 'all' if all_projects else 'project'
+    results = olog.search_entries_with_context(search_term, top_k=top_k, scope=scope)
 
     response = f"""
 Search function results for '{search_term}':
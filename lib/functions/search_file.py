@@ -1,8 +1,9 @@
 import os
 import fnmatch
-from lib.function_wrapper import function_info_decorator
+from lib.function_wrapper import function_info_decorator, read_only
 
 @function_info_decorator
+@read_only # must come after function decorator
 def search_file(filename: str, directory: str = None) -> dict:
     """
     Searches the specified directory (or current directory if not specified) for files or directories matching the specified partial name.
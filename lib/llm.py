@@ -1,12 +1,16 @@
-# Openai imports
-from openai import AsyncOpenAI
-
 # Anthropic imports
-from anthropic import AsyncAnthropic
 from anthropic.types import TextBlock, ToolUseBlock
 
-# Aiohttp import for Ollama API
-import aiohttp
+# Pooled provider clients
+from lib.llm_clients import client_pool, base_url_for
+from lib.tool_schemas import tool_schemas
+from lib.llm_cache import ResponseCache, get_response_cache
+from lib.transcript import transcript_for
+from lib.llm_resilience import call_with_resilience, RetryPolicy, StreamGuard
+from lib.llm_router import get_router
+from lib.llm_metrics import CallTimer, get_metrics
+from lib.llm_streaming import stream_openai, stream_anthropic, stream_ollama, complete_ollama, anthropic_usage, openai_usage
+from lib.llm_ollama import ollama_settings, request_body
 
 # Utility imports (assuming these are from your local modules)
 from lib.util import create_and_check_directory
@@ -19,6 +23,7 @@ from lib.function_wrapper import function_info_decorator, tools
 from git import Repo
 
 import json
+import asyncio
 from datetime import datetime
 
 from lib.util import custom_style
@@ -28,6 +33,11 @@ from prompt_toolkit.formatted_text import FormattedText
 # Configure logging
 logger = get_logger()
 
+# Anthropic prompt caching: the tool list and system prompt are identical on
+# every turn, so both are marked as cache breakpoints
+ANTHROPIC_CACHE_CONTROL = {"type": "ephemeral"}
+ANTHROPIC_PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+
 SYSTEM_PROMPT = """
 You are an intelligent assistant named Webwright that helps users accomplish their tasks efficiently. Follow these guidelines:
 
@@ -146,85 +156,110 @@ class llm_wrapper:
     def __init__(self, service_api="anthropic", config=None):
         self.service_api = service_api
         self.config = config
-
-    async def call_llm_api(self, messages=None, system_prompt=SYSTEM_PROMPT, tools=tools, service_api=None, model=None):
+        self.retry_policy = RetryPolicy.from_config(config)
+        self.router = get_router(config)
+
+    async def call_llm_api(self, messages=None, system_prompt=SYSTEM_PROMPT, tools=tools, service_api=None, model=None, on_text=None, use_cache=True):
+        """
+        With `on_text`, the response is streamed and each text delta is passed
+        to on_text as it arrives; the returned dict is the same either way,
+        with "streamed" set to True.
+
+        When the response cache is enabled (LLM_RESPONSE_CACHE = true), plain
+        text answers are served from it; use_cache=False bypasses it for one call.
+
+        When a [router] section lists providers, calls that name neither a
+        service_api nor a model are routed between them; see lib/llm_router.
+        Routed calls skip the response cache.
+        """
         if service_api:
             self.service_api = service_api
         else:
             self.service_api = self.config.get_config_value("config", "PREFERRED_API")
-        if self.service_api == "openai":
-            return await self.call_openai_api(messages, system_prompt, tools, model)
-        elif self.service_api == "anthropic":
-            return await self.call_anthropic_api(messages, system_prompt, tools, model)
-        elif self.service_api == "ollama":
-            return await self.call_ollama_api(messages, system_prompt, tools, model)
-
-    async def call_anthropic_api(self, messages=None, system_prompt=SYSTEM_PROMPT, tools=None, model=None):
+
+        pinned = bool(service_api or model)
+        # A routed call's provider and model are only known once it is made,
+        # so only calls with a fixed provider can be keyed
+        routed = self.router is not None and not pinned
+        cache = get_response_cache(self.config) if use_cache and not routed else None
+        if cache is None:
+            return await self._route(messages, system_prompt, tools, model, on_text, pinned)
+
+        compiled_tools = tool_schemas.compile("openai", tools)
+        cache_key = ResponseCache.make_key(
+            self.service_api,
+            model or self.config.get_config_value("config", f"{(self.service_api or '').upper()}_MODEL"),
+            system_prompt or SYSTEM_PROMPT,
+            messages,
+            compiled_tools.digest if compiled_tools else None
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Response cache hit for {self.service_api} ({cache_key[:12]})")
+            if on_text and cached["content"]:
+                on_text(cached["content"])
+            return {
+                **cached,
+                "timestamp": datetime.now().isoformat(),
+                "formatted_response": format_response(cached["content"]) if cached["content"] else None,
+                "streamed": bool(on_text),
+                "cached": True
+            }
+
+        result = await self._route(messages, system_prompt, tools, model, on_text, pinned)
+        if result:
+            cache.put(cache_key, result)
+        return result
+
+    async def _route(self, messages, system_prompt, tools, model, on_text, pinned):
+        if self.router is None or pinned:
+            return await self._dispatch(self.service_api, messages, system_prompt, tools, model, on_text)
+
+        guard = StreamGuard(on_text) if on_text else None
+
+        async def call(provider, candidate_model):
+            return await self._dispatch(provider, messages, system_prompt, tools, candidate_model, guard)
+
+        # Two streams would print two answers, so streamed calls fall back but never hedge
+        return await self.router.route(call, hedge=not on_text, can_fallback=guard.can_retry if guard else None)
+
+    async def _dispatch(self, service_api, messages, system_prompt, tools, model, on_text):
+        providers = {
+            "openai": self.call_openai_api,
+            "anthropic": self.call_anthropic_api,
+            "ollama": self.call_ollama_api,
+        }
+        if service_api not in providers:
+            return None
+
+        # Every provider call is timed, from request to last token
+        timer = CallTimer(on_text)
+        model_name = model or self.config.get_config_value("config", f"{service_api.upper()}_MODEL")
+        try:
+            result = await providers[service_api](messages, system_prompt, tools, model, timer.on_text if on_text else None)
+        except asyncio.CancelledError:
+            # A hedged call that lost the race, or a turn cancelled by the user
+            get_metrics().record(service_api, model_name, "cancelled", timer.elapsed(), timer.first_token)
+            raise
+        outcome = "error" if result.get("error") else "ok"
+        get_metrics().record(service_api, model_name, outcome, timer.elapsed(), timer.first_token, result.get("usage"))
+        return result
+
+    async def call_anthropic_api(self, messages=None, system_prompt=SYSTEM_PROMPT, tools=None, model=None, on_text=None):
         logger.info("Starting call_anthropic_api method")
         
-        a_messages = []
-        last_assistant_message = None  # Initialize the variable here
-
         if not system_prompt:
             system_prompt = SYSTEM_PROMPT
 
-        # Convert tools to Anthropic format if provided
-        anthropic_tools = []
-        if tools:
-            for tool in tools:
-                if 'function' in tool:
-                    anthropic_tool = {
-                        "name": tool['function']['name'],
-                        "description": tool['function']['description'],
-                        "input_schema": {
-                            "type": "object",
-                            "properties": tool['function']['parameters'].get('properties', {}),
-                            "required": tool['function']['parameters'].get('required', [])
-                        }
-                    }
-                    anthropic_tools.append(anthropic_tool)
-
-
-        logger.info(f"Converted tools: {json.dumps(anthropic_tools, indent=2)}")
-
-        # Convert existing messages to Anthropic format
-        for message in messages:
-            logger.info(f"Processing message: {message}")
-            if message["type"] == "user_query":
-                a_messages.append({"role": "user", "content": message["content"]})
-            elif message["type"] == "llm_response":
-                if isinstance(message["content"], list):
-                    text_content = next((item["text"] for item in message["content"] if item["type"] == "text"), "")
-                    a_messages.append({"role": "assistant", "content": text_content})
-                else:
-                    a_messages.append({"role": "assistant", "content": message["content"]})
-            elif message["type"] == "tool_call":
-                if last_assistant_message and "content" in message and isinstance(message["content"], list):
-                    # Append the last assistant message before adding tool result
-                    a_messages.append(last_assistant_message)
-
-                    # Loop through tool results and add them as tool responses
-                    for tool_result in message["content"]:
-                        try:
-                            output = json.loads(tool_result["output"])
-                        except json.JSONDecodeError:
-                            logger.error(f"Failed to parse tool result output: {tool_result['output']}")
-                            output = tool_result["output"]
-                        
-                        # Add the tool result to the messages as a plain text role response
-                        a_messages.append({
-                            "role": "tool",
-                            "content": f"Tool result: {json.dumps(output)}",  # Ensure it's a simple text format
-                            "tool_use_id": tool_result["tool_call_id"]
-                        })
-                    
-                    # Reset the last_assistant_message after processing
-                    last_assistant_message = None
-            else:
-                logger.info(f"Skipping message with unknown type: {message['type']}")
+        prompt_caching = (self.config.get_config_value("config", "ANTHROPIC_PROMPT_CACHING") or "true").lower() != "false"
 
+        # Anthropic tool schemas are compiled once and reused across calls
+        anthropic_tools = tool_schemas.compile("anthropic", tools, cache_breakpoint=prompt_caching)
 
-        logger.info(f"Converted messages: {json.dumps(a_messages, indent=2)}")
+        # Convert messages to Anthropic format; entries converted on earlier calls are reused
+        a_messages, _ = transcript_for("anthropic").convert(messages)
+
+        logger.debug(f"Converted messages: {a_messages}")
 
         # If no model is provided, use the config value
         if not model:
@@ -239,30 +274,49 @@ class llm_wrapper:
         }
 
         if anthropic_tools:
-            api_params["tools"] = anthropic_tools
+            api_params["tools"] = anthropic_tools.payload
+
+        if prompt_caching:
+            # Tools precede the system prompt in the cached prefix; a breakpoint on
+            # the last tool (set by the compiler) and one on the system prompt cache both
+            api_params["system"] = [{"type": "text", "text": system_prompt, "cache_control": ANTHROPIC_CACHE_CONTROL}]
+            api_params["extra_headers"] = {"anthropic-beta": ANTHROPIC_PROMPT_CACHING_BETA}
 
         try:
-            logger.info(f"API PARAMS: {json.dumps(api_params, indent=2, default=str)}")
+            logger.info(f"Calling Anthropic {model} with {len(a_messages)} messages and {len(anthropic_tools or [])} tools")
 
             # Call Anthropic API
-            client = AsyncAnthropic(api_key=self.config.get_anthropic_api_key())
-            response = await client.messages.create(**api_params)
-            logger.info(f"Received response from Anthropic API: {response}")
+            client = client_pool.anthropic(self.config.get_anthropic_api_key(), base_url_for(self.config, "anthropic"))
+            guard = StreamGuard(on_text) if on_text else None
+
+            async def request():
+                if guard:
+                    return await stream_anthropic(client, api_params, guard, on_chunk=guard.chunk)
 
-            # Extract content, timestamp, and function calls from the response
-            content = ""
+                response = await client.messages.create(**api_params)
+                logger.info(f"Received response from Anthropic API: {response}")
+
+                # Extract content and function calls from the response
+                content = ""
+                function_calls = []
+
+                for block in response.content:
+                    if isinstance(block, TextBlock):
+                        content += block.text
+                    elif isinstance(block, ToolUseBlock):
+                        function_calls.append({
+                            "id": block.id,
+                            "name": block.name,
+                            "arguments": block.input
+                        })
+                return content, function_calls, anthropic_usage(response.usage)
+
+            # Retries, deadline and circuit breaker; a stream is not retried once tokens are shown
+            content, function_calls, usage = await call_with_resilience(
+                "anthropic", request, self.retry_policy, can_retry=guard.can_retry if guard else None,
+                stream=guard
+            )
             timestamp = datetime.now().isoformat()
-            function_calls = []
-
-            for block in response.content:
-                if isinstance(block, TextBlock):
-                    content += block.text
-                elif isinstance(block, ToolUseBlock):
-                    function_calls.append({
-                        "id": block.id,
-                        "name": block.name,
-                        "arguments": block.input
-                    })
 
             formatted_response = None
             if content:
@@ -273,9 +327,12 @@ class llm_wrapper:
                 "content": content,
                 "timestamp": timestamp,
                 "function_calls": function_calls,
-                "formatted_response": formatted_response
+                "formatted_response": formatted_response,
+                "streamed": bool(on_text),
+                "usage": usage
             }
-            logger.info(f"LLM FUNCTIONS: {json.dumps(result, indent=2, default=str)}")
+            logger.info(f"Anthropic usage: {usage}")
+            logger.info(f"LLM FUNCTIONS: {function_calls}")
             return result
 
         except Exception as e:
@@ -291,7 +348,7 @@ class llm_wrapper:
             }
 
         
-    async def call_openai_api(self, messages=None, system_prompt=None, tools=None, model=None):
+    async def call_openai_api(self, messages=None, system_prompt=None, tools=None, model=None, on_text=None):
         oai_messages = []
 
         if not system_prompt:
@@ -300,51 +357,11 @@ class llm_wrapper:
         # Add system prompt at the beginning
         oai_messages.append({"role": "system", "content": system_prompt})
 
-        # Convert existing messages to OpenAI format
-        last_assistant_message = None
-        for message in messages:
-            logger.info(f"Processing message: {message}")
-            if message["type"] == "user_query":
-                oai_messages.append({"role": "user", "content": message["content"]})
-            elif message["type"] == "llm_response":
-                if isinstance(message["content"], list):
-                    # Handle structured content (e.g., text and tool use)
-                    text_content = next((item["text"] for item in message["content"] if item["type"] == "text"), "")
-                    tool_use = next((item for item in message["content"] if item["type"] == "tool_use"), None)
-
-                    if tool_use:
-                        last_assistant_message = {
-                            "role": "assistant",
-                            "content": text_content,
-                            "tool_calls": [{
-                                "id": tool_use["id"],
-                                "type": "function",
-                                "function": {
-                                    "name": tool_use["name"],
-                                    "arguments": json.dumps(tool_use["input"])
-                                }
-                            }]
-                        }
-                    else:
-                        oai_messages.append({"role": "assistant", "content": text_content})
-                else:
-                    oai_messages.append({"role": "assistant", "content": message["content"]})
-            elif message["type"] == "tool_call":
-                if last_assistant_message and "content" in message and isinstance(message["content"], list):
-                    oai_messages.append(last_assistant_message)
-                    for tool_result in message["content"]:
-                        oai_messages.append({
-                            "role": "tool",
-                            "content": json.dumps(tool_result["output"]),
-                            "tool_call_id": tool_result["tool_call_id"]
-                        })
-                    last_assistant_message = None
-            else:
-                logger.info(f"Skipping message with unknown type: {message['type']}")
-
-        # If there's a pending last_assistant_message, add it
-        if last_assistant_message:
-            oai_messages.append(last_assistant_message)
+        # Convert messages to OpenAI format; entries converted on earlier calls are reused.
+        # A tool-call message still waiting for its results is left out, as
+        # OpenAI rejects tool_calls that are not followed by their tool messages
+        converted, _ = transcript_for("openai").convert(messages)
+        oai_messages.extend(converted)
 
         # If no model is provided, use the config value
         if not model:
@@ -356,32 +373,45 @@ class llm_wrapper:
             "messages": oai_messages
         }
 
-        # If we have tools, add them to the API parameters
-        if tools:
-            api_params["tools"] = tools
+        # If we have tools, add the compiled payload to the API parameters
+        openai_tools = tool_schemas.compile("openai", tools)
+        if openai_tools:
+            api_params["tools"] = openai_tools.payload
 
         try:
-            logger.info(f"API PARAMS: {api_params}")
+            logger.info(f"Calling OpenAI {model} with {len(oai_messages)} messages and {len(openai_tools or [])} tools")
 
             # Call OpenAI API
-            client = AsyncOpenAI(api_key=self.config.get_openai_api_key())
-            response = await client.chat.completions.create(**api_params)
-            logger.info(response)
-            # Extract content, timestamp, and function calls from the response
-            assistant_message = response.choices[0].message
-            content = assistant_message.content
+            client = client_pool.openai(self.config.get_openai_api_key(), base_url_for(self.config, "openai"))
+            guard = StreamGuard(on_text) if on_text else None
+
+            async def request():
+                if guard:
+                    return await stream_openai(client, api_params, guard, on_chunk=guard.chunk)
+
+                response = await client.chat.completions.create(**api_params)
+                logger.info(response)
+                # Extract content and function calls from the response
+                assistant_message = response.choices[0].message
+                content = assistant_message.content
+                function_calls = []
+
+                # Processing function calls in the response
+                if hasattr(assistant_message, 'tool_calls') and assistant_message.tool_calls:
+                    for tool_call in assistant_message.tool_calls:
+                        if tool_call.type == 'function':
+                            function_calls.append({
+                                "id": tool_call.id,
+                                "name": tool_call.function.name,
+                                "arguments": json.loads(tool_call.function.arguments)
+                            })
+                return content, function_calls, openai_usage(response.usage)
+
+            content, function_calls, usage = await call_with_resilience(
+                "openai", request, self.retry_policy, can_retry=guard.can_retry if guard else None,
+                stream=guard
+            )
             timestamp = datetime.now().isoformat()
-            function_calls = []
-
-            # Processing function calls in the response
-            if hasattr(assistant_message, 'tool_calls') and assistant_message.tool_calls:
-                for tool_call in assistant_message.tool_calls:
-                    if tool_call.type == 'function':
-                        function_calls.append({
-                            "id": tool_call.id,
-                            "name": tool_call.function.name,
-                            "arguments": json.loads(tool_call.function.arguments)
-                        })
 
             formatted_response = None
             if content:
@@ -392,9 +422,12 @@ class llm_wrapper:
                 "content": content,
                 "timestamp": timestamp,
                 "function_calls": function_calls,
-                "formatted_response": formatted_response
+                "formatted_response": formatted_response,
+                "streamed": bool(on_text),
+                "usage": usage
             }
-            logger.info(f"LLM FUNCTIONS: {stuff}")
+            logger.info(f"OpenAI usage: {usage}")
+            logger.info(f"LLM FUNCTIONS: {function_calls}")
             return stuff
 
         except Exception as e:
@@ -408,34 +441,56 @@ class llm_wrapper:
                 "error": str(e)
             }
 
-    async def call_ollama_api(self, messages=None, system_prompt=SYSTEM_PROMPT, tools=None, model=None):
-        # Convert messages to Ollama format
-        ollama_messages = []
-        for message in messages:
-            if message["type"] == "user_query":
-                ollama_messages.append({"role": "user", "content": message["content"]})
-            elif message["type"] == "llm_response":
-                ollama_messages.append({"role": "assistant", "content": message["content"]})
+    async def call_ollama_api(self, messages=None, system_prompt=SYSTEM_PROMPT, tools=None, model=None, on_text=None):
+        if not system_prompt:
+            system_prompt = SYSTEM_PROMPT
+
+        # Convert messages to Ollama format; entries converted on earlier calls are reused
+        converted, _ = transcript_for("ollama").convert(messages)
+        ollama_messages = [{"role": "system", "content": system_prompt}, *converted]
+
+        model = model or self.config.get_config_value("config", "OLLAMA_MODEL")
 
-        # Prepare API parameters
+        # Prepare API parameters; keep_alive and num_ctx must match the preload
+        # request or Ollama reloads the model
         api_params = {
-            "model": model or self.config.get_config_value("config", "OLLAMA_MODEL"),
+            "model": model,
             "messages": ollama_messages,
-            "stream": False
+            "stream": bool(on_text),
+            **ollama_settings(self.config)
         }
 
+        # Ollama takes the same function format as OpenAI, so the compiled bytes are reused
+        ollama_tools = tool_schemas.compile("ollama", tools)
+        body = request_body(api_params, ollama_tools)
+
         try:
+            logger.info(f"Calling Ollama {model} with {len(ollama_messages)} messages and {len(ollama_tools or [])} tools")
+
             endpoint = self.config.get_ollama_endpoint()
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"{endpoint}/api/chat", json=api_params) as response:
-                    result = await response.json()
-
-                    return {
-                        "content": result["message"]["content"],
-                        "timestamp": datetime.now().isoformat(),
-                        "function_calls": [],  # Ollama doesn't support function calls yet
-                        "formatted_response": format_response(result["message"]["content"])
-                    }
+            session = client_pool.ollama(endpoint)
+            guard = StreamGuard(on_text) if on_text else None
+
+            async def request():
+                if guard:
+                    return await stream_ollama(session, f"{endpoint}/api/chat", body, guard, on_chunk=guard.chunk)
+                return await complete_ollama(session, f"{endpoint}/api/chat", body)
+
+            content, function_calls, usage = await call_with_resilience(
+                "ollama", request, self.retry_policy, can_retry=guard.can_retry if guard else None,
+                stream=guard
+            )
+
+            logger.info(f"Ollama usage: {usage}")
+            logger.info(f"LLM FUNCTIONS: {function_calls}")
+            return {
+                "content": content,
+                "timestamp": datetime.now().isoformat(),
+                "function_calls": function_calls,
+                "formatted_response": format_response(content) if content else None,
+                "streamed": bool(on_text),
+                "usage": usage
+            }
         except Exception as e:
             logger.error(f"Error calling Ollama API: {str(e)}")
             return {
@@ -445,4 +500,3 @@ class llm_wrapper:
                 "formatted_response": None,
                 "error": str(e)
             }
-
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+from lib.util import get_logger, WEBWRIGHT_DIR
+
+logger = get_logger()
+
+DEFAULT_TTL_SECONDS = 7 * 86400
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Result keys worth keeping; formatted_response is rebuilt on a hit
+CACHED_FIELDS = ("content", "function_calls", "usage")
+
+def normalize_messages(messages: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Reduces OmniLog entries to what the provider sees. Timestamps and entry
+    ids are dropped and tool call ids, which are random per call, are
+    replaced by their order of appearance.
+    """
+    call_ids = {}
+
+    def call_id(value):
+        return call_ids.setdefault(value, f"call_{len(call_ids)}")
+
+    normalized = []
+    for message in messages or []:
+        content = message.get("content")
+        if isinstance(content, list):
+            items = []
+            for item in content:
+                if isinstance(item, dict):
+                    item = dict(item)
+                    if item.get("type") == "tool_use" and "id" in item:
+                        item["id"] = call_id(item["id"])
+                    if "tool_call_id" in item:
+                        item["tool_call_id"] = call_id(item["tool_call_id"])
+                items.append(item)
+            content = items
+        normalized.append([message.get("type"), content])
+    return normalized
+
+class ResponseCache:
+    """
+    On-disk cache of LLM responses keyed by a hash of the normalized request:
+    provider, model, system prompt, messages and tool schemas.
+
+    Only plain text answers are stored; responses that call tools or carry
+    an error are never cached. Entries expire after `ttl` seconds, and the
+    least recently used are evicted beyond `max_entries` or `max_bytes`.
+    Hit and miss counters persist across runs.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path or os.path.join(WEBWRIGHT_DIR, 'llm_cache.sqlite3')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @staticmethod
+    def make_key(provider: str, model: Optional[str], system_prompt: Optional[str],
+                 messages: List[Dict[str, Any]], tools_digest: Optional[str] = None) -> str:
+        request = [provider, model, system_prompt, normalize_messages(messages), tools_digest]
+        canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _count(self, name: str):
+        self.conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                self._count("misses")
+                return None
+            self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self._count("hits")
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Dict[str, Any]) -> bool:
+        if response.get("error") or response.get("function_calls"):
+            return False
+        value = json.dumps({field: response.get(field) for field in CACHED_FIELDS}, default=str)
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now)
+            )
+            self._evict(now)
+        return True
+
+    def _evict(self, now: float):
+        self.conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Walk from least recently used until both limits are met again
+        removed = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            removed.append((key,))
+            count -= 1
+            total -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", removed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            counters = dict(self.conn.execute("SELECT name, value FROM counters").fetchall())
+        lifetime_hits, lifetime_misses = counters.get("hits", 0), counters.get("misses", 0)
+        lookups = lifetime_hits + lifetime_misses
+        return {
+            "entries": count,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "lifetime_hits": lifetime_hits,
+            "lifetime_misses": lifetime_misses,
+            "lifetime_hit_rate": lifetime_hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+_response_cache = None
+
+def get_response_cache(config=None) -> Optional[ResponseCache]:
+    """
+    Returns the shared response cache, or None unless LLM_RESPONSE_CACHE = true
+    in the [config] section. LLM_RESPONSE_CACHE_TTL_HOURS and
+    LLM_RESPONSE_CACHE_MAX_ENTRIES tune eviction.
+    """
+    global _response_cache
+    if config is None or (config.get_config_value("config", "LLM_RESPONSE_CACHE") or "false").lower() != "true":
+        return None
+    if _response_cache is None:
+        ttl_hours = config.get_config_value("config", "LLM_RESPONSE_CACHE_TTL_HOURS")
+        max_entries = config.get_config_value("config", "LLM_RESPONSE_CACHE_MAX_ENTRIES")
+        _response_cache = ResponseCache(
+            ttl=float(ttl_hours) * 3600 if ttl_hours else DEFAULT_TTL_SECONDS,
+            max_entries=int(max_entries) if max_entries else DEFAULT_MAX_ENTRIES
+        )
+    return _response_cache
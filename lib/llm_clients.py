@@ -0,0 +1,120 @@
+import os
+import sys
+import asyncio
+import importlib.util
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import aiohttp
+import openai
+import anthropic
+from openai import AsyncOpenAI
+from anthropic import AsyncAnthropic
+
+from lib.util import get_logger
+
+logger = get_logger()
+
+# HTTP/2 needs the optional `h2` package; without it httpx speaks HTTP/1.1 with keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_SECONDS = 120.0
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 600.0
+
+def _httpx_for(sdk):
+    # Recent openai and anthropic releases build on their own httpx fork
+    # (httpx2) and reject plain httpx clients; use whichever the SDK does
+    default_client = getattr(sdk, "DefaultAsyncHttpxClient", None)
+    if default_client is None:
+        return httpx
+    return sys.modules[default_client.__mro__[1].__module__.split(".")[0]]
+
+class ClientPool:
+    """
+    Long-lived provider clients, one per (provider, api key, base url).
+
+    Building a new AsyncOpenAI, AsyncAnthropic or aiohttp session per call
+    pays DNS, TCP and TLS setup on every request, including the per-tool
+    summarization calls. Pooled clients keep their connections alive between
+    calls. Clients are tied to the event loop that created them and are
+    rebuilt if a different loop asks for one. SDK retries are disabled;
+    lib.llm_resilience owns retry policy.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, Optional[str], Optional[str]], Tuple[Any, Any]] = {}
+
+    def _http_client(self, sdk) -> httpx.AsyncClient:
+        client_httpx = _httpx_for(sdk)
+        return client_httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=client_httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_SECONDS
+            ),
+            timeout=client_httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+        )
+
+    def _get(self, key, factory):
+        loop = asyncio.get_running_loop()
+        cached = self._clients.get(key)
+        if cached is not None:
+            client, client_loop = cached
+            if client_loop is loop and not client_loop.is_closed():
+                return client
+        client = factory()
+        self._clients[key] = (client, loop)
+        logger.info(f"Created pooled {key[0]} client (base_url={key[2] or 'default'}, http2={HTTP2_AVAILABLE})")
+        return client
+
+    def openai(self, api_key: str, base_url: Optional[str] = None) -> AsyncOpenAI:
+        return self._get(
+            ("openai", api_key, base_url),
+            lambda: AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=self._http_client(openai), max_retries=0)
+        )
+
+    def anthropic(self, api_key: str, base_url: Optional[str] = None) -> AsyncAnthropic:
+        return self._get(
+            ("anthropic", api_key, base_url),
+            lambda: AsyncAnthropic(api_key=api_key, base_url=base_url, http_client=self._http_client(anthropic), max_retries=0)
+        )
+
+    def ollama(self, endpoint: str) -> aiohttp.ClientSession:
+        return self._get(
+            ("ollama", None, endpoint),
+            lambda: aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS, keepalive_timeout=KEEPALIVE_SECONDS),
+                timeout=aiohttp.ClientTimeout(total=READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+            )
+        )
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        for key, (client, client_loop) in clients.items():
+            if client_loop is not asyncio.get_running_loop():
+                # Connections owned by another (usually closed) loop cannot be closed from here
+                continue
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Error closing {key[0]} client: {str(e)}")
+
+client_pool = ClientPool()
+
+def base_url_for(config, provider: str) -> Optional[str]:
+    """
+    Returns the base URL override for a provider from OPENAI_BASE_URL /
+    ANTHROPIC_BASE_URL in the environment or the [config] section.
+    """
+    key = f"{provider.upper()}_BASE_URL"
+    value = os.getenv(key)
+    if not value and config is not None:
+        value = config.get_config_value("config", key)
+    return value or None
+
+async def close_clients():
+    await client_pool.aclose()
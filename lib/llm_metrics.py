@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from lib.util import get_logger, WEBWRIGHT_DIR
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = get_logger()
+
+DEFAULT_METRICS_PATH = os.path.join(WEBWRIGHT_DIR, 'llm_metrics.json')
+
+# Upper bounds in seconds; a final +Inf bucket is implied
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+TTFT_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15)
+
+TOKEN_KINDS = ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")
+
+# Series are keyed by these labels
+Labels = Tuple[str, str, str]
+LABEL_NAMES = ("provider", "model", "outcome")
+
+class Histogram:
+    """
+    Bucket counts and their sum, as in a Prometheus histogram, but stored
+    per bucket rather than cumulatively: `counts[i]` holds observations in
+    (bounds[i-1], bounds[i]] and the last slot everything above the
+    largest bound.
+    """
+
+    def __init__(self, bounds: Tuple[float, ...], counts: Optional[List[int]] = None, total: float = 0.0):
+        self.bounds = tuple(bounds)
+        self.counts = list(counts) if counts else [0] * (len(self.bounds) + 1)
+        self.total = total
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimates the q-quantile by interpolating inside its bucket. Values
+        past the largest bound are reported as that bound.
+        """
+        count = self.count
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if index == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0.0
+                return lower + (self.bounds[index] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+    def merge(self, other: 'Histogram'):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"bounds": list(self.bounds), "counts": self.counts, "sum": self.total}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], bounds: Tuple[float, ...]) -> 'Histogram':
+        # Counts saved with different bounds cannot be merged; start over
+        if tuple(data.get("bounds", ())) != tuple(bounds):
+            return cls(bounds)
+        return cls(bounds, data.get("counts"), data.get("sum", 0.0))
+
+class Series:
+    """
+    Everything recorded for one provider, model and outcome.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.ttft = Histogram(TTFT_BUCKETS)
+        self.tokens = {kind: 0 for kind in TOKEN_KINDS}
+
+    def merge(self, other: 'Series'):
+        self.calls += other.calls
+        self.latency.merge(other.latency)
+        self.ttft.merge(other.ttft)
+        for kind in TOKEN_KINDS:
+            self.tokens[kind] += other.tokens.get(kind, 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "latency": self.latency.to_dict(), "ttft": self.ttft.to_dict(), "tokens": self.tokens}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Series':
+        series = cls()
+        series.calls = data.get("calls", 0)
+        series.latency = Histogram.from_dict(data.get("latency", {}), LATENCY_BUCKETS)
+        series.ttft = Histogram.from_dict(data.get("ttft", {}), TTFT_BUCKETS)
+        series.tokens.update(data.get("tokens", {}))
+        return series
+
+class CallTimer:
+    """
+    Times one provider call. Wrap the streaming callback with `on_text` so
+    the first text delta marks time to first token.
+    """
+
+    def __init__(self, on_text=None):
+        self.started = time.monotonic()
+        self.first_token: Optional[float] = None
+        self._on_text = on_text
+
+    def on_text(self, text: str):
+        if self.first_token is None:
+            self.first_token = time.monotonic() - self.started
+        self._on_text(text)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+class LLMMetrics:
+    """
+    In-process histograms of LLM call wall time and time to first token,
+    with token counters, per provider, model and outcome. Totals are kept
+    across runs in `path`, which `webwright stats` reads.
+
+    Several shells may share the file, so each save adds only what this
+    process recorded since its last save to the totals on disk, under a
+    file lock, rather than overwriting them.
+    """
+
+    def __init__(self, path: Optional[str] = None, save_interval: float = 5.0):
+        self.path = path or DEFAULT_METRICS_PATH
+        self.save_interval = save_interval
+        self.series: Dict[Labels, Series] = {}
+        # Recorded here but not yet added to the file
+        self.unsaved: Dict[Labels, Series] = {}
+        self.since = time.time()
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+        self.load()
+
+    def record(self, provider: str, model: Optional[str], outcome: str, seconds: float,
+               ttft: Optional[float] = None, usage: Optional[Dict[str, int]] = None):
+        labels = (provider or "unknown", model or "default", outcome)
+        with self._lock:
+            for series in (self.series.setdefault(labels, Series()), self.unsaved.setdefault(labels, Series())):
+                series.calls += 1
+                series.latency.observe(seconds)
+                if ttft is not None:
+                    series.ttft.observe(ttft)
+                for kind in TOKEN_KINDS:
+                    series.tokens[kind] += (usage or {}).get(kind, 0) or 0
+        logger.debug(f"LLM call {'/'.join(labels)}: {seconds:.2f}s" + (f", first token {ttft:.2f}s" if ttft is not None else "") + f", usage {usage or {}}")
+        if time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        The JSON view for `webwright stats`: calls, tokens and latency/TTFT
+        percentiles per series.
+        """
+        def percentiles(histogram: Histogram) -> Dict[str, Any]:
+            count = histogram.count
+            return {
+                "count": count,
+                "mean": histogram.total / count if count else None,
+                "p50": histogram.quantile(0.5),
+                "p90": histogram.quantile(0.9),
+                "p99": histogram.quantile(0.99),
+            }
+
+        with self._lock:
+            series = [{
+                **dict(zip(LABEL_NAMES, labels)),
+                "calls": series.calls,
+                "tokens": dict(series.tokens),
+                "latency_seconds": percentiles(series.latency),
+                "ttft_seconds": percentiles(series.ttft),
+            } for labels, series in sorted(self.series.items())]
+        return {"since": self.since, "series": series}
+
+    def prometheus(self) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def label_text(labels: Labels, **extra) -> str:
+            pairs = list(zip(LABEL_NAMES, labels)) + list(extra.items())
+            return ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs)
+
+        def histogram(name: str, help_text: str, pick):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, series in sorted(self.series.items()):
+                h = pick(series)
+                cumulative = 0
+                for bound, count in zip(list(h.bounds) + ["+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{{{label_text(labels, le=bound)}}} {cumulative}")
+                lines.append(f"{name}_sum{{{label_text(labels)}}} {h.total}")
+                lines.append(f"{name}_count{{{label_text(labels)}}} {h.count}")
+
+        with self._lock:
+            lines.append("# HELP webwright_llm_calls_total LLM provider calls")
+            lines.append("# TYPE webwright_llm_calls_total counter")
+            for labels, series in sorted(self.series.items()):
+                lines.append(f"webwright_llm_calls_total{{{label_text(labels)}}} {series.calls}")
+
+            histogram("webwright_llm_request_seconds", "Wall time of LLM provider calls", lambda s: s.latency)
+            histogram("webwright_llm_ttft_seconds", "Time to first streamed token", lambda s: s.ttft)
+
+            lines.append("# HELP webwright_llm_tokens_total Tokens by kind")
+            lines.append("# TYPE webwright_llm_tokens_total counter")
+            for labels, series in sorted(self.series.items()):
+                for kind in TOKEN_KINDS:
+                    lines.append(f"webwright_llm_tokens_total{{{label_text(labels, kind=kind[:-len('_tokens')])}}} {series.tokens[kind]}")
+        return "\n".join(lines) + "\n"
+
+    def _read(self) -> Tuple[Optional[float], Dict[Labels, Series]]:
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None, {}
+        series = {}
+        for item in saved.get("series", []):
+            labels = tuple(item.get(name, "") for name in LABEL_NAMES)
+            series[labels] = Series.from_dict(item)
+        return saved.get("since"), series
+
+    def _write(self, since: float, series: Dict[Labels, Series]):
+        data = {"since": since, "series": [
+            {**dict(zip(LABEL_NAMES, labels)), **item.to_dict()} for labels, item in sorted(series.items())
+        ]}
+        # Per-process temp name, so two shells saving at once never share one
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+    def _locked(self):
+        lock_file = open(f"{self.path}.lock", "a")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def load(self):
+        since, series = self._read()
+        with self._lock:
+            self.since = since or self.since
+            self.series = series
+            # Keep this process's unsaved calls in view
+            for labels, unsaved in self.unsaved.items():
+                self.series.setdefault(labels, Series()).merge(unsaved)
+
+    def save(self):
+        """
+        Adds the calls recorded since the last save to the totals on disk.
+        """
+        try:
+            with self._locked():
+                since, series = self._read()
+                with self._lock:
+                    unsaved, self.unsaved = self.unsaved, {}
+                for labels, item in unsaved.items():
+                    series.setdefault(labels, Series()).merge(item)
+                try:
+                    self._write(since or self.since, series)
+                except OSError:
+                    with self._lock:
+                        for labels, item in unsaved.items():
+                            self.unsaved.setdefault(labels, Series()).merge(item)
+                    raise
+            self._saved_at = time.monotonic()
+            self.load()
+        except OSError as e:
+            logger.warning(f"Could not save LLM metrics to {self.path}: {e}")
+
+    def reset(self):
+        with self._lock:
+            self.series.clear()
+            self.unsaved.clear()
+            self.since = time.time()
+        try:
+            with self._locked():
+                self._write(self.since, {})
+        except OSError as e:
+            logger.warning(f"Could not reset LLM metrics in {self.path}: {e}")
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+_metrics = None
+
+def get_metrics() -> LLMMetrics:
+    """
+    Returns the process-wide metrics, loading the saved totals on first use.
+    """
+    global _metrics
+    if _metrics is None:
+        _metrics = LLMMetrics()
+    return _metrics
+
+def save_metrics():
+    if _metrics is not None:
+        _metrics.save()
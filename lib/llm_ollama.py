@@ -0,0 +1,87 @@
+import os
+import json
+from typing import Any, Dict, Optional
+
+from lib.llm_clients import client_pool
+from lib.context_builder import DEFAULT_CONTEXT_WINDOW
+from lib.util import get_logger
+
+logger = get_logger()
+
+DEFAULT_ENDPOINT = "http://localhost:11434"
+
+# Ollama unloads a model after 5 minutes idle and defaults to a 2048 token
+# window, which the system prompt and tool schemas alone can overflow
+DEFAULT_KEEP_ALIVE = "30m"
+DEFAULT_NUM_CTX = DEFAULT_CONTEXT_WINDOW
+
+def ollama_settings(config=None) -> Dict[str, Any]:
+    """
+    Returns the keep_alive and options sent with every Ollama request, from
+    OLLAMA_KEEP_ALIVE (a duration such as "30m", or -1 to keep the model
+    loaded), OLLAMA_NUM_CTX and OLLAMA_OPTIONS (a JSON object of any other
+    model options, e.g. {"temperature": 0.2}) in the [config] section.
+    """
+    def value(key):
+        return config.get_config_value("config", key) if config is not None else None
+
+    options = {"num_ctx": int(value("OLLAMA_NUM_CTX") or DEFAULT_NUM_CTX)}
+    extra = value("OLLAMA_OPTIONS")
+    if extra:
+        try:
+            options.update(json.loads(extra))
+        except json.JSONDecodeError:
+            logger.error(f"Ignoring OLLAMA_OPTIONS, not a JSON object: {extra}")
+
+    keep_alive = value("OLLAMA_KEEP_ALIVE") or DEFAULT_KEEP_ALIVE
+    # Ollama reads bare numbers as seconds, but only when sent as numbers
+    if keep_alive.lstrip('-').isdigit():
+        keep_alive = int(keep_alive)
+    return {"keep_alive": keep_alive, "options": options}
+
+def request_body(api_params: Dict[str, Any], tools=None) -> bytes:
+    """
+    Serializes a chat request once, so retries resend the same bytes. The
+    compiled tool schemas are spliced in from their cached serialization
+    instead of being encoded again on every call.
+    """
+    body = json.dumps(api_params, separators=(',', ':'))
+    if tools:
+        body = f'{body[:-1]},"tools":{tools.serialized.decode("utf-8")}}}'
+    return body.encode('utf-8')
+
+def ollama_endpoint(config=None) -> str:
+    # Unlike config.get_ollama_endpoint, never prompts; used where no dialog can run
+    endpoint = os.getenv("OLLAMA_API_ENDPOINT")
+    if not endpoint and config is not None:
+        endpoint = config.get_config_value("config", "OLLAMA_API_ENDPOINT")
+    return (endpoint or DEFAULT_ENDPOINT).rstrip('/')
+
+def ollama_in_use(config) -> bool:
+    if config.get_config_value("config", "PREFERRED_API") == "ollama":
+        return True
+    providers = config.get_config_value("router", "providers") or ""
+    return any(item.strip().lower().startswith("ollama") for item in providers.split(','))
+
+async def preload_model(config, model: Optional[str] = None) -> bool:
+    """
+    Loads the Ollama model into memory with the configured keep_alive and
+    context size, so the first question does not pay for the cold load.
+    A chat request without messages only loads the model. It carries the
+    same options as chat requests; a different num_ctx would reload it.
+    """
+    model = model or config.get_config_value("config", "OLLAMA_MODEL")
+    if not model:
+        return False
+    endpoint = ollama_endpoint(config)
+    payload = {"model": model, "messages": [], "stream": False, **ollama_settings(config)}
+    try:
+        session = client_pool.ollama(endpoint)
+        async with session.post(f"{endpoint}/api/chat", json=payload) as response:
+            response.raise_for_status()
+            result = await response.json()
+    except Exception as e:
+        logger.warning(f"Could not preload Ollama model {model}: {str(e)}")
+        return False
+    logger.info(f"Preloaded Ollama model {model} in {result.get('load_duration', 0) / 1e9:.1f}s")
+    return True
@@ -0,0 +1,292 @@
+import time
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+import openai
+import anthropic
+from tenacity import AsyncRetrying, RetryError, retry_if_exception, wait_random_exponential
+
+from lib.util import get_logger
+
+logger = get_logger()
+
+# 529 is Anthropic's "overloaded"; 408/409/425 are safe to replay
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+# Rate limiting means the provider is up but busy, so it does not trip the breaker
+BREAKER_IGNORED_STATUSES = {429}
+
+CONNECTION_ERRORS = (
+    openai.APIConnectionError,
+    anthropic.APIConnectionError,
+    aiohttp.ClientConnectionError,
+    asyncio.TimeoutError,
+    ConnectionError,
+)
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+class DeadlineExceededError(Exception):
+    """Raised when a request, retries included, gets no response before its deadline."""
+
+def error_status(exc: BaseException) -> Optional[int]:
+    # openai/anthropic APIStatusError use status_code, aiohttp ClientResponseError uses status
+    status = getattr(exc, 'status_code', None) or getattr(exc, 'status', None)
+    return status if isinstance(status, int) else None
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (CircuitOpenError, DeadlineExceededError)):
+        return False
+    if isinstance(exc, CONNECTION_ERRORS):
+        return True
+    return error_status(exc) in RETRYABLE_STATUSES
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """
+    Returns the server-requested delay in seconds from Retry-After (seconds or
+    an HTTP date) or retry-after-ms, if the error carries response headers.
+    """
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or getattr(exc, 'headers', None)
+    if not headers:
+        return None
+
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff bounded by an attempt limit and a deadline.
+    The deadline covers connecting and waiting for the first chunk, retries
+    included; a stream that is under way may run as long as it needs, but
+    fails once no chunk has arrived for `idle_timeout` seconds. A Retry-After
+    header from the provider replaces the computed delay, as long as it
+    still fits before the deadline.
+    """
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 20.0, deadline: float = 120.0,
+                 idle_timeout: float = 60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.idle_timeout = idle_timeout
+
+    @classmethod
+    def from_config(cls, config=None) -> 'RetryPolicy':
+        policy = cls()
+        if config is not None:
+            for attribute, key, cast in (('max_attempts', 'LLM_MAX_ATTEMPTS', int),
+                                         ('deadline', 'LLM_DEADLINE_SECONDS', float),
+                                         ('idle_timeout', 'LLM_IDLE_TIMEOUT_SECONDS', float)):
+                value = config.get_config_value("config", key)
+                if value:
+                    setattr(policy, attribute, cast(value))
+        return policy
+
+class CircuitBreaker:
+    """
+    Per-provider breaker. After `failure_threshold` consecutive provider
+    failures the circuit opens and calls fail fast with CircuitOpenError.
+    Once `recovery_timeout` has passed, one trial call is let through
+    (half-open); its success closes the circuit, its failure reopens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                waited = time.monotonic() - self.opened_at
+                if waited < self.recovery_timeout:
+                    raise CircuitOpenError(
+                        f"{self.name} API is unavailable; retrying in {self.recovery_timeout - waited:.0f}s"
+                    )
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError(f"{self.name} API is recovering; a trial request is in flight")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release(self):
+        # A cancelled trial says nothing either way; let the next call try
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self, exc: BaseException):
+        if not is_retryable(exc) or error_status(exc) in BREAKER_IGNORED_STATUSES:
+            # Bad requests and rate limits say nothing about provider health
+            with self._lock:
+                self._trial_in_flight = False
+            return
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit for {self.name} opened after {self.failures} failures: {exc}")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+class StreamGuard:
+    """
+    Wraps a streaming on_text callback and records whether any text reached
+    the user; once it has, the request must not be retried. The stream
+    reports every chunk it receives to `chunk`, which is how the deadline
+    and idle timeout see that the response is under way.
+    """
+
+    def __init__(self, on_text: Callable[[str], None]):
+        self.on_text = on_text
+        self.started = False
+        self.last_chunk_at: Optional[float] = None
+
+    def __call__(self, text: str):
+        self.started = True
+        self.on_text(text)
+
+    def chunk(self):
+        self.last_chunk_at = time.monotonic()
+
+    def can_retry(self) -> bool:
+        return not self.started
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def circuit_breaker(provider: str) -> CircuitBreaker:
+    if provider not in _breakers:
+        _breakers[provider] = CircuitBreaker(provider)
+    return _breakers[provider]
+
+async def call_with_resilience(provider: str, request: Callable[[], Awaitable[Any]], policy: Optional[RetryPolicy] = None,
+                               can_retry: Optional[Callable[[], bool]] = None, breaker: Optional[CircuitBreaker] = None,
+                               stream: Optional[StreamGuard] = None) -> Any:
+    """
+    Runs `request` under the provider's circuit breaker, retrying retryable
+    failures per `policy` until it succeeds, attempts run out or the deadline
+    passes. `can_retry` is checked before each retry; a stream that has
+    already shown tokens to the user returns False so output is not repeated.
+    With `stream`, the deadline stops at the first chunk and the idle
+    timeout takes over; without it the deadline covers the whole response.
+    """
+    policy = policy or RetryPolicy()
+    breaker = breaker or circuit_breaker(provider)
+    started = time.monotonic()
+    backoff = wait_random_exponential(multiplier=policy.base_delay, max=policy.max_delay)
+
+    def remaining() -> float:
+        return policy.deadline - (time.monotonic() - started)
+
+    def should_retry(exc: BaseException) -> bool:
+        return is_retryable(exc) and (can_retry is None or can_retry())
+
+    delays = {}
+
+    def next_delay(retry_state) -> float:
+        # Computed once per attempt; both the stop check and the wait need it
+        if retry_state.attempt_number not in delays:
+            delay = retry_after(retry_state.outcome.exception())
+            delays[retry_state.attempt_number] = backoff(retry_state) if delay is None else delay
+        return delays[retry_state.attempt_number]
+
+    def stop(retry_state) -> bool:
+        if retry_state.attempt_number >= policy.max_attempts:
+            return True
+        # Sleeping past the deadline would only delay the failure
+        return next_delay(retry_state) >= remaining()
+
+    def wait(retry_state) -> float:
+        delay = next_delay(retry_state)
+        logger.warning(f"{provider} call failed ({retry_state.outcome.exception()}); retry {retry_state.attempt_number} in {delay:.2f}s")
+        return delay
+
+    async def watch(task: asyncio.Future, attempt_started: float) -> Any:
+        while True:
+            last_chunk_at = stream.last_chunk_at if stream else None
+            if last_chunk_at is None or last_chunk_at < attempt_started:
+                stalled, timeout = False, remaining()
+            else:
+                stalled, timeout = True, policy.idle_timeout - (time.monotonic() - last_chunk_at)
+            if timeout > 0:
+                done, _ = await asyncio.wait({task}, timeout=timeout)
+                if done:
+                    return task.result()
+                # A chunk may have arrived meanwhile; look again before giving up
+                continue
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            if stalled:
+                raise asyncio.TimeoutError(f"{provider} stream stalled: nothing received for {policy.idle_timeout:.0f}s")
+            raise DeadlineExceededError(f"{provider} sent no response within its {policy.deadline:.0f}s deadline")
+
+    async def attempt():
+        breaker.before_call()
+        task = asyncio.ensure_future(request())
+        try:
+            result = await watch(task, time.monotonic())
+        except DeadlineExceededError:
+            # The caller's own budget ran out, which says nothing about the provider
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        except BaseException:
+            # Cancelled (a lost hedge, Ctrl-C): neither success nor failure
+            task.cancel()
+            breaker.release()
+            raise
+        breaker.record_success()
+        return result
+
+    retrying = AsyncRetrying(
+        stop=stop,
+        wait=wait,
+        retry=retry_if_exception(should_retry),
+        reraise=True,
+    )
+    try:
+        return await retrying(attempt)
+    except RetryError as e:
+        raise e.last_attempt.exception()
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from lib.util import get_logger, WEBWRIGHT_DIR
+from lib.llm_resilience import CircuitBreaker, circuit_breaker
+
+logger = get_logger()
+
+DEFAULT_STATS_PATH = os.path.join(WEBWRIGHT_DIR, 'router_stats.json')
+
+# (provider, model); a None model means the provider's configured default
+Candidate = Tuple[str, Optional[str]]
+
+def candidate_name(candidate: Candidate) -> str:
+    provider, model = candidate
+    return f"{provider}:{model}" if model else provider
+
+def parse_candidates(value: str) -> List[Candidate]:
+    """
+    Parses "anthropic, openai:gpt-4o-mini, ollama" into (provider, model) pairs.
+    """
+    candidates = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        provider, _, model = item.partition(':')
+        candidates.append((provider.strip().lower(), model.strip() or None))
+    return candidates
+
+def failed(outcome: Any) -> bool:
+    # An outcome is a result dict, which carries "error" on failure, or a raised exception
+    return isinstance(outcome, Exception) or not outcome or bool(outcome.get("error"))
+
+def error_of(outcome: Any) -> Optional[str]:
+    return str(outcome) if isinstance(outcome, Exception) else (outcome or {}).get("error")
+
+class ProviderStats:
+    """
+    Exponentially weighted latency and error rate for one provider and model.
+    Each new sample moves the average `alpha` of the way towards it, so a
+    provider that slows down or starts failing is noticed within a few calls.
+    """
+
+    def __init__(self, alpha: float = 0.3, latency: Optional[float] = None, error_rate: float = 0.0,
+                 calls: int = 0, errors: int = 0, last_error: Optional[str] = None, updated: float = 0.0):
+        self.alpha = alpha
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = calls
+        self.errors = errors
+        self.last_error = last_error
+        self.updated = updated
+
+    def _observe_latency(self, seconds: float):
+        self.latency = seconds if self.latency is None else self.latency + self.alpha * (seconds - self.latency)
+
+    def record(self, seconds: float, ok: bool, error: Optional[str] = None):
+        self.calls += 1
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self._observe_latency(seconds)
+        else:
+            self.errors += 1
+            self.last_error = error
+        self.updated = time.time()
+
+    def record_abandoned(self, seconds: float):
+        # A hedged call cancelled after `seconds` took at least that long
+        if self.latency is None or seconds > self.latency:
+            self._observe_latency(seconds)
+            self.updated = time.time()
+
+    def expected_latency(self) -> Optional[float]:
+        """
+        Latency scaled up by the chance of having to try again elsewhere.
+        None until the first successful call.
+        """
+        if self.latency is None:
+            return None
+        return self.latency / max(1.0 - self.error_rate, 0.05)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "calls": self.calls,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "updated": self.updated,
+        }
+
+class RouterPolicy:
+    """
+    Which providers to use and how. Candidates are tried in the order the
+    router ranks them; the configured order breaks ties and decides until
+    there are measurements.
+    """
+
+    def __init__(self, candidates: List[Candidate], hedge_delay: Optional[float] = None, fallback: bool = True,
+                 alpha: float = 0.3, max_error_rate: float = 0.5, recovery: float = 60.0):
+        self.candidates = candidates
+        self.hedge_delay = hedge_delay
+        self.fallback = fallback
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.recovery = recovery
+
+    @classmethod
+    def from_config(cls, config=None) -> Optional['RouterPolicy']:
+        """
+        Reads the [router] section of the webwright config, e.g.
+
+            [router]
+            providers = anthropic, openai:gpt-4o-mini
+            hedge_delay_ms = 2500
+            fallback = true
+            ewma_alpha = 0.3
+            max_error_rate = 0.5
+            recovery_seconds = 60
+
+        Returns None when no providers are listed.
+        """
+        if config is None:
+            return None
+        providers = config.get_config_value("router", "providers")
+        candidates = parse_candidates(providers) if providers else []
+        if not candidates:
+            return None
+
+        policy = cls(candidates)
+        hedge_delay_ms = config.get_config_value("router", "hedge_delay_ms")
+        if hedge_delay_ms and float(hedge_delay_ms) > 0:
+            policy.hedge_delay = float(hedge_delay_ms) / 1000
+        fallback = config.get_config_value("router", "fallback")
+        if fallback:
+            policy.fallback = fallback.lower() != "false"
+        for attribute, key in (('alpha', 'ewma_alpha'), ('max_error_rate', 'max_error_rate'), ('recovery', 'recovery_seconds')):
+            value = config.get_config_value("router", key)
+            if value:
+                setattr(policy, attribute, float(value))
+        return policy
+
+class Router:
+    """
+    Sends each request to the provider most likely to answer quickly.
+
+    Candidates are ranked by expected latency, with those whose circuit is
+    open or whose error rate is above the policy limit moved to the back
+    until they recover. With a hedge delay, a request the first candidate
+    has not answered by then is also sent to the second; the first good
+    response wins and the other call is cancelled. With fallback, a failed
+    request moves on to the next candidate. Stats are written to `path`
+    after every request.
+    """
+
+    def __init__(self, policy: RouterPolicy, path: Optional[str] = None):
+        self.policy = policy
+        self.path = path or DEFAULT_STATS_PATH
+        self.stats: Dict[str, ProviderStats] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def stats_for(self, candidate: Candidate) -> ProviderStats:
+        name = candidate_name(candidate)
+        if name not in self.stats:
+            self.stats[name] = ProviderStats(self.policy.alpha)
+        return self.stats[name]
+
+    def _healthy(self, candidate: Candidate) -> bool:
+        breaker = circuit_breaker(candidate[0])
+        if breaker.state == CircuitBreaker.OPEN and time.monotonic() - breaker.opened_at < breaker.recovery_timeout:
+            return False
+        # A failing candidate is demoted until `recovery` seconds pass without news of it
+        stats = self.stats_for(candidate)
+        return stats.error_rate <= self.policy.max_error_rate or time.time() - stats.updated >= self.policy.recovery
+
+    def rank(self) -> List[Candidate]:
+        def key(indexed):
+            position, candidate = indexed
+            expected = self.stats_for(candidate).expected_latency()
+            # Unmeasured candidates keep their configured place behind measured ones
+            return (not self._healthy(candidate), expected is None, expected or 0.0, position)
+        return [candidate for _, candidate in sorted(enumerate(self.policy.candidates), key=key)]
+
+    async def _attempt(self, call: Callable[[str, Optional[str]], Awaitable[Dict[str, Any]]], candidate: Candidate) -> Dict[str, Any]:
+        stats = self.stats_for(candidate)
+        started = time.monotonic()
+        try:
+            result = await call(*candidate)
+        except asyncio.CancelledError:
+            stats.record_abandoned(time.monotonic() - started)
+            raise
+        except Exception as e:
+            stats.record(time.monotonic() - started, ok=False, error=str(e))
+            raise
+        stats.record(time.monotonic() - started, ok=not failed(result), error=(result or {}).get("error"))
+        return result
+
+    async def _hedged(self, call, first: Candidate, second: Candidate) -> Tuple[Any, List[Candidate]]:
+        primary = asyncio.ensure_future(self._attempt(call, first))
+        done, _ = await asyncio.wait({primary}, timeout=self.policy.hedge_delay)
+        if done:
+            return _outcome(primary), [first]
+
+        logger.info(f"Router: {candidate_name(first)} slower than {self.policy.hedge_delay:.2f}s, hedging with {candidate_name(second)}")
+        tasks = {primary: first, asyncio.ensure_future(self._attempt(call, second)): second}
+        pending = set(tasks)
+        result = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = _outcome(task)
+                    if not failed(result):
+                        logger.info(f"Router: {candidate_name(tasks[task])} answered first")
+                        return result, list(tasks.values())
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        return result, list(tasks.values())
+
+    async def route(self, call: Callable[[str, Optional[str]], Awaitable[Dict[str, Any]]],
+                    hedge: bool = True, can_fallback: Optional[Callable[[], bool]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Calls `call(provider, model)` for the best candidate and returns its
+        result dict, hedging and falling back per the policy. Pass hedge=False
+        for streamed requests, which must not print two answers, and a
+        `can_fallback` that turns False once output has reached the user.
+        """
+        ranked = self.rank()
+        try:
+            if hedge and self.policy.hedge_delay is not None and len(ranked) > 1:
+                result, tried = await self._hedged(call, ranked[0], ranked[1])
+            else:
+                result, tried = await _settle(self._attempt(call, ranked[0])), [ranked[0]]
+
+            if self.policy.fallback:
+                for candidate in ranked:
+                    if not failed(result) or (can_fallback is not None and not can_fallback()):
+                        break
+                    if candidate in tried:
+                        continue
+                    logger.warning(f"Router: falling back to {candidate_name(candidate)} after: {error_of(result)}")
+                    result = await _settle(self._attempt(call, candidate))
+                    tried.append(candidate)
+        finally:
+            self.save()
+
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, values in saved.get("providers", {}).items():
+            self.stats[name] = ProviderStats(self.policy.alpha, **values)
+
+    def save(self):
+        data = {
+            "updated": time.time(),
+            "providers": {name: stats.to_dict() for name, stats in self.stats.items()},
+        }
+        temp_path = f"{self.path}.tmp"
+        with self._lock:
+            try:
+                with open(temp_path, "w") as f:
+                    json.dump(data, f, indent=2)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Could not save router stats to {self.path}: {e}")
+
+async def _settle(awaitable: Awaitable[Any]) -> Any:
+    # Exceptions are returned so the next candidate can still be tried
+    try:
+        return await awaitable
+    except Exception as e:
+        return e
+
+def _outcome(task: "asyncio.Future") -> Any:
+    return task.exception() or task.result()
+
+_router = None
+
+def get_router(config=None) -> Optional[Router]:
+    """
+    Returns the shared router, or None unless [router] providers is set.
+    """
+    global _router
+    if _router is None:
+        policy = RouterPolicy.from_config(config)
+        if policy is None:
+            return None
+        _router = Router(policy)
+    return _router
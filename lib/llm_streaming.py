@@ -0,0 +1,217 @@
+import json
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from lib.util import get_logger
+
+logger = get_logger()
+
+TextCallback = Optional[Callable[[str], None]]
+ChunkCallback = Optional[Callable[[], None]]
+
+class ToolCallAccumulator:
+    """
+    Rebuilds complete tool calls from streamed deltas. Providers send the
+    id and name once and the JSON arguments in fragments, keyed by index.
+    """
+
+    def __init__(self):
+        self._calls: Dict[int, Dict[str, Any]] = {}
+
+    def add(self, index: int, call_id: Optional[str] = None, name: Optional[str] = None, arguments: Optional[str] = None):
+        call = self._calls.setdefault(index, {"id": None, "name": None, "arguments": ""})
+        if call_id:
+            call["id"] = call_id
+        if name:
+            call["name"] = name
+        if arguments:
+            call["arguments"] += arguments
+
+    def function_calls(self) -> List[Dict[str, Any]]:
+        function_calls = []
+        for index in sorted(self._calls):
+            call = self._calls[index]
+            try:
+                arguments = json.loads(call["arguments"]) if call["arguments"] else {}
+            except json.JSONDecodeError:
+                logger.error(f"Failed to parse streamed arguments for {call['name']}: {call['arguments']}")
+                arguments = {}
+            function_calls.append({"id": call["id"], "name": call["name"], "arguments": arguments})
+        return function_calls
+
+def anthropic_usage(usage) -> Dict[str, int]:
+    """
+    Normalizes Anthropic usage, including prompt-cache reads and writes.
+    """
+    if usage is None:
+        return {}
+    return {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        "cache_read_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+        "cache_write_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+    }
+
+def openai_usage(usage) -> Dict[str, int]:
+    """
+    Normalizes OpenAI usage. OpenAI caches long prompt prefixes automatically
+    and reports hits as cached_tokens; it has no separate write charge.
+    """
+    if usage is None:
+        return {}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cache_read_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+        "cache_write_tokens": 0,
+    }
+
+def ollama_usage(chunk: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Normalizes the counts on Ollama's final chunk. Prompt tokens still in the
+    model's KV cache from the previous call are not evaluated or counted.
+    """
+    return {
+        "input_tokens": chunk.get("prompt_eval_count", 0) or 0,
+        "output_tokens": chunk.get("eval_count", 0) or 0,
+        "cache_read_tokens": 0,
+        "cache_write_tokens": 0,
+    }
+
+def ollama_function_calls(tool_calls: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Maps Ollama tool calls onto webwright function calls. Ollama sends the
+    arguments as an object and, in most versions, no id, so one is made up
+    for pairing the call with its result.
+    """
+    function_calls = []
+    for tool_call in tool_calls or []:
+        function = tool_call.get("function", {})
+        arguments = function.get("arguments") or {}
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError:
+                logger.error(f"Failed to parse Ollama arguments for {function.get('name')}: {arguments}")
+                arguments = {}
+        function_calls.append({
+            "id": tool_call.get("id") or f"call_{uuid.uuid4().hex[:24]}",
+            "name": function.get("name"),
+            "arguments": arguments
+        })
+    return function_calls
+
+def _log_ollama_load(chunk: Dict[str, Any]):
+    load_seconds = (chunk.get("load_duration", 0) or 0) / 1e9
+    if load_seconds > 1:
+        logger.warning(f"Ollama spent {load_seconds:.1f}s loading {chunk.get('model')}; raise OLLAMA_KEEP_ALIVE to keep it loaded")
+
+def _emit(on_text: TextCallback, text: str):
+    if text and on_text:
+        on_text(text)
+
+def _tick(on_chunk: ChunkCallback):
+    if on_chunk:
+        on_chunk()
+
+async def stream_openai(client, api_params: Dict[str, Any], on_text: TextCallback = None,
+                        on_chunk: ChunkCallback = None) -> Tuple[str, List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Streams a chat completion, passing text deltas to on_text and calling
+    on_chunk for every chunk received. Returns the full content, the assembled function calls and usage.
+    """
+    content = ""
+    usage = {}
+    tool_calls = ToolCallAccumulator()
+    stream = await client.chat.completions.create(**api_params, stream=True, stream_options={"include_usage": True})
+    async for chunk in stream:
+        _tick(on_chunk)
+        if getattr(chunk, "usage", None):
+            usage = openai_usage(chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content += delta.content
+            _emit(on_text, delta.content)
+        for tool_call in delta.tool_calls or []:
+            function = tool_call.function
+            tool_calls.add(
+                tool_call.index,
+                call_id=tool_call.id,
+                name=function.name if function else None,
+                arguments=function.arguments if function else None
+            )
+    return content, tool_calls.function_calls(), usage
+
+async def stream_anthropic(client, api_params: Dict[str, Any], on_text: TextCallback = None,
+                           on_chunk: ChunkCallback = None) -> Tuple[str, List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Streams an Anthropic message, passing text deltas to on_text and calling
+    on_chunk for every event received. Returns the full content, the assembled tool_use blocks as function calls and usage.
+    """
+    content = ""
+    usage = {}
+    tool_calls = ToolCallAccumulator()
+    stream = await client.messages.create(**api_params, stream=True)
+    async for event in stream:
+        _tick(on_chunk)
+        if event.type == "message_start":
+            # Input and cache token counts arrive up front, output tokens at the end
+            usage = anthropic_usage(event.message.usage)
+        elif event.type == "message_delta" and getattr(event, "usage", None):
+            usage["output_tokens"] = event.usage.output_tokens
+        elif event.type == "content_block_start" and event.content_block.type == "tool_use":
+            tool_calls.add(event.index, call_id=event.content_block.id, name=event.content_block.name)
+        elif event.type == "content_block_delta":
+            if event.delta.type == "text_delta":
+                content += event.delta.text
+                _emit(on_text, event.delta.text)
+            elif event.delta.type == "input_json_delta":
+                tool_calls.add(event.index, arguments=event.delta.partial_json)
+    return content, tool_calls.function_calls(), usage
+
+async def stream_ollama(session, url: str, body: bytes, on_text: TextCallback = None,
+                        on_chunk: ChunkCallback = None) -> Tuple[str, List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Streams an Ollama chat, which arrives as one JSON object per line. `body`
+    is the serialized request with "stream": true. Tool calls come whole,
+    in whichever chunk the model finishes them; counts come on the last one.
+    """
+    content = ""
+    tool_calls = []
+    usage = {}
+    async with session.post(url, data=body, headers={"Content-Type": "application/json"}) as response:
+        response.raise_for_status()
+        async for line in response.content:
+            _tick(on_chunk)
+            line = line.strip()
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise Exception(chunk["error"])
+            message = chunk.get("message", {})
+            text = message.get("content", "")
+            content += text
+            _emit(on_text, text)
+            tool_calls.extend(message.get("tool_calls") or [])
+            if chunk.get("done"):
+                usage = ollama_usage(chunk)
+                _log_ollama_load(chunk)
+                break
+    return content, ollama_function_calls(tool_calls), usage
+
+async def complete_ollama(session, url: str, body: bytes) -> Tuple[str, List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Non-streaming counterpart of stream_ollama; `body` has "stream": false.
+    """
+    async with session.post(url, data=body, headers={"Content-Type": "application/json"}) as response:
+        response.raise_for_status()
+        result = await response.json()
+    if result.get("error"):
+        raise Exception(result["error"])
+    _log_ollama_load(result)
+    message = result.get("message", {})
+    return message.get("content", ""), ollama_function_calls(message.get("tool_calls")), ollama_usage(result)
@@ -1,9 +1,18 @@
 import json
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 import chromadb
 import tempfile
 import shutil
+import threading
+import atexit
+import hashlib
+import uuid
+from collections import OrderedDict
+
+from lib.omnilog_index import OmniLogIndex, LEGACY_PARTITION
+from lib.omnilog_blobs import BlobStore
+from lib.embedding import Embedder, EmbeddingCache, CachedEmbeddingFunction, OnnxMiniLMEmbedder
 
 import logging
 logging.basicConfig(level=logging.DEBUG)
@@ -11,8 +20,36 @@ logger = logging.getLogger(__name__)
 
 import os
 
+def _timestamp_to_epoch(timestamp: str) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+SCOPES = ('session', 'project', 'all')
+
+def find_project_root(path: str) -> str:
+    """
+    Returns the enclosing git repository root of `path`, or `path` itself outside a repository.
+    """
+    current = os.path.abspath(path)
+    while True:
+        if os.path.exists(os.path.join(current, '.git')):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return os.path.abspath(path)
+        current = parent
+
+def partition_name(project_root: str) -> str:
+    digest = hashlib.sha1(project_root.encode('utf-8')).hexdigest()[:16]
+    return f"{LEGACY_PARTITION}-{digest}"
+
 class OmniLogVectorStore:
-    def __init__(self, path: Optional[str] = None):
+    def __init__(self, path: Optional[str] = None, write_behind: bool = True, flush_interval: float = 2.0, flush_batch_size: int = 32,
+                 embedder: Optional[Embedder] = None, embedding_cache_size: int = 50000,
+                 compact: bool = True, blob_threshold: int = 16384, embedding_text_limit: int = 4096,
+                 session_id: Optional[str] = None, lexical_weight: float = 0.5, lexical_text_limit: int = 65536):
         if path is None:
             # Use ~/.webwright/chromadb as the default path
             home_dir = os.path.expanduser('~')
@@ -26,8 +63,171 @@ class OmniLogVectorStore:
             path=self.path,
             settings=chromadb.config.Settings(anonymized_telemetry=False)
         )
-        self.collection = self.client.get_or_create_collection("omnilog")
-        
+
+        # Identical documents (repeated tool output, help text) reuse cached embeddings
+        self.embedder = embedder or OnnxMiniLMEmbedder()
+        self.embedding_cache = EmbeddingCache(self.path, max_entries=embedding_cache_size)
+        self.embedding_function = CachedEmbeddingFunction(self.embedder, self.embedding_cache)
+
+        # Entries are partitioned into one collection per project (repository root of
+        # the working directory) and tagged with the session that wrote them.
+        self.session_id = session_id or uuid.uuid4().hex
+        self._collections = {}
+        self._partition_by_cwd = {}
+
+        # Compact storage: the document holds the content once, and payloads over
+        # blob_threshold go to a compressed blob store with only a truncated
+        # embedding text kept in Chroma. Legacy 'full_entry' records still decode.
+        self.compact = compact
+        self.blob_threshold = blob_threshold
+        self.embedding_text_limit = embedding_text_limit
+        self.blobs = BlobStore(self.path)
+
+        # Weight of the BM25 lexical ranking against vector similarity in search
+        self.lexical_weight = lexical_weight
+        self.lexical_text_limit = lexical_text_limit
+
+        # Sequence index for O(limit) recency queries
+        self.index = OmniLogIndex(self.path)
+        self._backfill_index()
+        self._backfill_epochs()
+        self._backfill_lexical()
+        self._has_legacy = LEGACY_PARTITION in self.index.partitions()
+
+        # Write-behind queue: add_entry only indexes the entry, and a background
+        # thread embeds and stores queued entries in batches.
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self._pending = OrderedDict()
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._closed = False
+        self._flusher = None
+        if self.write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name="omnilog-flusher", daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
+
+    @property
+    def partition(self) -> str:
+        """
+        The partition (collection name) for the project of the current working directory.
+        """
+        cwd = os.getcwd()
+        if cwd not in self._partition_by_cwd:
+            self._partition_by_cwd[cwd] = partition_name(find_project_root(cwd))
+        return self._partition_by_cwd[cwd]
+
+    @property
+    def collection(self):
+        return self._collection_for(self.partition)
+
+    def _collection_for(self, partition: str):
+        if partition not in self._collections:
+            self._collections[partition] = self.client.get_or_create_collection(
+                partition,
+                embedding_function=self.embedding_function
+            )
+        return self._collections[partition]
+
+    def _existing_collections(self) -> List[Any]:
+        names = [getattr(collection, 'name', collection) for collection in self.client.list_collections()]
+        return [self._collection_for(name) for name in names if name.startswith(LEGACY_PARTITION)]
+
+    def _scope_filter(self, scope: str) -> Tuple[Optional[List[str]], Optional[str]]:
+        # Maps a scope to the (partitions, session_id) it is restricted to
+        if scope == 'session':
+            return [self.partition], self.session_id
+        if scope == 'project':
+            # Entries from before partitioning belong to no one project, so
+            # every project keeps seeing them as it did when there was one log
+            return [self.partition] + ([LEGACY_PARTITION] if self._has_legacy else []), None
+        if scope == 'all':
+            return None, None
+        raise ValueError(f"Unknown OmniLog scope '{scope}', expected one of {SCOPES}")
+
+    def _scope_partitions(self, scope: str) -> List[str]:
+        partitions, _ = self._scope_filter(scope)
+        return partitions if partitions else self.index.partitions()
+
+    def _backfill_index(self):
+        # One-time migration for stores written before the sequence index existed
+        if self.index.count() > 0:
+            return
+
+        for collection in self._existing_collections():
+            if collection.count() == 0:
+                continue
+            logger.info(f"Backfilling OmniLog sequence index from collection {collection.name}")
+            results = collection.get(include=["metadatas"])
+            rows = sorted(
+                (
+                    (entry_id, metadata['timestamp'], metadata['type'])
+                    for entry_id, metadata in zip(results['ids'], results['metadatas'])
+                ),
+                key=lambda row: row[1]
+            )
+            self.index.add_many(rows, partition=collection.name)
+            logger.info(f"Backfilled {len(rows)} entries into the OmniLog sequence index")
+
+    def _backfill_epochs(self, page_size: int = 500):
+        # One-time migration adding the numeric 'epoch' field used by date range queries
+        if self.index.get_meta('epoch_backfilled'):
+            return
+
+        for collection in self._existing_collections():
+            self._backfill_collection_epochs(collection, page_size)
+        self.index.set_meta('epoch_backfilled', '1')
+
+    def _backfill_lexical(self, page_size: int = 500):
+        # One-time migration filling the lexical index from stored documents
+        if self.index.get_meta('lexical_backfilled'):
+            return
+
+        if self.index.lexical_count() == 0:
+            for collection in self._existing_collections():
+                offset = 0
+                while True:
+                    results = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+                    self.index.add_text_many(
+                        (entry_id, collection.name, metadata.get('session_id'), document[:self.lexical_text_limit])
+                        for entry_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+                        if document
+                    )
+                    if len(results['ids']) < page_size:
+                        break
+                    offset += page_size
+        self.index.set_meta('lexical_backfilled', '1')
+
+    def _backfill_collection_epochs(self, collection, page_size: int):
+        offset = 0
+        updated = 0
+        while True:
+            results = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+            ids, metadatas = [], []
+            for entry_id, metadata in zip(results['ids'], results['metadatas']):
+                if 'epoch' in metadata:
+                    continue
+                epoch = _timestamp_to_epoch(metadata.get('timestamp'))
+                if epoch is None:
+                    logger.warning(f"Cannot derive epoch for entry {entry_id}: {metadata.get('timestamp')}")
+                    continue
+                ids.append(entry_id)
+                metadatas.append({**metadata, 'epoch': epoch})
+
+            if ids:
+                collection.update(ids=ids, metadatas=metadatas)
+                updated += len(ids)
+
+            if len(results['ids']) < page_size:
+                break
+            offset += page_size
+
+        if updated:
+            logger.info(f"Backfilled epoch metadata for {updated} entries in {collection.name}")
+
     def add_entry(self, entry: Dict[str, Any]) -> str:
         entry_id = entry.get('id') or entry['timestamp']
         
@@ -40,90 +240,357 @@ class OmniLogVectorStore:
         else:
             content = self._serialize_content(entry['content'])
 
-        self.collection.add(
-            documents=[content],
-            metadatas=[{
-                'timestamp': entry['timestamp'],
-                'type': entry['type'],
-                'full_entry': json.dumps(entry)
-            }],
-            ids=[entry_id]
-        )
+        metadata = {
+            'timestamp': entry['timestamp'],
+            'epoch': _timestamp_to_epoch(entry['timestamp']) or datetime.now().timestamp(),
+            'type': entry['type'],
+            'session_id': self.session_id
+        }
+
+        # The lexical index sees the full text, not the truncated embedding text
+        lexical_text = content[:self.lexical_text_limit]
+
+        if self.compact:
+            content = self._encode_compact(entry, content, metadata)
+        else:
+            metadata['full_entry'] = json.dumps(entry)
+
+        partition = self.partition
+        size = self.record_size(content, metadata)
+        if self.index.add(entry_id, entry['timestamp'], entry['type'], partition, self.session_id, size, text=lexical_text) is None:
+            logger.warning(f"OmniLog entry {entry_id} already exists, skipping")
+            return entry_id
+
+        # Checked under the queue lock so close() cannot drain between the check and the insert
+        with self._pending_lock:
+            queue = self.write_behind and not self._closed
+            if queue:
+                self._pending[entry_id] = (partition, content, metadata)
+                queued = len(self._pending)
+
+        if not queue:
+            try:
+                self._collection_for(partition).add(documents=[content], metadatas=[metadata], ids=[entry_id])
+            except Exception:
+                # Don't leave an index row for an entry that was never stored
+                self.index.delete([entry_id])
+                raise
+            return entry_id
+
+        if queued >= self.flush_batch_size:
+            self._flush_event.set()
 
         return entry_id
 
+    def _encode_compact(self, entry: Dict[str, Any], content: str, metadata: Dict[str, Any]) -> str:
+        # Fills in compact metadata and returns the document to store and embed
+        if not isinstance(entry['content'], str):
+            # The document must be JSON whenever it is marked so; add_entry
+            # only JSON-encodes lists for responses and tool results
+            metadata['content_encoding'] = 'json'
+            content = json.dumps(entry['content'], default=str)
+
+        extra = {k: v for k, v in entry.items() if k not in ('content', 'type', 'timestamp')}
+        if extra:
+            metadata['extra'] = json.dumps(extra)
+
+        if len(content) > self.blob_threshold:
+            payload = json.dumps(entry).encode('utf-8')
+            metadata['blob'] = self.blobs.put(payload)
+            metadata['blob_size'] = len(payload)
+            metadata.pop('extra', None)
+            metadata.pop('content_encoding', None)
+            content = content[:self.embedding_text_limit]
+
+        return content
+
+    @staticmethod
+    def record_size(document: Optional[str], metadata: Dict[str, Any]) -> int:
+        # Approximate stored size of an entry, used by retention byte caps
+        return len(document or '') + len(json.dumps(metadata)) + metadata.get('blob_size', 0)
+
+    def _decode_entry(self, document: Optional[str], metadata: Dict[str, Any]) -> Dict[str, Any]:
+        if 'full_entry' in metadata:
+            return json.loads(metadata['full_entry'])
+        if 'blob' in metadata:
+            return json.loads(self.blobs.get(metadata['blob']))
+
+        entry = json.loads(metadata['extra']) if 'extra' in metadata else {}
+        entry['content'] = json.loads(document) if metadata.get('content_encoding') == 'json' else document
+        entry['type'] = metadata['type']
+        entry['timestamp'] = metadata['timestamp']
+        return entry
+
+    def flush(self) -> int:
+        """
+        Embeds and stores all queued entries with one Chroma call per partition. Returns the number written.
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                batch = list(self._pending.items())
+            if not batch:
+                return 0
+
+            by_partition = OrderedDict()
+            for entry_id, (partition, content, metadata) in batch:
+                by_partition.setdefault(partition, []).append((entry_id, content, metadata))
+
+            written = 0
+            for partition, records in by_partition.items():
+                try:
+                    self._collection_for(partition).add(
+                        documents=[content for _, content, _ in records],
+                        metadatas=[metadata for _, _, metadata in records],
+                        ids=[entry_id for entry_id, _, _ in records]
+                    )
+                except Exception as e:
+                    # Entries stay queued (and readable) until a later flush succeeds
+                    logger.error(f"Failed to flush {len(records)} OmniLog entries to {partition}: {str(e)}")
+                    continue
+
+                # Drop entries only after they are readable from the collection
+                with self._pending_lock:
+                    for entry_id, _, _ in records:
+                        self._pending.pop(entry_id, None)
+                written += len(records)
+
+            logger.debug(f"Flushed {written} OmniLog entries")
+            return written
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._flush_event.wait(timeout=self.flush_interval)
+            self._flush_event.clear()
+            self.flush()
+
+    def close(self):
+        with self._pending_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._flush_event.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+    def _get_records(self, entry_ids: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        # Queued entries are served from memory so reads always see their own writes
+        records_by_id = {}
+        with self._pending_lock:
+            for entry_id in entry_ids:
+                if entry_id in self._pending:
+                    _, content, metadata = self._pending[entry_id]
+                    records_by_id[entry_id] = (content, metadata)
+
+        stored_ids = [entry_id for entry_id in entry_ids if entry_id not in records_by_id]
+        ids_by_partition = {}
+        for entry_id, partition in self.index.locate(stored_ids).items():
+            ids_by_partition.setdefault(partition, []).append(entry_id)
+
+        for partition, ids in ids_by_partition.items():
+            results = self._collection_for(partition).get(ids=ids, include=["metadatas", "documents"])
+            records_by_id.update(zip(results['ids'], zip(results['documents'], results['metadatas'])))
+        return records_by_id
+
+    def _pending_records(self, scope: str) -> List[Tuple[str, str, Dict[str, Any]]]:
+        # Queued entries in scope, so searches need not wait for a flush to embed them
+        partitions = set(self._scope_partitions(scope))
+        _, session_id = self._scope_filter(scope)
+        with self._pending_lock:
+            return [
+                (entry_id, content, metadata)
+                for entry_id, (partition, content, metadata) in self._pending.items()
+                if partition in partitions and (not session_id or metadata['session_id'] == session_id)
+            ]
+
     def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
-        result = self.collection.get(ids=[entry_id])
-        if result['metadatas']:
-            return json.loads(result['metadatas'][0]['full_entry'])
+        record = self._get_records([entry_id]).get(entry_id)
+        if record:
+            return self._decode_entry(*record)
         return None
 
-    def get_recent_entries(self, limit: int = 10) -> List[Dict[str, Any]]:
-        results = self.collection.get()
+    def get_recent_entries(self, limit: int = 10, scope: str = 'project') -> List[Dict[str, Any]]:
+        partitions, session_id = self._scope_filter(scope)
+        recent_ids = self.index.recent_ids(limit, partition=partitions, session_id=session_id)
+        return self.get_entries(recent_ids)
+
+    def get_entries(self, entry_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Returns the given entries in the order of `entry_ids`, each carrying its 'id'.
+        """
+        if not entry_ids:
+            return []
+
+        records_by_id = self._get_records(entry_ids)
         entries = []
 
-        for metadata in results['metadatas']:
+        # Walk the ids in the requested order; Chroma returns them unordered
+        for entry_id in entry_ids:
+            record = records_by_id.get(entry_id)
+            if record is None:
+                logger.warning(f"Indexed entry {entry_id} missing from collection")
+                continue
             try:
-                entry = json.loads(metadata['full_entry'])
+                entry = self._decode_entry(*record)
                 if entry['type'] in ['llm_response', 'tool_call'] and isinstance(entry['content'], str):
                     try:
                         entry['content'] = json.loads(entry['content'])
                     except json.JSONDecodeError:
                         pass
                 
+                entry.setdefault('id', entry_id)
                 entries.append(entry)
 
-            except json.JSONDecodeError:
-                logger.warning(f"Failed to parse entry: {metadata['full_entry']}")
+            except (json.JSONDecodeError, KeyError) as e:
+                logger.warning(f"Failed to parse entry {entry_id}: {str(e)}")
                 continue
 
-        # Sort the entries by timestamp in ascending order
-        sorted_entries = sorted(entries, key=lambda x: x['timestamp'])
+        return entries
 
-        # Get the last 'limit' entries
-        recent_entries = sorted_entries[-limit:]
+    def _vector_search(self, query: str, limit: int, scope: str) -> List[Tuple[float, str, str, Dict[str, Any]]]:
+        # Query each partition in scope and keep the overall nearest results
+        _, session_id = self._scope_filter(scope)
+        where = {"session_id": session_id} if session_id else None
 
-        return recent_entries
+        hits = []
+        for partition in self._scope_partitions(scope):
+            collection = self._collection_for(partition)
+            if collection.count() == 0:
+                continue
+            results = collection.query(
+                query_texts=[query],
+                n_results=limit,
+                where=where,
+                include=["metadatas", "documents", "distances"]
+            )
+            hits.extend(zip(results['distances'][0], results['ids'][0], results['documents'][0], results['metadatas'][0]))
+        hits.sort(key=lambda hit: hit[0])
+        return hits[:limit]
 
-    def search_entries_with_context(self, query: str, top_k: int = 5) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=top_k,
-            include=["metadatas", "documents", "distances"]
-        )
+    def search_entries_with_context(self, query: str, top_k: int = 5, scope: str = 'project',
+                                    lexical_weight: Optional[float] = None, rrf_k: int = 60) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """
+        Hybrid search: vector similarity and BM25 lexical rankings are merged with
+        weighted reciprocal-rank fusion. lexical_weight=0 is pure vector search,
+        lexical_weight=1 pure lexical search.
+
+        Entries still queued for embedding have no vectors yet. They are found
+        through the lexical index, which has them from the moment they are
+        written, and take their place in the vector ranking by lexical rank.
+        """
+        weight = self.lexical_weight if lexical_weight is None else lexical_weight
+        candidates = top_k * 3
+        pending_ids = {entry_id for entry_id, _, _ in self._pending_records(scope)}
+
+        vector_hits = self._vector_search(query, candidates, scope) if weight < 1 else []
+        partitions, session_id = self._scope_filter(scope)
+        lexical_hits = self.index.lexical_search(query, candidates, partitions, session_id) if weight > 0 or pending_ids else []
+
+        scores = {}
+        for rank, (_, entry_id, _, _) in enumerate(vector_hits):
+            scores[entry_id] = scores.get(entry_id, 0.0) + (1 - weight) / (rrf_k + rank + 1)
+        pending_hits = [entry_id for entry_id, _ in lexical_hits if entry_id in pending_ids]
+        for rank, entry_id in enumerate(pending_hits):
+            scores[entry_id] = scores.get(entry_id, 0.0) + (1 - weight) / (rrf_k + rank + 1)
+        for rank, (entry_id, _) in enumerate(lexical_hits):
+            scores[entry_id] = scores.get(entry_id, 0.0) + weight / (rrf_k + rank + 1)
+        ranked_ids = sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+        # Lexical-only hits still need their stored records
+        records = {entry_id: (document, metadata) for _, entry_id, document, metadata in vector_hits}
+        missing_ids = [entry_id for entry_id in ranked_ids if entry_id not in records]
+        records.update(self._get_records(missing_ids))
+        hits = [(scores[entry_id], entry_id) + records[entry_id] for entry_id in ranked_ids if entry_id in records]
         
         logger.debug(f"Search query: {query}")
-        logger.debug(f"Number of search results: {len(results['metadatas'][0])}")
+        logger.debug(f"Number of search results: {len(hits)} ({len(vector_hits)} vector, {len(lexical_hits)} lexical candidates)")
         
-        all_entries = self._get_all_sorted_entries()
+        hit_ids = [hit[1] for hit in hits]
+        pair_ids = self.index.pair_ids(hit_ids)
+
+        # Fetch every paired entry in one lookup instead of scanning the collection
+        adjacent_by_id = {}
+        if pair_ids:
+            adjacent_records = self._get_records(list(set(pair_ids.values())))
+            adjacent_by_id = {
+                entry_id: self._decode_entry(*record)
+                for entry_id, record in adjacent_records.items()
+            }
+
         entries_with_context = []
         
-        for i, metadata in enumerate(results['metadatas'][0]):
-            current_entry = json.loads(metadata['full_entry'])
-            adjacent_entry = self._get_adjacent_entry(current_entry, all_entries)
+        for score, entry_id, document, metadata in hits:
+            current_entry = self._decode_entry(document, metadata)
+            adjacent_entry = adjacent_by_id.get(pair_ids.get(entry_id))
             
             entries_with_context.append((current_entry, adjacent_entry))
             
             logger.debug(f"Current entry: {current_entry['type']} - {current_entry['content'][:50]}...")
             logger.debug(f"Adjacent entry: {adjacent_entry['type'] if adjacent_entry else None} - {adjacent_entry['content'][:50] if adjacent_entry else None}...")
-            logger.debug(f"Distance: {results['distances'][0][i]}")
+            logger.debug(f"Fused score: {score}")
         
         return entries_with_context
 
-    def search_by_date_range(self, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
-        results = self.collection.get()
-        entries = [json.loads(metadata['full_entry']) for metadata in results['metadatas']]
-        filtered_entries = [
-            entry for entry in entries
-            if start_date.isoformat() <= entry['timestamp'] <= end_date.isoformat()
+    def _scope_where(self, scope: str, clauses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        _, session_id = self._scope_filter(scope)
+        if session_id:
+            clauses = clauses + [{"session_id": session_id}]
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def search_by_date_range(self, start_date: datetime, end_date: datetime, page_size: int = 100, scope: str = 'project') -> Iterator[Dict[str, Any]]:
+        """
+        Yields entries whose timestamp falls within [start_date, end_date].
+        The range is filtered by Chroma on the numeric 'epoch' field and read one page at a time.
+        Queued entries are filtered in memory and come last.
+        """
+        where = self._scope_where(scope, [
+            {"epoch": {"$gte": start_date.timestamp()}},
+            {"epoch": {"$lte": end_date.timestamp()}}
+        ])
+
+        # Taken first: an entry flushed meanwhile is then seen in both places, never in neither
+        pending = [
+            (entry_id, content, metadata) for entry_id, content, metadata in self._pending_records(scope)
+            if start_date.timestamp() <= metadata['epoch'] <= end_date.timestamp()
         ]
-        return filtered_entries
+        pending_ids = {entry_id for entry_id, _, _ in pending}
 
-    def search_by_type(self, entry_type: str) -> List[Dict[str, Any]]:
-        results = self.collection.get(
-            where={"type": entry_type}
-        )
-        return [json.loads(metadata['full_entry']) for metadata in results['metadatas']]
+        for partition in self._scope_partitions(scope):
+            collection = self._collection_for(partition)
+            offset = 0
+            while True:
+                results = collection.get(where=where, limit=page_size, offset=offset, include=["metadatas", "documents"])
+                for entry_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas']):
+                    if entry_id in pending_ids:
+                        continue
+                    yield self._decode_entry(document, metadata)
+
+                if len(results['ids']) < page_size:
+                    break
+                offset += page_size
+
+        for _, content, metadata in pending:
+            yield self._decode_entry(content, metadata)
+
+    def search_by_type(self, entry_type: str, scope: str = 'project') -> List[Dict[str, Any]]:
+        # Queued entries are taken first, as in search_by_date_range
+        pending = [record for record in self._pending_records(scope) if record[2]['type'] == entry_type]
+        pending_ids = {entry_id for entry_id, _, _ in pending}
+
+        where = self._scope_where(scope, [{"type": entry_type}])
+        entries = []
+        for partition in self._scope_partitions(scope):
+            results = self._collection_for(partition).get(
+                where=where,
+                include=["metadatas", "documents"]
+            )
+            entries.extend(
+                self._decode_entry(document, metadata)
+                for entry_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+                if entry_id not in pending_ids
+            )
+        entries.extend(self._decode_entry(content, metadata) for _, content, metadata in pending)
+        return entries
 
     def build_omnilog_with_context(self, recent_count: int = 10, query: Optional[str] = None, top_k: int = 5) -> List[Dict[str, Any]]:
         logger.debug(f"Building OmniLog with context. Recent count: {recent_count}, Query: {query}, Top k: {top_k}")
@@ -192,28 +659,6 @@ class OmniLogVectorStore:
         logger.debug(f"Final context has {len(context)} entries")
         return context
 
-    def _get_all_sorted_entries(self) -> List[Dict[str, Any]]:
-        results = self.collection.get()
-        entries = [json.loads(metadata['full_entry']) for metadata in results['metadatas']]
-        return sorted(entries, key=lambda x: x['timestamp'])
-
-    def _get_adjacent_entry(self, entry: Dict[str, Any], all_entries: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-        current_index = next((i for i, e in enumerate(all_entries) if e['timestamp'] == entry['timestamp']), None)
-        
-        if current_index is not None:
-            if entry['type'] == 'assistant':
-                # Get the immediately previous user input
-                for i in range(current_index - 1, -1, -1):
-                    if all_entries[i]['type'] == 'user':
-                        return all_entries[i]
-            elif entry['type'] == 'user':
-                # Get the immediately next assistant response
-                for i in range(current_index + 1, len(all_entries)):
-                    if all_entries[i]['type'] == 'assistant':
-                        return all_entries[i]
-        
-        return None
-    
     def _serialize_content(self, content: Any) -> str:
         if isinstance(content, dict):
             return json.dumps(content)
@@ -0,0 +1,108 @@
+import os
+import zlib
+import hashlib
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import logging
+logger = logging.getLogger(__name__)
+
+class BlobStore:
+    """
+    Content-addressed store for large OmniLog payloads.
+
+    Blobs are keyed by the sha256 of their uncompressed bytes, so identical
+    payloads (the same file dumped twice) are stored once. Data is compressed
+    with zstd when the `zstandard` package is installed, otherwise with zlib;
+    the file extension records which codec wrote it.
+    """
+
+    def __init__(self, path: str, level: int = 3):
+        self.path = os.path.join(path, 'blobs')
+        os.makedirs(self.path, exist_ok=True)
+        self.level = level
+
+    def _blob_path(self, digest: str, extension: str) -> str:
+        return os.path.join(self.path, digest[:2], digest + extension)
+
+    def _find(self, digest: str) -> Optional[str]:
+        for extension in ('.zst', '.zz'):
+            blob_path = self._blob_path(digest, extension)
+            if os.path.exists(blob_path):
+                return blob_path
+        return None
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if self._find(digest):
+            return digest
+
+        if zstandard is not None:
+            blob_path = self._blob_path(digest, '.zst')
+            compressed = zstandard.ZstdCompressor(level=self.level).compress(data)
+        else:
+            blob_path = self._blob_path(digest, '.zz')
+            compressed = zlib.compress(data, self.level)
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        # Write to a temp file first so a crash never leaves a truncated blob
+        temp_path = blob_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(temp_path, blob_path)
+        logger.debug(f"Stored blob {digest} ({len(data)} -> {len(compressed)} bytes)")
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        blob_path = self._find(digest)
+        if blob_path is None:
+            raise KeyError(f"Blob {digest} not found")
+
+        with open(blob_path, 'rb') as f:
+            compressed = f.read()
+        if blob_path.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError(f"Blob {digest} is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(compressed)
+        return zlib.decompress(compressed)
+
+    def modified_at(self, digest: str) -> Optional[float]:
+        """
+        Returns when the blob was last written or touched, or None if it is missing.
+        """
+        blob_path = self._find(digest)
+        return os.path.getmtime(blob_path) if blob_path else None
+
+    def touch(self, digest: str):
+        """
+        Marks the blob as just used, for callers that expire blobs by age.
+        """
+        blob_path = self._find(digest)
+        if blob_path is None:
+            raise KeyError(f"Blob {digest} not found")
+        os.utime(blob_path)
+
+    def delete(self, digest: str) -> int:
+        """
+        Removes a blob and returns the number of bytes freed on disk.
+        """
+        blob_path = self._find(digest)
+        if blob_path is None:
+            return 0
+        size = os.path.getsize(blob_path)
+        os.remove(blob_path)
+        return size
+
+    def digests(self) -> Iterator[str]:
+        for prefix in os.listdir(self.path):
+            prefix_dir = os.path.join(self.path, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for filename in os.listdir(prefix_dir):
+                digest, extension = os.path.splitext(filename)
+                if extension in ('.zst', '.zz'):
+                    yield digest
@@ -0,0 +1,333 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Iterable, Tuple, Union
+
+import logging
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = 'omnilog_index.sqlite3'
+
+# Partition of entries written before collections were partitioned
+LEGACY_PARTITION = 'omnilog'
+
+# Which earlier entry type a new entry pairs with when context is expanded
+PAIRED_TYPES = {
+    'llm_response': 'user_query',
+    'tool_call': 'llm_response',
+}
+
+# Ids per IN (...) list; older SQLite builds allow 999 parameters per statement
+ID_CHUNK_SIZE = 500
+
+def _id_chunks(entry_ids: List[str]) -> Iterable[List[str]]:
+    entry_ids = list(entry_ids)
+    for start in range(0, len(entry_ids), ID_CHUNK_SIZE):
+        yield entry_ids[start:start + ID_CHUNK_SIZE]
+
+def _partition_clause(partition: Union[str, List[str]]) -> Tuple[str, List[str]]:
+    partitions = [partition] if isinstance(partition, str) else list(partition)
+    return f"partition IN ({','.join('?' * len(partitions))})", partitions
+
+class OmniLogIndex:
+    """
+    Side index kept next to the Chroma store for the OmniLog.
+
+    Chroma has no notion of insertion order, so every recency query used to load
+    and sort the whole collection. Each entry gets a monotonic sequence number
+    here, which turns "the last N entries" into an N-row walk of the primary key.
+
+    The index also records the user query/response pairing at write time, so
+    search hits can be expanded with their paired turn by a single lookup.
+
+    Every row carries the partition (Chroma collection) and session it was
+    written in, so recency queries can be scoped to a project or a session.
+
+    Entry text is also kept in an FTS5 table, giving a BM25-ranked lexical
+    index for exact identifiers that vector search tends to miss.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self.db_path = os.path.join(path, INDEX_FILENAME)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL UNIQUE,
+                    timestamp TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    pair_id TEXT,
+                    partition TEXT NOT NULL DEFAULT 'omnilog',
+                    session_id TEXT,
+                    size INTEGER,
+                    tokens INTEGER
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+            if 'pair_id' not in columns:
+                # Index written before pairing existed: add the column and link existing rows
+                self.conn.execute("ALTER TABLE entries ADD COLUMN pair_id TEXT")
+                self._relink_pairs()
+            if 'partition' not in columns:
+                # Index written before partitioning: existing rows belong to the legacy collection
+                self.conn.execute(f"ALTER TABLE entries ADD COLUMN partition TEXT NOT NULL DEFAULT '{LEGACY_PARTITION}'")
+                self.conn.execute("ALTER TABLE entries ADD COLUMN session_id TEXT")
+            if 'size' not in columns:
+                # Sizes of older rows are filled in by the next vacuum
+                self.conn.execute("ALTER TABLE entries ADD COLUMN size INTEGER")
+            if 'tokens' not in columns:
+                self.conn.execute("ALTER TABLE entries ADD COLUMN tokens INTEGER")
+
+            # Identifiers such as get_recent_entries stay single tokens
+            self.conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                    id UNINDEXED,
+                    partition UNINDEXED,
+                    session_id UNINDEXED,
+                    body,
+                    tokenize = "unicode61 tokenchars '_'"
+                )
+            """)
+
+            self.conn.execute("DROP INDEX IF EXISTS entries_type_seq")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_partition_type_seq ON entries (partition, type, seq)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_partition_seq ON entries (partition, seq)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_session_seq ON entries (session_id, seq)")
+
+    def _relink_pairs(self):
+        last_id_by_type = {}
+        rows = self.conn.execute("SELECT seq, id, type FROM entries ORDER BY seq").fetchall()
+        for seq, entry_id, entry_type in rows:
+            partner_type = PAIRED_TYPES.get(entry_type)
+            partner_id = last_id_by_type.get(partner_type) if partner_type else None
+            if partner_id is not None:
+                self._link(entry_id, partner_id, entry_type)
+            last_id_by_type[entry_type] = entry_id
+        logger.info(f"Linked query/response pairs for {len(rows)} indexed entries")
+
+    def _link(self, entry_id: str, partner_id: str, entry_type: str):
+        self.conn.execute("UPDATE entries SET pair_id = ? WHERE id = ?", (partner_id, entry_id))
+        if entry_type == 'llm_response':
+            # A query points forward to its first response only
+            self.conn.execute(
+                "UPDATE entries SET pair_id = ? WHERE id = ? AND pair_id IS NULL",
+                (entry_id, partner_id)
+            )
+
+    def _insert(self, entry_id: str, timestamp: str, entry_type: str,
+                partition: str = LEGACY_PARTITION, session_id: Optional[str] = None, size: Optional[int] = None) -> Optional[int]:
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO entries (id, timestamp, type, partition, session_id, size) VALUES (?, ?, ?, ?, ?, ?)",
+            (entry_id, timestamp, entry_type, partition, session_id, size)
+        )
+        if cursor.rowcount == 0:
+            return None
+        seq = cursor.lastrowid
+
+        partner_type = PAIRED_TYPES.get(entry_type)
+        if partner_type:
+            # Two shells on one project write interleaved turns; pair within the session
+            row = self.conn.execute(
+                "SELECT id FROM entries WHERE partition = ? AND session_id IS ? AND type = ? AND seq < ? "
+                "ORDER BY seq DESC LIMIT 1",
+                (partition, session_id, partner_type, seq)
+            ).fetchone()
+            if row:
+                self._link(entry_id, row[0], entry_type)
+        return seq
+
+    def add(self, entry_id: str, timestamp: str, entry_type: str,
+            partition: str = LEGACY_PARTITION, session_id: Optional[str] = None, size: Optional[int] = None,
+            text: Optional[str] = None) -> Optional[int]:
+        """
+        Appends an entry and returns its sequence number, or None if the id is already indexed.
+        `text` is added to the lexical index when given.
+        """
+        with self._lock, self.conn:
+            seq = self._insert(entry_id, timestamp, entry_type, partition, session_id, size)
+            if seq is not None and text:
+                self.conn.execute(
+                    "INSERT INTO entries_fts (id, partition, session_id, body) VALUES (?, ?, ?, ?)",
+                    (entry_id, partition, session_id, text)
+                )
+            return seq
+
+    def add_text_many(self, rows: Iterable[Tuple[str, str, Optional[str], str]]):
+        """
+        Adds (id, partition, session_id, text) rows to the lexical index. Used for backfilling.
+        """
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO entries_fts (id, partition, session_id, body) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def lexical_search(self, query: str, limit: int = 10, partition: Union[str, List[str], None] = None,
+                       session_id: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Returns (id, bm25 score) pairs for entries matching any term of `query`, best first.
+        Lower scores are better, as reported by FTS5.
+        """
+        terms = re.findall(r"\w+", query)
+        if not terms or limit <= 0:
+            return []
+        match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+        clauses, params = ["entries_fts MATCH ?"], [match]
+        if partition is not None:
+            clause, partitions = _partition_clause(partition)
+            clauses.append(clause)
+            params.extend(partitions)
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT id, bm25(entries_fts) AS score FROM entries_fts WHERE {' AND '.join(clauses)} ORDER BY score LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return rows
+
+    def lexical_count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM entries_fts").fetchone()[0]
+
+    def add_many(self, rows: Iterable[Tuple[str, str, str]], partition: str = LEGACY_PARTITION):
+        """
+        Appends (id, timestamp, type) rows in the given order. Used for backfilling.
+        """
+        with self._lock, self.conn:
+            for entry_id, timestamp, entry_type in rows:
+                self._insert(entry_id, timestamp, entry_type, partition)
+
+    def recent_ids(self, limit: int = 10, partition: Union[str, List[str], None] = None, session_id: Optional[str] = None) -> List[str]:
+        """
+        Returns the ids of the last `limit` entries, oldest first, optionally
+        restricted to one or more partitions and/or a session.
+        """
+        if limit <= 0:
+            return []
+
+        clauses, params = [], []
+        if partition is not None:
+            clause, partitions = _partition_clause(partition)
+            clauses.append(clause)
+            params.extend(partitions)
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT id FROM entries {where} ORDER BY seq DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def locate(self, entry_ids: List[str]) -> Dict[str, str]:
+        """
+        Maps each given id to the partition it was written to.
+        """
+        return self._select_by_ids("SELECT id, partition FROM entries WHERE id IN ({})", entry_ids)
+
+    def _select_by_ids(self, query: str, entry_ids: List[str]) -> Dict[str, Union[str, int]]:
+        # Runs a two-column query over `entry_ids` a chunk at a time; {} marks the IN list
+        rows = []
+        with self._lock:
+            for chunk in _id_chunks(entry_ids):
+                rows.extend(self.conn.execute(query.format(",".join("?" * len(chunk))), chunk).fetchall())
+        return dict(rows)
+
+    def partitions(self) -> List[str]:
+        with self._lock:
+            rows = self.conn.execute("SELECT DISTINCT partition FROM entries").fetchall()
+        return [row[0] for row in rows]
+
+    def pair_ids(self, entry_ids: List[str]) -> Dict[str, str]:
+        """
+        Maps each given id to the id of its paired entry, skipping unpaired entries.
+        """
+        return self._select_by_ids("SELECT id, pair_id FROM entries WHERE id IN ({}) AND pair_id IS NOT NULL", entry_ids)
+
+    def entries_by_type(self, entry_type: str) -> List[Tuple[str, str, str, Optional[int]]]:
+        """
+        Returns (id, partition, timestamp, size) rows of one entry type, newest first.
+        """
+        with self._lock:
+            return self.conn.execute(
+                "SELECT id, partition, timestamp, size FROM entries WHERE type = ? ORDER BY seq DESC",
+                (entry_type,)
+            ).fetchall()
+
+    def set_sizes(self, sizes: Dict[str, int]):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE entries SET size = ? WHERE id = ?",
+                [(size, entry_id) for entry_id, size in sizes.items()]
+            )
+
+    def get_tokens(self, entry_ids: List[str]) -> Dict[str, int]:
+        """
+        Returns cached token counts for the given ids, skipping entries not yet counted.
+        """
+        return self._select_by_ids("SELECT id, tokens FROM entries WHERE id IN ({}) AND tokens IS NOT NULL", entry_ids)
+
+    def set_tokens(self, tokens: Dict[str, int]):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE entries SET tokens = ? WHERE id = ?",
+                [(count, entry_id) for entry_id, count in tokens.items()]
+            )
+
+    def delete(self, entry_ids: List[str]):
+        """
+        Removes entries and clears pair links that pointed at them.
+        """
+        with self._lock, self.conn:
+            for chunk in _id_chunks(entry_ids):
+                placeholders = ",".join("?" * len(chunk))
+                self.conn.execute(f"DELETE FROM entries WHERE id IN ({placeholders})", chunk)
+                self.conn.execute(f"DELETE FROM entries_fts WHERE id IN ({placeholders})", chunk)
+                self.conn.execute(f"UPDATE entries SET pair_id = NULL WHERE pair_id IN ({placeholders})", chunk)
+
+    def vacuum(self):
+        with self._lock:
+            self.conn.execute("VACUUM")
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (key, value)
+            )
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from lib.util import get_logger, LOG_DIR
+
+logger = get_logger()
+
+ENTRY_TYPES = ('tool_call', 'llm_response', 'user_query')
+
+class RetentionPolicy:
+    """
+    Limits for one OmniLog entry type. Any limit set to None is not enforced.
+    The newest entries are kept first, so limits always trim the oldest history.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None, ttl_days: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_days = ttl_days
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"max_entries": self.max_entries, "max_bytes": self.max_bytes, "ttl_days": self.ttl_days}
+
+DEFAULT_POLICIES = {
+    'tool_call': RetentionPolicy(max_entries=20000, max_bytes=256 * 1024 * 1024, ttl_days=90),
+    'llm_response': RetentionPolicy(max_entries=50000, max_bytes=128 * 1024 * 1024, ttl_days=365),
+    'user_query': RetentionPolicy(max_entries=50000, max_bytes=64 * 1024 * 1024, ttl_days=365),
+}
+
+def load_policies(config=None) -> Dict[str, RetentionPolicy]:
+    """
+    Builds retention policies from the [retention] section of the webwright config,
+    e.g. `tool_call_max_entries`, `tool_call_max_bytes`, `tool_call_ttl_days`.
+    A value of NONE disables that limit.
+    """
+    policies = {}
+    for entry_type, default in DEFAULT_POLICIES.items():
+        limits = default.to_dict()
+        if config is not None:
+            for limit, cast in (('max_entries', int), ('max_bytes', int), ('ttl_days', float)):
+                value = config.get_config_value("retention", f"{entry_type}_{limit}")
+                if value is None:
+                    continue
+                limits[limit] = None if value.upper() == "NONE" else cast(value)
+        policies[entry_type] = RetentionPolicy(**limits)
+    return policies
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _fill_missing_sizes(olog, page_size: int):
+    # Rows indexed before sizes were recorded get them from the stored records
+    for partition in olog.index.partitions():
+        collection = olog._collection_for(partition)
+        offset = 0
+        while True:
+            results = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+            olog.index.set_sizes({
+                entry_id: olog.record_size(document, metadata)
+                for entry_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+            })
+            if len(results['ids']) < page_size:
+                break
+            offset += page_size
+
+def select_expired(olog, policies: Dict[str, RetentionPolicy], now: Optional[float] = None) -> Dict[str, List[tuple]]:
+    """
+    Returns the (id, partition, size) rows each policy would remove, keyed by entry type.
+    """
+    now = now or time.time()
+    expired = {}
+    for entry_type, policy in policies.items():
+        cutoff = now - policy.ttl_days * 86400 if policy.ttl_days is not None else None
+        kept_entries = 0
+        kept_bytes = 0
+        full = False
+        removed = []
+        for entry_id, partition, timestamp, size in olog.index.entries_by_type(entry_type):
+            size = size or 0
+            try:
+                epoch = datetime.fromisoformat(timestamp).timestamp()
+            except ValueError:
+                epoch = None
+
+            too_old = cutoff is not None and epoch is not None and epoch < cutoff
+            too_many = policy.max_entries is not None and kept_entries >= policy.max_entries
+            # Once an entry overflows the byte cap, every older one goes too,
+            # so the cap never keeps old entries over a newer one
+            full = full or (policy.max_bytes is not None and kept_bytes + size > policy.max_bytes)
+            if too_old or too_many or full:
+                removed.append((entry_id, partition, size))
+            else:
+                kept_entries += 1
+                kept_bytes += size
+        expired[entry_type] = removed
+    return expired
+
+def _restore_backup(olog, partition: str, backup_name: str):
+    # A rebuild interrupted between its two renames leaves the records only
+    # in the backup; one interrupted after them leaves a stale backup
+    names = {getattr(collection, 'name', collection) for collection in olog.client.list_collections()}
+    if backup_name not in names:
+        return
+    if partition in names and olog.client.get_collection(partition).count() > 0:
+        olog.client.delete_collection(backup_name)
+        return
+    logger.warning(f"Restoring OmniLog collection {partition} from an interrupted vacuum")
+    if partition in names:
+        olog.client.delete_collection(partition)
+    olog.client.get_collection(backup_name).modify(name=partition)
+    olog._collections.pop(partition, None)
+
+def _rebuild_collection(olog, partition: str, page_size: int) -> set:
+    """
+    Copies a partition's surviving records, embeddings included, into a fresh
+    collection and swaps it in, which rebuilds the HNSW index without the
+    deleted elements. Returns the blob digests the survivors still reference.
+    """
+    old = olog._collection_for(partition)
+    temp_name = f"{partition}-compact"
+    backup_name = f"{partition}-backup"
+    try:
+        olog.client.delete_collection(temp_name)
+    except Exception:
+        pass
+    new = olog.client.create_collection(temp_name, embedding_function=olog.embedding_function)
+
+    referenced_blobs = set()
+    offset = 0
+    while True:
+        results = old.get(limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        if results['ids']:
+            new.add(
+                ids=results['ids'],
+                embeddings=results['embeddings'],
+                documents=results['documents'],
+                metadatas=results['metadatas']
+            )
+            referenced_blobs.update(m['blob'] for m in results['metadatas'] if 'blob' in m)
+        if len(results['ids']) < page_size:
+            break
+        offset += page_size
+
+    # Move the old collection aside before the new one takes its name, so a
+    # failure at any point leaves the records under one of the two names
+    old.modify(name=backup_name)
+    olog._collections.pop(partition, None)
+    new.modify(name=partition)
+    olog.client.delete_collection(backup_name)
+    return referenced_blobs
+
+def vacuum(olog, policies: Optional[Dict[str, RetentionPolicy]] = None, dry_run: bool = False, page_size: int = 500) -> Dict[str, Any]:
+    """
+    Applies retention policies to an OmniLogVectorStore, rebuilds its collections
+    and indexes, removes unreferenced blobs, and returns a report of what was
+    removed and reclaimed. The report is also written to the logs directory.
+    """
+    policies = policies or load_policies()
+    started = time.time()
+    bytes_before = directory_size(olog.path)
+
+    olog.flush()
+    for partition in olog.index.partitions():
+        _restore_backup(olog, partition, f"{partition}-backup")
+    _fill_missing_sizes(olog, page_size)
+    expired = select_expired(olog, policies, now=started)
+
+    report = {
+        "started": datetime.fromtimestamp(started).isoformat(),
+        "path": olog.path,
+        "dry_run": dry_run,
+        "policies": {entry_type: policy.to_dict() for entry_type, policy in policies.items()},
+        "removed": {entry_type: len(rows) for entry_type, rows in expired.items()},
+        "removed_total": sum(len(rows) for rows in expired.values()),
+        "removed_entry_bytes": sum(size for rows in expired.values() for _, _, size in rows),
+        "bytes_before": bytes_before,
+    }
+
+    if not dry_run:
+        ids_by_partition = {}
+        for rows in expired.values():
+            for entry_id, partition, _ in rows:
+                ids_by_partition.setdefault(partition, []).append(entry_id)
+
+        for partition, ids in ids_by_partition.items():
+            collection = olog._collection_for(partition)
+            for start in range(0, len(ids), page_size):
+                collection.delete(ids=ids[start:start + page_size])
+            olog.index.delete(ids)
+
+        referenced_blobs = set()
+        rebuilt = []
+        for partition in olog.index.partitions():
+            referenced_blobs |= _rebuild_collection(olog, partition, page_size)
+            rebuilt.append(partition)
+
+        blobs_removed = 0
+        for digest in list(olog.blobs.digests()):
+            if digest not in referenced_blobs:
+                olog.blobs.delete(digest)
+                blobs_removed += 1
+
+        olog.index.vacuum()
+        try:
+            # Chroma keeps freed pages in its SQLite file until it is vacuumed
+            conn = sqlite3.connect(os.path.join(olog.path, 'chroma.sqlite3'))
+            conn.execute("VACUUM")
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not vacuum Chroma database: {str(e)}")
+
+        report["partitions_rebuilt"] = rebuilt
+        report["blobs_removed"] = blobs_removed
+
+    bytes_after = directory_size(olog.path)
+    report["bytes_after"] = bytes_after
+    report["bytes_reclaimed"] = bytes_before - bytes_after
+    report["seconds"] = round(time.time() - started, 3)
+
+    report_path = os.path.join(LOG_DIR, f"omnilog_vacuum_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    report["report_path"] = report_path
+
+    logger.info(f"OmniLog vacuum removed {report['removed_total']} entries, reclaimed {report['bytes_reclaimed']} bytes")
+    return report
@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import time
+from typing import Any, Dict, Optional
+
+from lib.omnilog_blobs import BlobStore
+from lib.util import get_logger, WEBWRIGHT_DIR
+
+logger = get_logger()
+
+DEFAULT_SPILL_PATH = os.path.join(WEBWRIGHT_DIR, 'spill')
+DEFAULT_THRESHOLD = 16000
+HEAD_CHARS = 2000
+TAIL_CHARS = 1000
+MAX_AGE_DAYS = 7
+
+# Prefix that marks a spill handle in a tool result
+HANDLE_PREFIX = "spill:"
+
+# The tool that reads spills back is never spilled itself
+READER = "read_spilled_result"
+
+def text_stats(text: str) -> Dict[str, int]:
+    return {"chars": len(text), "lines": len(text.splitlines()), "bytes": len(text.encode("utf-8"))}
+
+class SpillStore:
+    """
+    Keeps oversized tool results out of the transcript.
+
+    A result longer than `threshold` characters is written to a BlobStore
+    under ~/.webwright/spill and replaced by a stub: a handle, the first
+    and last few lines, and its size. The model reads the rest a slice at
+    a time with the read_spilled_result tool, so no single prompt carries
+    more than one threshold's worth of tool output.
+
+    For a JSON object result (what most tools return) only the largest
+    fields are spilled, so flags like "success" and "error" stay visible.
+    """
+
+    def __init__(self, path: str = DEFAULT_SPILL_PATH, threshold: int = DEFAULT_THRESHOLD,
+                 head_chars: int = HEAD_CHARS, tail_chars: int = TAIL_CHARS):
+        self.blobs = BlobStore(path)
+        self.threshold = threshold
+        self.head_chars = head_chars
+        self.tail_chars = tail_chars
+
+    @classmethod
+    def from_config(cls, config=None) -> 'SpillStore':
+        """
+        TOOL_SPILL_THRESHOLD in the [config] section sets the size, in
+        characters, above which a result is spilled; 0 turns spilling off.
+        """
+        value = config.get_config_value("config", "TOOL_SPILL_THRESHOLD") if config is not None else None
+        return cls(threshold=int(value) if value else DEFAULT_THRESHOLD)
+
+    def stub(self, text: str) -> Dict[str, Any]:
+        """
+        Stores `text` and returns what the transcript holds in its place.
+        """
+        digest = self.blobs.put(text.encode("utf-8"))
+        # A repeat of an earlier spill reuses its blob; keep prune from expiring it
+        self.blobs.touch(digest)
+        handle = HANDLE_PREFIX + digest
+        head = text[:self.head_chars]
+        tail = text[-self.tail_chars:]
+        # Trim to whole lines where the preview has any
+        if "\n" in head:
+            head = head[:head.rindex("\n") + 1]
+        if "\n" in tail:
+            tail = tail[tail.index("\n") + 1:]
+        return {
+            "spilled": handle,
+            "size": text_stats(text),
+            "head": head,
+            "tail": tail,
+            "note": f"Output too large to include. Call {READER} with this handle to read lines or a character range.",
+        }
+
+    def spill(self, function_name: str, result: str) -> str:
+        """
+        Returns `result` unchanged if it fits, otherwise with its largest
+        parts replaced by spill stubs.
+        """
+        if not self.threshold or function_name == READER or len(result) <= self.threshold:
+            return result
+
+        try:
+            parsed = json.loads(result)
+        except (json.JSONDecodeError, TypeError):
+            parsed = None
+
+        if not isinstance(parsed, dict):
+            text = parsed if isinstance(parsed, str) else result
+            logger.info(f"Spilled {len(result)} chars from {function_name}")
+            return json.dumps(self.stub(text))
+
+        # Spill fields largest first until the rest fits
+        fields = {key: value if isinstance(value, str) else json.dumps(value, indent=1, default=str)
+                  for key, value in parsed.items()}
+        size = len(result)
+        for key in sorted(fields, key=lambda key: len(fields[key]), reverse=True):
+            if size <= self.threshold:
+                break
+            parsed[key] = self.stub(fields[key])
+            size -= len(fields[key]) - len(json.dumps(parsed[key]))
+            logger.info(f"Spilled {len(fields[key])} chars of {function_name} field '{key}'")
+        return json.dumps(parsed)
+
+    def truncate(self, result: str) -> str:
+        """
+        Fallback for when a spill cannot be written: the head and tail of an
+        oversized `result` with no handle, since there is nothing to read back.
+        """
+        if not self.threshold or len(result) <= self.threshold:
+            return result
+        omitted = len(result) - self.head_chars - self.tail_chars
+        return (f"{result[:self.head_chars]}\n... [{omitted:,} chars omitted: output too large "
+                f"and could not be saved] ...\n{result[-self.tail_chars:]}")
+
+    def read(self, handle: str) -> str:
+        digest = handle[len(HANDLE_PREFIX):] if handle.startswith(HANDLE_PREFIX) else handle
+        # Handles come from the model; never let one name a path
+        if not re.fullmatch(r"[0-9a-f]{64}", digest):
+            raise KeyError(f"Invalid spill handle {handle}")
+        return self.blobs.get(digest).decode("utf-8")
+
+    def prune(self, max_age_days: float = MAX_AGE_DAYS) -> int:
+        """
+        Deletes spills older than `max_age_days` and returns how many went.
+        """
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for digest in list(self.blobs.digests()):
+            modified_at = self.blobs.modified_at(digest)
+            if modified_at is not None and modified_at < cutoff:
+                self.blobs.delete(digest)
+                removed += 1
+        if removed:
+            logger.info(f"Pruned {removed} spilled tool results")
+        return removed
+
+_spill_store: Optional[SpillStore] = None
+
+def get_spill_store(config=None) -> SpillStore:
+    """
+    Returns the shared spill store, pruning old spills when it is first created.
+    """
+    global _spill_store
+    if _spill_store is None:
+        _spill_store = SpillStore.from_config(config)
+        try:
+            _spill_store.prune()
+        except OSError as e:
+            logger.warning(f"Could not prune spilled tool results: {e}")
+    return _spill_store
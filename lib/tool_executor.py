@@ -0,0 +1,306 @@
+import os
+import sys
+import json
+import signal
+import asyncio
+import inspect
+import threading
+import subprocess
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional
+
+from lib.tool_scheduler import DEFAULT_MAX_CONCURRENCY
+from lib.util import get_logger
+
+logger = get_logger()
+
+# One worker per call the scheduler may run at once, so no call waits on a cold start
+DEFAULT_WORKERS = DEFAULT_MAX_CONCURRENCY
+DEFAULT_TIMEOUT = 300.0
+DEFAULT_MEMORY_LIMIT_MB = 0
+STARTUP_TIMEOUT = 60.0
+
+# Workers speak multiprocessing's framing over plain pipes, which needs POSIX;
+# elsewhere every tool runs in-process as before
+WORKERS_SUPPORTED = os.name == 'posix'
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEMORY_LIMIT_ENV = "WEBWRIGHT_TOOL_MEMORY_MB"
+
+class ToolTimeout(Exception):
+    pass
+
+class ToolCrashed(Exception):
+    pass
+
+def _data_size() -> int:
+    # Linux only; elsewhere the limit is counted from zero
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmData:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+def _limit_memory(megabytes: int):
+    """
+    Caps the worker's data segment (heap and private mappings) at what it
+    uses once the tools are imported plus `megabytes`, so a runaway tool
+    gets a MemoryError instead of swapping the machine. RLIMIT_DATA rather
+    than RLIMIT_AS: subprocesses inherit the limit, and runtimes such as
+    the JVM or Go reserve far more address space than they ever touch.
+    """
+    if not megabytes:
+        return
+    import resource
+    limit = _data_size() + megabytes * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+def worker_main():
+    """
+    Entry point of a worker process (python -m lib.tool_executor). Runs tool
+    calls read from stdin and writes each result to stdout, one at a time.
+    """
+    reader = Connection(os.dup(0), writable=False)
+    writer = Connection(os.dup(1), readable=False)
+    # Tools never see the protocol pipes: their output goes to stderr, input is empty
+    os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+    os.dup2(2, 1)
+    # Ctrl-C belongs to the shell, which decides what to cancel
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Only now import the tools, so anything they print lands on stderr
+    from lib.function_wrapper import callable_registry
+
+    megabytes = int(os.environ.get(MEMORY_LIMIT_ENV) or 0)
+    _limit_memory(megabytes)
+    writer.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            function_name, kwargs, cwd = reader.recv()
+        except EOFError:
+            return
+        try:
+            os.chdir(cwd)
+            result = callable_registry[function_name](**kwargs)
+            message = ("ok", result if isinstance(result, str) else json.dumps(result, default=str))
+        except MemoryError:
+            message = ("error", f"{function_name} ran out of memory (limit {megabytes} MB)")
+        except BaseException as e:
+            message = ("error", str(e) or type(e).__name__)
+        writer.send(message)
+
+class Worker:
+    """
+    One warm tool process. It imports every tool once at startup, then runs
+    calls until it is closed or killed.
+    """
+
+    def __init__(self, memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB):
+        env = dict(os.environ)
+        env[MEMORY_LIMIT_ENV] = str(memory_limit_mb or 0)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [PACKAGE_ROOT, env.get("PYTHONPATH")]))
+        # A session of its own keeps the terminal's Ctrl-C away and lets a
+        # kill take the tool's child processes (git, pip) with it
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "lib.tool_executor"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env, start_new_session=True,
+            # Not the user's directory, where a project's own lib package could shadow ours
+            cwd=PACKAGE_ROOT
+        )
+        self.writer = Connection(os.dup(self.process.stdin.fileno()), readable=False)
+        self.reader = Connection(os.dup(self.process.stdout.fileno()), writable=False)
+        self.process.stdin.close()
+        self.process.stdout.close()
+        self.ready = False
+        # Held while a thread polls the reader, which must not be closed under it
+        self._polling = threading.Lock()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def wait_ready(self, timeout: float = STARTUP_TIMEOUT) -> bool:
+        try:
+            if self._poll(timeout):
+                self.ready = self.reader.recv()[0] == "ready"
+        except (EOFError, OSError):
+            self.ready = False
+        return self.ready
+
+    def _poll(self, timeout: float) -> bool:
+        with self._polling:
+            return self.reader.poll(timeout)
+
+    async def call(self, function_name: str, kwargs: Dict[str, Any], cwd: str, timeout: float) -> str:
+        if not self.ready and not await asyncio.to_thread(self.wait_ready):
+            raise ToolCrashed(f"Tool worker {self.pid} failed to start")
+
+        self.writer.send((function_name, kwargs, cwd))
+        # Killing the worker ends this poll, so cancelling here leaves no thread behind
+        if not await asyncio.to_thread(self._poll, timeout):
+            raise ToolTimeout(f"{function_name} did not finish within {timeout:.0f}s and was stopped")
+        status, value = self.reader.recv()
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+        # With the worker dead a pending poll sees end of file and returns;
+        # close the reader only once it has
+        with self._polling:
+            self.reader.close()
+        self.writer.close()
+
+    def close(self):
+        # A worker still importing has nothing to finish
+        if not self.ready:
+            self.kill()
+            return
+        # End of input tells the worker to exit; kill it if it does not
+        self.writer.close()
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.kill()
+            return
+        self.reader.close()
+
+class ToolExecutor:
+    """
+    Runs sync tools in a pool of warm worker processes instead of threads.
+
+    A thread running a tool cannot be stopped, so a hung git_pull or pip
+    install used to hold the shell until it returned. A worker can be
+    killed: when a call passes its timeout (declared with @timeout, else
+    the default) or the turn is cancelled with Ctrl-C, the worker and
+    anything it started are killed, a fresh worker takes its place and the
+    call reports the error. Workers can also run under a memory limit.
+
+    Tools that need the shell's own state stay in-process: async tools,
+    tools taking olog or llm, and tools marked @in_process.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, default_timeout: float = DEFAULT_TIMEOUT,
+                 memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB):
+        self.size = max(workers, 0) if WORKERS_SUPPORTED else 0
+        self.default_timeout = default_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.idle: List[Worker] = []
+        self.busy = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+
+    @classmethod
+    def from_config(cls, config=None) -> 'ToolExecutor':
+        """
+        Reads from [config]:
+        TOOL_WORKERS: pool size, TOOL_CONCURRENCY when unset; 0 runs every tool in-process
+        TOOL_TIMEOUT: seconds a tool without @timeout may run
+        TOOL_MEMORY_LIMIT_MB: memory a tool may allocate; off unless set
+        """
+        executor = cls()
+        if config is not None:
+            for attribute, key, cast in (('size', 'TOOL_CONCURRENCY', int),
+                                         ('size', 'TOOL_WORKERS', int),
+                                         ('default_timeout', 'TOOL_TIMEOUT', float),
+                                         ('memory_limit_mb', 'TOOL_MEMORY_LIMIT_MB', int)):
+                value = config.get_config_value("config", key)
+                if value:
+                    setattr(executor, attribute, cast(value))
+        if not WORKERS_SUPPORTED:
+            executor.size = 0
+        return executor
+
+    def in_process(self, function_name: str) -> bool:
+        from lib.function_wrapper import callable_registry
+        func = callable_registry.get(function_name)
+        if not self.size or func is None:
+            return True
+        params = inspect.signature(func).parameters
+        return (getattr(func, 'in_process', False) or asyncio.iscoroutinefunction(func)
+                or 'olog' in params or 'llm' in params)
+
+    def timeout_for(self, function_name: str) -> float:
+        from lib.function_wrapper import callable_registry
+        return getattr(callable_registry.get(function_name), 'timeout', None) or self.default_timeout
+
+    def warm(self):
+        """
+        Starts workers up to the pool size. They import the tools in the
+        background, so the first call does not wait for it.
+        """
+        while len(self.idle) + self.busy < self.size:
+            self.idle.append(Worker(self.memory_limit_mb))
+
+    def _slots(self) -> asyncio.Semaphore:
+        # Calls beyond the pool size wait for a worker rather than start a
+        # throwaway one; the semaphore belongs to the loop that made it
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(max(self.size, 1))
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def run(self, function_name: str, kwargs: Dict[str, Any]) -> str:
+        """
+        Runs one tool call in a worker and returns its result as text.
+        """
+        async with self._slots():
+            worker = self.idle.pop() if self.idle else Worker(self.memory_limit_mb)
+            self.busy += 1
+            healthy = False
+            try:
+                result = await worker.call(function_name, kwargs, os.getcwd(), self.timeout_for(function_name))
+                healthy = True
+                return result
+            except ToolTimeout:
+                logger.error(f"Killing tool worker {worker.pid}: {function_name} timed out")
+                raise
+            except asyncio.CancelledError:
+                logger.info(f"Killing tool worker {worker.pid}: {function_name} was cancelled")
+                raise
+            except (EOFError, OSError) as e:
+                code = worker.process.poll()
+                raise ToolCrashed(f"{function_name} ended its worker process (exit code {code})") from e
+            except RuntimeError:
+                # The tool raised; the worker itself is fine
+                healthy = True
+                raise
+            finally:
+                self.busy -= 1
+                if healthy:
+                    self.idle.append(worker)
+                else:
+                    worker.kill()
+                    self.warm()
+
+    def shutdown(self):
+        for worker in self.idle:
+            worker.close()
+        self.idle = []
+
+_executor: Optional[ToolExecutor] = None
+
+def get_tool_executor(config=None) -> ToolExecutor:
+    """
+    Returns the shared executor, creating it from the config on first use.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ToolExecutor.from_config(config)
+    return _executor
+
+def shutdown_tool_executor():
+    if _executor is not None:
+        _executor.shutdown()
+
+if __name__ == "__main__":
+    worker_main()
@@ -0,0 +1,83 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from lib.function_wrapper import callable_registry
+from lib.util import get_logger
+
+logger = get_logger()
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+def is_read_only(function_name: str) -> bool:
+    # Set by the @read_only marker; unknown and unmarked tools are treated as mutating
+    return getattr(callable_registry.get(function_name), 'is_read_only', False)
+
+class ToolScheduler:
+    """
+    Runs the function calls from one model response, overlapping the ones
+    that cannot interfere with each other.
+
+    Consecutive read-only calls form a stage that runs concurrently, at most
+    `max_concurrency` at a time. A mutating call is a stage of its own: it
+    starts after everything before it has finished and everything after it
+    waits for it, so the model's ordering still holds wherever it matters.
+    Results come back in the model's order.
+    """
+
+    def __init__(self, execute: Callable[[Dict[str, Any]], Awaitable[Any]], max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 read_only: Callable[[str], bool] = is_read_only):
+        self.execute = execute
+        self.max_concurrency = max(1, max_concurrency)
+        self.read_only = read_only
+
+    @classmethod
+    def from_config(cls, execute, config=None) -> 'ToolScheduler':
+        """
+        TOOL_CONCURRENCY in the [config] section sets the limit; 1 runs every call in turn.
+        """
+        value = config.get_config_value("config", "TOOL_CONCURRENCY") if config is not None else None
+        return cls(execute, int(value) if value else DEFAULT_MAX_CONCURRENCY)
+
+    def plan(self, function_calls: List[Dict[str, Any]]) -> List[List[int]]:
+        """
+        Splits the calls into stages of indices that may run together.
+        """
+        stages: List[List[int]] = []
+        parallel: List[int] = []
+        for index, call in enumerate(function_calls):
+            if self.read_only(call["name"]):
+                parallel.append(index)
+                continue
+            if parallel:
+                stages.append(parallel)
+                parallel = []
+            stages.append([index])
+        if parallel:
+            stages.append(parallel)
+        return stages
+
+    async def run(self, function_calls: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Executes every call and returns their results in order. A call that
+        raises has the exception in its slot instead of a result.
+        """
+        results: List[Any] = [None] * len(function_calls)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(index: int):
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    results[index] = await self.execute(function_calls[index])
+                except Exception as e:
+                    results[index] = e
+                logger.info(f"Tool {function_calls[index]['name']} finished in {time.monotonic() - started:.2f}s")
+
+        started = time.monotonic()
+        stages = self.plan(function_calls)
+        for stage in stages:
+            await asyncio.gather(*(run_one(index) for index in stage))
+        if len(function_calls) > 1:
+            logger.info(f"Ran {len(function_calls)} tool calls in {len(stages)} stages in {time.monotonic() - started:.2f}s")
+        return results
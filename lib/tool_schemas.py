@@ -0,0 +1,94 @@
+import json
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from lib import function_wrapper
+from lib.util import get_logger
+
+logger = get_logger()
+
+PROVIDERS = ('openai', 'anthropic', 'ollama')
+
+class CompiledTools:
+    """
+    One provider's tool payload, built once. `payload` is what the SDK call
+    takes; `serialized` is the same payload as compact JSON bytes, for
+    clients that post raw request bodies and for cheap hashing and logging.
+    """
+
+    def __init__(self, provider: str, payload: List[Dict[str, Any]]):
+        self.provider = provider
+        self.payload = payload
+        self.serialized = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        self.digest = hashlib.sha256(self.serialized).hexdigest()
+        self.names = [tool.get('name') or tool['function']['name'] for tool in payload]
+
+    def __len__(self):
+        return len(self.payload)
+
+def _to_anthropic(tool: Dict[str, Any]) -> Dict[str, Any]:
+    function = tool['function']
+    return {
+        "name": function['name'],
+        "description": function['description'],
+        "input_schema": {
+            "type": "object",
+            "properties": function['parameters'].get('properties', {}),
+            "required": function['parameters'].get('required', [])
+        }
+    }
+
+class ToolSchemaCompiler:
+    """
+    Memoizes provider tool payloads built from function_wrapper's `tools`.
+
+    The schemas never change once the function modules are loaded, so each
+    provider's payload is compiled on first use and reused until the
+    registry changes (a function is registered) or a different tool list
+    is passed in.
+    """
+
+    def __init__(self):
+        self._compiled: Dict[Tuple, CompiledTools] = {}
+        self._lock = threading.Lock()
+
+    def compile(self, provider: str, tools: Optional[List[Dict[str, Any]]], cache_breakpoint: bool = False) -> Optional[CompiledTools]:
+        """
+        Returns the compiled payload for `provider`, or None when there are no tools.
+        With cache_breakpoint, the last Anthropic tool carries a cache_control marker.
+        """
+        if not tools:
+            return None
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown provider: {provider}")
+
+        key = (
+            provider,
+            cache_breakpoint,
+            function_wrapper.registry_generation,
+            tuple(tool['function']['name'] for tool in tools if 'function' in tool)
+        )
+        compiled = self._compiled.get(key)
+        if compiled is not None:
+            return compiled
+
+        with self._lock:
+            if provider == 'anthropic':
+                payload = [_to_anthropic(tool) for tool in tools if 'function' in tool]
+                if cache_breakpoint and payload:
+                    payload[-1] = {**payload[-1], "cache_control": {"type": "ephemeral"}}
+            else:
+                # OpenAI and Ollama share the function-calling format function_wrapper produces
+                payload = [tool for tool in tools if 'function' in tool]
+            compiled = CompiledTools(provider, payload)
+            self._compiled[key] = compiled
+
+        logger.info(f"Compiled {len(compiled)} {provider} tool schemas ({len(compiled.serialized)} bytes)")
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._compiled.clear()
+
+tool_schemas = ToolSchemaCompiler()
@@ -0,0 +1,203 @@
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from lib.util import get_logger
+
+logger = get_logger()
+
+# A converted entry is a list of steps applied to the transcript in order:
+#   ("append", message)   add a provider message
+#   ("pending", message)  hold an assistant tool-use message until its results arrive
+#   ("results", messages) emit the held message followed by these tool results
+Fragment = List[Tuple[str, Any]]
+
+def _text_of(content: List[Dict[str, Any]]) -> str:
+    return next((item["text"] for item in content if item["type"] == "text"), "")
+
+def _tool_uses(content: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [item for item in content if item["type"] == "tool_use"]
+
+def _output_text(output: Any) -> str:
+    return output if isinstance(output, str) else json.dumps(output)
+
+def anthropic_fragment(entry: Dict[str, Any]) -> Fragment:
+    if entry["type"] == "user_query":
+        return [("append", {"role": "user", "content": entry["content"]})]
+    if entry["type"] == "llm_response":
+        if not isinstance(entry["content"], list):
+            return [("append", {"role": "assistant", "content": entry["content"]})]
+        text_content = _text_of(entry["content"])
+        tool_uses = _tool_uses(entry["content"])
+        if not tool_uses:
+            return [("append", {"role": "assistant", "content": text_content})]
+        # Anthropic rejects empty text blocks
+        blocks = [{"type": "text", "text": text_content}] if text_content else []
+        blocks.extend({
+            "type": "tool_use",
+            "id": tool_use["id"],
+            "name": tool_use["name"],
+            "input": tool_use["input"]
+        } for tool_use in tool_uses)
+        return [("pending", {"role": "assistant", "content": blocks})]
+    if entry["type"] == "tool_call" and isinstance(entry.get("content"), list):
+        # Every result for the tool_use message goes back in the next user turn
+        return [("results", [{
+            "role": "user",
+            "content": [{
+                "type": "tool_result",
+                "tool_use_id": tool_result["tool_call_id"],
+                "content": _output_text(tool_result["output"])
+            } for tool_result in entry["content"]]
+        }])]
+    return []
+
+def openai_fragment(entry: Dict[str, Any]) -> Fragment:
+    if entry["type"] == "user_query":
+        return [("append", {"role": "user", "content": entry["content"]})]
+    if entry["type"] == "llm_response":
+        if not isinstance(entry["content"], list):
+            return [("append", {"role": "assistant", "content": entry["content"]})]
+        # Handle structured content (e.g., text and tool use)
+        text_content = _text_of(entry["content"])
+        tool_uses = _tool_uses(entry["content"])
+        if not tool_uses:
+            return [("append", {"role": "assistant", "content": text_content})]
+        return [("pending", {
+            "role": "assistant",
+            "content": text_content,
+            "tool_calls": [{
+                "id": tool_use["id"],
+                "type": "function",
+                "function": {
+                    "name": tool_use["name"],
+                    "arguments": json.dumps(tool_use["input"])
+                }
+            } for tool_use in tool_uses]
+        })]
+    if entry["type"] == "tool_call" and isinstance(entry.get("content"), list):
+        return [("results", [{
+            "role": "tool",
+            "content": json.dumps(tool_result["output"]),
+            "tool_call_id": tool_result["tool_call_id"]
+        } for tool_result in entry["content"]])]
+    return []
+
+def ollama_fragment(entry: Dict[str, Any]) -> Fragment:
+    if entry["type"] == "user_query":
+        return [("append", {"role": "user", "content": entry["content"]})]
+    if entry["type"] == "llm_response":
+        if not isinstance(entry["content"], list):
+            return [("append", {"role": "assistant", "content": entry["content"]})]
+        text_content = _text_of(entry["content"])
+        tool_uses = _tool_uses(entry["content"])
+        if not tool_uses:
+            return [("append", {"role": "assistant", "content": text_content})]
+        # Ollama takes arguments as an object and pairs results with calls by position
+        return [("pending", {
+            "role": "assistant",
+            "content": text_content,
+            "tool_calls": [{
+                "function": {"name": tool_use["name"], "arguments": tool_use["input"]}
+            } for tool_use in tool_uses]
+        })]
+    if entry["type"] == "tool_call" and isinstance(entry.get("content"), list):
+        return [("results", [{
+            "role": "tool",
+            "content": json.dumps(tool_result["output"]),
+            "tool_name": tool_result.get("name")
+        } for tool_result in entry["content"]])]
+    return []
+
+def entry_key(entry: Dict[str, Any]) -> Optional[Tuple[str, Optional[int]]]:
+    # ContextBuilder may hand over a copy truncated to some token limit under the same id
+    entry_id = entry.get("id")
+    return (entry_id, entry.get("truncated_to")) if entry_id else None
+
+class Transcript:
+    """
+    Converts OmniLog entries into one provider's messages, incrementally.
+
+    Each entry is converted once and memoized by (id, truncation). The last
+    assembled transcript is kept too, so a call whose entries extend the
+    previous call's (the usual case within a turn) only applies the new
+    entries. Entries without an id are converted on every call.
+    """
+
+    def __init__(self, convert_entry: Callable[[Dict[str, Any]], Fragment], max_cached: int = 4096):
+        self.convert_entry = convert_entry
+        self.max_cached = max_cached
+        self._fragments: "OrderedDict[Tuple[str, Optional[int]], Fragment]" = OrderedDict()
+        self._keys: Tuple = ()
+        self._messages: List[Dict[str, Any]] = []
+        self._pending: Optional[Dict[str, Any]] = None
+        self._answering = False
+        self.converted = 0
+
+    def _fragment(self, entry: Dict[str, Any], key) -> Fragment:
+        if key is None:
+            self.converted += 1
+            return self.convert_entry(entry)
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            self.converted += 1
+            fragment = self.convert_entry(entry)
+            self._fragments[key] = fragment
+            if len(self._fragments) > self.max_cached:
+                self._fragments.popitem(last=False)
+        else:
+            self._fragments.move_to_end(key)
+        return fragment
+
+    def convert(self, entries: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Returns the provider messages and any assistant tool-use message still
+        waiting for its results.
+        """
+        keys = tuple(entry_key(entry) for entry in entries)
+        reusable = self._keys and None not in keys and keys[:len(self._keys)] == self._keys
+        if reusable:
+            messages, pending, answering, start = self._messages, self._pending, self._answering, len(self._keys)
+        else:
+            messages, pending, answering, start = [], None, False, 0
+
+        for entry, key in zip(entries[start:], keys[start:]):
+            for step, value in self._fragment(entry, key):
+                if step == "append":
+                    messages.append(value)
+                    answering = False
+                elif step == "pending":
+                    pending = value
+                    answering = False
+                elif step == "results" and pending:
+                    messages.append(pending)
+                    messages.extend(value)
+                    pending = None
+                    answering = True
+                elif step == "results" and answering:
+                    # Older histories logged each result of one tool-use message as its own entry
+                    messages.extend(value)
+
+        if None not in keys:
+            self._keys, self._messages, self._pending, self._answering = keys, messages, pending, answering
+        else:
+            self._keys, self._messages, self._pending, self._answering = (), [], None, False
+
+        logger.debug(f"Transcript: {len(entries) - start} of {len(entries)} entries applied, {len(messages)} messages")
+        return list(messages), pending
+
+_transcripts: Dict[str, Transcript] = {}
+
+FRAGMENT_CONVERTERS = {
+    "anthropic": anthropic_fragment,
+    "openai": openai_fragment,
+    "ollama": ollama_fragment,
+}
+
+def transcript_for(provider: str) -> Transcript:
+    """
+    Returns the session-wide transcript for a provider.
+    """
+    if provider not in _transcripts:
+        _transcripts[provider] = Transcript(FRAGMENT_CONVERTERS[provider])
+    return _transcripts[provider]
@@ -8,6 +8,7 @@ import logging
 from datetime import datetime
 from coolname import generate_slug
 from prompt_toolkit.formatted_text import FormattedText
+from prompt_toolkit import print_formatted_text
 from prompt_toolkit.styles import Style
 
 # Constants
@@ -109,51 +110,103 @@ def calculate_file_hash(file_path):
         logger.error(f"Error calculating hash for {file_path}: {str(e)}")
         return None
 
-def format_response(response):
-    if response is None:
-        return FormattedText([('class:error', "No response to format.\n")])
-    
-    formatted_text = []
-    lines = response.split('\n')
-    in_code_block = False
-    tag_stack = []
-    code_lines = []
-    
-    math_pattern = re.compile(r'\\\(.*?\\\)')
-    tag_pattern = re.compile(r'<(\w+)>|</(\w+)>')
-    inline_code_pattern = re.compile(r'(`.*?`|``.*?``)')
+MATH_PATTERN = re.compile(r'\\\(.*?\\\)')
+TAG_PATTERN = re.compile(r'<(\w+)>|</(\w+)>')
+INLINE_CODE_PATTERN = re.compile(r'(`.*?`|``.*?``)')
+INLINE_SPLIT_PATTERN = re.compile(r'(\*\*.*?\*\*|`.*?`|``.*?``|\\\(.*?\\\))')
 
-    in_html_block = False
+# Characters that may open inline markup; prose is only emitted early up to the first of these
+MARKUP_CHARS = set('*`<\\')
+
+class IncrementalFormatter:
+    """
+    Formats a response as it streams in, chunk by chunk.
+
+    Code fence, <html> and tag state carries over between chunks, so a fence
+    or tag split across chunk boundaries is handled once its line completes.
+    Complete lines are formatted exactly as format_response would. The
+    unfinished tail of a line is emitted early when that is safe: code inside
+    a fence, or plain prose up to the last space before any markup.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.emitted = 0
+        self.in_code_block = False
+        self.in_html_block = False
+        self.tag_stack = []
+
+    def feed(self, chunk):
+        fragments = []
+        self.buffer += chunk
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            fragments.extend(self._format_line(line, self.emitted))
+            self.emitted = 0
+        fragments.extend(self._format_partial())
+        return fragments
+
+    def finish(self):
+        """
+        Formats whatever is left of the last line.
+        """
+        line, self.buffer = self.buffer, ''
+        fragments = self._format_line(line, self.emitted)
+        self.emitted = 0
+        return fragments
+
+    def _format_partial(self):
+        line = self.buffer
+        if not line or self.in_html_block or line[0] in '`#':
+            return []
+        if self.in_code_block:
+            chunk, self.emitted = line[self.emitted:], len(line)
+            return [('class:code', chunk)] if chunk else []
+
+        safe = line
+        for i, char in enumerate(line):
+            if char in MARKUP_CHARS:
+                safe = line[:i]
+                break
+        end = safe.rfind(' ') + 1
+        if end <= self.emitted:
+            return []
+        chunk, self.emitted = line[self.emitted:end], end
+        return [(self._current_class(), chunk)]
+
+    def _current_class(self):
+        return f'class:{self.tag_stack[-1]}' if self.tag_stack else ''
+
+    def _format_line(self, line, emitted=0):
+        # `emitted` characters of this line were already written by _format_partial
+        formatted_text = []
+
+        if not emitted and line.startswith('```'):
+            self.in_code_block = not self.in_code_block
+            return formatted_text
+
+        if self.in_code_block:
+            formatted_text.append(('class:code', line[emitted:] + '\n'))
+            return formatted_text
+
+        line = line[emitted:]
 
-    for line in lines:
-        if line.startswith('```'):
-            if in_code_block:
-                in_code_block = False
-                formatted_text.append(('class:code', ''.join(code_lines)))
-                code_lines = []
-            else:
-                in_code_block = True
-            continue
-        
-        if in_code_block:
-            code_lines.append(line + '\n')
-            continue
-        
         # Check for <html> tags and handle them separately
         if '<html>' in line:
-            in_html_block = True
+            self.in_html_block = True
             formatted_text.append(('class:html', line + '\n'))
-            continue
+            return formatted_text
         if '</html>' in line:
-            in_html_block = False
+            self.in_html_block = False
             formatted_text.append(('class:html', line + '\n'))
-            continue
-        if in_html_block:
+            return formatted_text
+        if self.in_html_block:
             formatted_text.append(('class:html', line + '\n'))
-            continue
+            return formatted_text
 
+        tag_stack = self.tag_stack
         remaining_line = line
-        while (match := tag_pattern.search(remaining_line)):
+        while (match := TAG_PATTERN.search(remaining_line)):
             opening_tag, closing_tag = match.groups()
             start, end = match.span()
             if opening_tag:
@@ -173,28 +226,67 @@ def format_response(response):
                 remaining_line = remaining_line[end:]
         
         # Apply formatting based on current tag context
-        current_class = f'class:{tag_stack[-1]}' if tag_stack else ''
+        current_class = self._current_class()
         
-        if remaining_line.startswith('#'):
+        if not emitted and remaining_line.startswith('#'):
             formatted_text.append(('class:header', remaining_line + '\n'))
         else:
-            parts = re.split(r'(\*\*.*?\*\*|`.*?`|``.*?``|\\\(.*?\\\))', remaining_line)
+            parts = INLINE_SPLIT_PATTERN.split(remaining_line)
             for part in parts:
                 if part.startswith('**') and part.endswith('**'):
                     formatted_text.append((f'{current_class} class:bold', part[2:-2]))
-                elif inline_code_pattern.match(part):
+                elif INLINE_CODE_PATTERN.match(part):
                     # Handle both single and double ticks
                     code_content = part[1:-1] if part.startswith('`') else part[2:-2]
                     formatted_text.append((f'{current_class} class:inline-code', code_content))
-                elif math_pattern.match(part):
+                elif MATH_PATTERN.match(part):
                     formatted_text.append((f'{current_class} class:math', part[2:-2]))
                 else:
                     formatted_text.append((current_class, part))
             
             formatted_text.append((current_class, '\n'))
+
+        return formatted_text
+
+def format_response(response):
+    if response is None:
+        return FormattedText([('class:error', "No response to format.\n")])
+
+    formatter = IncrementalFormatter()
+    formatted_text = []
+    lines = response.split('\n')
+    for line in lines:
+        formatted_text.extend(formatter._format_line(line))
     
     return FormattedText(formatted_text)
 
+class StreamRenderer:
+    """
+    Prints streamed response text to the terminal as it arrives, formatted
+    with IncrementalFormatter. `on_first_token` runs before the first output,
+    e.g. to stop a spinner.
+    """
+
+    def __init__(self, on_first_token=None):
+        self.formatter = IncrementalFormatter()
+        self.on_first_token = on_first_token
+        self.started = False
+
+    def _print(self, fragments):
+        if fragments:
+            print_formatted_text(FormattedText(fragments), style=custom_style, end='')
+
+    def feed(self, text):
+        if not self.started:
+            self.started = True
+            if self.on_first_token:
+                self.on_first_token()
+        self._print(self.formatter.feed(text))
+
+    def finish(self):
+        if self.started:
+            self._print(self.formatter.finish())
+
 
 # Styles
 custom_style = Style.from_dict({
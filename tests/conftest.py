@@ -1,5 +1,142 @@
+import asyncio
+import hashlib
 import warnings
 import pytest
 
 def pytest_configure(config):
-    warnings.filterwarnings("ignore", category=pytest.PytestAssertRewriteWarning)
\ No newline at end of file
+    warnings.filterwarnings("ignore", category=pytest.PytestAssertRewriteWarning)
+
+class StubConfig:
+    """
+    Stands in for lib.config.Config with [config] values from a dict.
+    """
+
+    def __init__(self, values):
+        self.values = values
+
+    def get_config_value(self, section, key):
+        return self.values.get(key) if section == "config" else None
+
+    def get_ollama_endpoint(self):
+        return self.values["OLLAMA_API_ENDPOINT"]
+
+    def get_anthropic_api_key(self):
+        return self.values.get("ANTHROPIC_API_KEY", "stub-key")
+
+class ScriptedLLM:
+    """
+    Stands in for llm_wrapper: asks for the scripted tool calls, one list
+    per step, then answers with a summary. A dict in the script is returned
+    as that step's whole response. Every call is recorded.
+    """
+    calls = []
+    script = []
+
+    def __init__(self, config=None):
+        self.config = config
+
+    async def call_llm_api(self, messages=None, system_prompt=None, tools=None, on_text=None, **kwargs):
+        step = len(ScriptedLLM.calls)
+        ScriptedLLM.calls.append({"messages": messages, "system_prompt": system_prompt})
+        usage = {"input_tokens": 1000, "output_tokens": 100}
+        if step < len(ScriptedLLM.script) and isinstance(ScriptedLLM.script[step], dict):
+            return ScriptedLLM.script[step]
+        if step < len(ScriptedLLM.script):
+            return {"content": "", "function_calls": ScriptedLLM.script[step], "formatted_response": None, "usage": usage}
+        return {"content": "Summary", "function_calls": [], "formatted_response": None, "usage": usage}
+
+class ListLog:
+    """
+    OmniLog stand-in holding entries in a list, starting from one user query.
+    """
+
+    def __init__(self):
+        self.entries = [{"type": "user_query", "content": "show me the files"}]
+
+    def add_entry(self, entry):
+        self.entries.append(entry)
+
+class HistoryContext:
+    """
+    ContextBuilder stand-in that hands the model the whole log.
+    """
+
+    def __init__(self, olog, config=None):
+        self.olog = olog
+
+    def build(self, **kwargs):
+        return list(self.olog.entries)
+
+class FakeEmbedder:
+    """
+    Embedder stand-in: hashed bag of words, so texts sharing words are near.
+    Records every batch it is asked to embed.
+    """
+    name = "fake-bow"
+    dimensions = 32
+
+    def __init__(self):
+        self.batches = []
+
+    def embed(self, texts):
+        self.batches.append(list(texts))
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimensions
+            for word in text.lower().split():
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimensions] += 1.0
+            vector[0] += 0.01
+            vectors.append(vector)
+        return vectors
+
+@pytest.fixture
+def make_olog(tmp_path, monkeypatch):
+    """
+    Opens OmniLogVectorStores over one temporary path with a FakeEmbedder,
+    from inside a temporary project. All are closed at teardown.
+    """
+    from lib.omnilog import OmniLogVectorStore
+
+    project = tmp_path / "project"
+    project.mkdir()
+    monkeypatch.chdir(project)
+    opened = []
+
+    def make(**kwargs):
+        kwargs.setdefault("embedder", FakeEmbedder())
+        olog = OmniLogVectorStore(path=str(tmp_path / "omnilog"), **kwargs)
+        opened.append(olog)
+        return olog
+
+    yield make
+    for olog in opened:
+        olog.close()
+        olog.index.close()
+        olog.embedding_cache.close()
+
+@pytest.fixture
+def make_config():
+    return StubConfig
+
+@pytest.fixture
+def agent_turn(monkeypatch):
+    """
+    Runs aifunc.ai against a ScriptedLLM with tools in-process. Returns
+    the log and the recorded LLM calls.
+    """
+    from lib import aifunc, tool_executor
+    from lib.tool_executor import ToolExecutor
+
+    monkeypatch.setattr(aifunc, "llm_wrapper", ScriptedLLM)
+    monkeypatch.setattr(aifunc, "ContextBuilder", HistoryContext)
+    monkeypatch.setattr(tool_executor, "_executor", ToolExecutor(workers=0))
+
+    def run(script, **settings):
+        ScriptedLLM.calls = []
+        ScriptedLLM.script = script
+        olog = ListLog()
+        config = StubConfig({"STREAM_RESPONSES": "false", **settings})
+        assert asyncio.run(aifunc.ai(config=config, olog=olog))
+        return olog, ScriptedLLM.calls
+
+    return run
@@ -0,0 +1,67 @@
+import json
+import pytest
+
+# Halo's spinner thread still uses setDaemon
+pytestmark = pytest.mark.filterwarnings("ignore:setDaemon:DeprecationWarning")
+
+def cat_calls(paths, step=0):
+    return [{"id": f"call_{step}_{i}", "name": "cat_file", "arguments": {"file_path": path}} for i, path in enumerate(paths)]
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for name in ("a.txt", "b.txt", "c.txt"):
+        path = tmp_path / name
+        path.write_text(f"contents of {name}")
+        paths.append(str(path))
+    return paths
+
+def test_results_return_to_model_until_it_answers(agent_turn, files):
+    olog, calls = agent_turn([cat_calls(files[:2]), cat_calls(files[2:], step=1)])
+
+    # Two tool steps, then the answer; no separate summarization prompt
+    assert len(calls) == 3
+    assert all(call["system_prompt"] is None for call in calls)
+    assert [entry["type"] for entry in olog.entries] == [
+        "user_query", "llm_response", "tool_call", "llm_response", "tool_call", "llm_response"
+    ]
+    first_results = olog.entries[2]["content"]
+    assert [result["tool_call_id"] for result in first_results] == ["call_0_0", "call_0_1"]
+    assert "contents of b.txt" in json.loads(first_results[1]["output"])["contents"]
+    assert olog.entries[-1]["content"] == "Summary"
+
+def test_step_limit_ends_with_summary(agent_turn, files):
+    script = [cat_calls(files[:1], step=0), cat_calls(files[1:2], step=1), cat_calls(files[2:], step=2)]
+    olog, calls = agent_turn(script, AGENT_MAX_STEPS="2")
+
+    assert len(calls) == 3
+    assert "step limit" in calls[-1]["system_prompt"]
+    assert len([entry for entry in olog.entries if entry["type"] == "tool_call"]) == 2
+
+def test_repeated_calls_and_token_budget_stop_early(agent_turn, files):
+    _, calls = agent_turn([cat_calls(files[:1])] * 5)
+    assert len(calls) == 3
+    assert "repeated" in calls[-1]["system_prompt"]
+
+    _, calls = agent_turn([cat_calls(files[i:i + 1], step=i) for i in range(3)], AGENT_TOKEN_BUDGET="1500")
+    assert len(calls) == 3
+    assert "token budget" in calls[-1]["system_prompt"]
+
+def test_one_step_budget_is_a_single_batched_summary(agent_turn, files):
+    olog, calls = agent_turn([cat_calls(files)] * 2, AGENT_MAX_STEPS="1")
+
+    # Every tool runs, then one summary call sees all results
+    assert len(calls) == 2
+    tool_entries = [entry for entry in olog.entries if entry["type"] == "tool_call"]
+    assert len(tool_entries) == 1
+    assert [result["tool_call_id"] for result in tool_entries[0]["content"]] == ["call_0_0", "call_0_1", "call_0_2"]
+
+def test_failed_llm_call_is_reported(agent_turn, monkeypatch):
+    from lib import aifunc
+    printed = []
+    monkeypatch.setattr(aifunc, "print_formatted_text", lambda text, **kwargs: printed.append(text))
+
+    failure = {"content": "An error occurred while processing your request: overloaded", "function_calls": [],
+               "formatted_response": None, "error": "overloaded"}
+    agent_turn([failure])
+    assert [("class:error", "Error calling the LLM: overloaded")] in [list(text) for text in printed]
@@ -0,0 +1,53 @@
+import asyncio
+import uuid
+import pytest
+
+from benchmarks.stub_llm_server import start_stub
+from lib.llm import llm_wrapper
+from lib.llm_clients import close_clients
+
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "git_status",
+        "description": "Shows the working tree status",
+        "parameters": {"type": "object", "properties": {}, "required": []}
+    }
+}]
+
+def run_anthropic(make_config, turns, **settings):
+    # A prompt of its own, so no other test has warmed the stub's cache
+    system_prompt = f"You are a test assistant {uuid.uuid4().hex}"
+
+    async def main():
+        runner, base_url = await start_stub()
+        try:
+            config = make_config({"ANTHROPIC_BASE_URL": base_url, "ANTHROPIC_MODEL": "claude-stub", **settings})
+            llm = llm_wrapper(service_api="anthropic", config=config)
+            usages = []
+            for turn in range(turns):
+                history = [{"id": f"q{turn}", "type": "user_query", "content": f"question {turn}"}]
+                result = await llm.call_llm_api(history, system_prompt=system_prompt, tools=TOOLS, service_api="anthropic")
+                usages.append(result["usage"])
+            return usages
+        finally:
+            await close_clients()
+            await runner.cleanup()
+    return asyncio.run(main())
+
+@pytest.fixture(autouse=True)
+def stub_only(monkeypatch):
+    # ANTHROPIC_BASE_URL in the environment would win over the stub's URL
+    monkeypatch.delenv("ANTHROPIC_BASE_URL", raising=False)
+
+def test_second_call_reads_the_cached_prefix(make_config):
+    first, second = run_anthropic(make_config, 2)
+
+    # The breakpoints cover tools + system, so only the messages differ
+    assert first["cache_write_tokens"] > 0 and first["cache_read_tokens"] == 0
+    assert second["cache_read_tokens"] == first["cache_write_tokens"]
+    assert second["cache_write_tokens"] == 0
+
+def test_prompt_caching_can_be_turned_off(make_config):
+    usages = run_anthropic(make_config, 2, ANTHROPIC_PROMPT_CACHING="false")
+    assert all(usage["cache_read_tokens"] == usage["cache_write_tokens"] == 0 for usage in usages)
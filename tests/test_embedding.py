@@ -0,0 +1,50 @@
+import itertools
+import pytest
+
+from lib import embedding
+from lib.embedding import CachedEmbeddingFunction, EmbeddingCache
+
+class CountingEmbedder:
+    name = "counting"
+
+    def __init__(self):
+        self.texts = []
+
+    def embed(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # A clock that always moves, so LRU order never rests on a tie
+    clock = itertools.count(1)
+    monkeypatch.setattr(embedding.time, "time", lambda: float(next(clock)))
+    cache = EmbeddingCache(str(tmp_path), max_entries=2)
+    yield cache
+    cache.close()
+
+def test_repeated_texts_are_embedded_once(cache):
+    embedder = CountingEmbedder()
+    function = CachedEmbeddingFunction(embedder, cache)
+
+    def embed(texts):
+        # Chroma may hand vectors back as numpy arrays
+        return [[float(value) for value in vector] for vector in function(texts)]
+
+    assert embed(["ab", "ab", "abc"]) == [[2.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+    assert embedder.texts == ["ab", "abc"]
+    assert embed(["abc"]) == [[3.0, 1.0]]
+    assert embedder.texts == ["ab", "abc"]
+    assert cache.hits == 1
+
+def test_least_recently_used_vector_is_evicted(cache):
+    keys = [EmbeddingCache.key("counting", text) for text in ("a", "b", "c")]
+    cache.put_many({keys[0]: [1.0], keys[1]: [2.0]})
+    # Reading "a" makes "b" the least recently used
+    assert cache.get_many([keys[0]]) == {keys[0]: [1.0]}
+    cache.put_many({keys[2]: [3.0]})
+
+    assert set(cache.get_many(keys)) == {keys[0], keys[2]}
+
+def test_cache_key_depends_on_the_embedder(cache):
+    assert EmbeddingCache.key("onnx", "text") != EmbeddingCache.key("st-all-MiniLM-L6-v2", "text")
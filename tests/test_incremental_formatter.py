@@ -0,0 +1,52 @@
+import pytest
+from lib.util import IncrementalFormatter, format_response
+
+RESPONSE = (
+    "Here is **the fix** for `parse_config`:\n"
+    "```python\n"
+    "def parse_config(path):\n"
+    "    return load(path)\n"
+    "```\n"
+    "# Notes\n"
+    "<thinking>check the tests</thinking> then commit\n"
+)
+
+def render(fragments):
+    return "".join(text for _, text in fragments)
+
+def styled(fragments):
+    # Merge neighbouring fragments so chunking does not change the comparison
+    merged = []
+    for style, text in fragments:
+        style = "" if style == "class:" else style
+        if not text:
+            continue
+        if merged and merged[-1][0] == style:
+            merged[-1] = (style, merged[-1][1] + text)
+        else:
+            merged.append((style, text))
+    return merged
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_chunked_stream_matches_format_response(chunk_size):
+    formatter = IncrementalFormatter()
+    fragments = []
+    for start in range(0, len(RESPONSE), chunk_size):
+        fragments.extend(formatter.feed(RESPONSE[start:start + chunk_size]))
+    fragments.extend(formatter.finish())
+
+    assert styled(fragments) == styled(format_response(RESPONSE))
+
+def test_fence_split_across_chunks_is_not_rendered():
+    formatter = IncrementalFormatter()
+    fragments = formatter.feed("`") + formatter.feed("``\nx = 1\n`") + formatter.feed("``\n")
+
+    assert render(fragments) == "x = 1\n"
+    assert ("class:code", "x = 1\n") in fragments
+
+def test_plain_prose_is_emitted_before_the_line_ends():
+    formatter = IncrementalFormatter()
+
+    assert render(formatter.feed("Give me a moment to th")) == "Give me a moment to "
+    assert render(formatter.feed("ink")) == ""
+    assert render(formatter.finish()) == "think\n"
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+
+from lib import llm
+from lib.llm_cache import ResponseCache
+
+HISTORY = [
+    {"type": "user_query", "content": "show git status", "timestamp": "2024-01-01T00:00:00", "id": "a"},
+    {"type": "llm_response", "timestamp": "2024-01-01T00:00:01", "content": [
+        {"type": "text", "text": "Checking"},
+        {"type": "tool_use", "id": "toolu_123", "name": "git_status", "input": {}},
+    ]},
+    {"type": "tool_call", "timestamp": "2024-01-01T00:00:02", "content": [
+        {"type": "tool_result", "tool_call_id": "toolu_123", "name": "git_status", "output": "clean"},
+    ]},
+]
+
+@pytest.fixture
+def cache(tmp_path):
+    c = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    yield c
+    c.close()
+
+def rerun(history, suffix):
+    # Same conversation logged later, with fresh timestamps and tool call ids
+    rerun = []
+    for entry in history:
+        entry = {**entry, "timestamp": "2025-06-01T00:00:00", "id": "other"}
+        if isinstance(entry["content"], list):
+            entry["content"] = [
+                {**item, **({"id": "toolu_" + suffix} if "id" in item else {}),
+                 **({"tool_call_id": "toolu_" + suffix} if "tool_call_id" in item else {})}
+                for item in entry["content"]
+            ]
+        rerun.append(entry)
+    return rerun
+
+def test_key_ignores_timestamps_and_call_ids():
+    key = ResponseCache.make_key("anthropic", "claude", "summarize", HISTORY)
+
+    assert ResponseCache.make_key("anthropic", "claude", "summarize", rerun(HISTORY, "999")) == key
+    assert ResponseCache.make_key("openai", "claude", "summarize", HISTORY) != key
+    assert ResponseCache.make_key("anthropic", "claude", "other prompt", HISTORY) != key
+
+def test_hit_miss_and_tool_calls_not_cached(cache):
+    assert cache.get("k") is None
+    assert cache.put("k", {"content": "The tree is clean.", "function_calls": [], "usage": {}})
+    assert cache.get("k")["content"] == "The tree is clean."
+    assert not cache.put("t", {"content": "", "function_calls": [{"name": "git_status"}]})
+    assert not cache.put("e", {"content": "failed", "function_calls": [], "error": "boom"})
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+def test_ttl_expiry(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=-1)
+    cache.put("k", {"content": "stale", "function_calls": []})
+
+    assert cache.get("k") is None
+    cache.close()
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.put("a", {"content": "a", "function_calls": []})
+    cache.put("b", {"content": "b", "function_calls": []})
+    cache.get("a")
+    cache.put("c", {"content": "c", "function_calls": []})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    cache.close()
+
+def test_only_calls_with_a_fixed_provider_are_cached(cache, monkeypatch, make_config):
+    monkeypatch.setattr(llm, "get_response_cache", lambda config: cache)
+    wrapper = llm.llm_wrapper(config=make_config({"PREFERRED_API": "openai", "OPENAI_MODEL": "gpt-4o"}))
+    calls = []
+
+    async def route(*args):
+        calls.append(args)
+        return {"content": "answer", "timestamp": "2024-01-01T00:00:00", "function_calls": []}
+    monkeypatch.setattr(wrapper, "_route", route)
+
+    def ask(**kwargs):
+        return asyncio.run(wrapper.call_llm_api(messages=HISTORY[:1], **kwargs))
+
+    # The router may answer from any provider, so its answers are not keyed to one
+    wrapper.router = object()
+    ask()
+    ask()
+    assert len(calls) == 2
+
+    assert "cached" not in ask(service_api="openai")
+    assert ask(service_api="openai")["cached"] is True
+    assert len(calls) == 3
@@ -0,0 +1,42 @@
+import asyncio
+import types
+
+import anthropic
+import httpx
+import openai
+
+from lib.llm_clients import ClientPool, _httpx_for
+
+def test_clients_are_reused_per_key_and_loop():
+    pool = ClientPool()
+
+    async def lookups():
+        first = pool.openai("key", "http://localhost:1")
+        assert pool.openai("key", "http://localhost:1") is first
+        assert pool.openai("other", "http://localhost:1") is not first
+        assert pool.anthropic("key", "http://localhost:1") is not first
+        return first
+
+    first = asyncio.run(lookups())
+    # A new event loop cannot use connections bound to the old one
+    assert asyncio.run(lookups()) is not first
+
+def test_http_clients_come_from_the_sdks_httpx():
+    for sdk in (openai, anthropic):
+        client_httpx = _httpx_for(sdk)
+        assert issubclass(sdk.DefaultAsyncHttpxClient, client_httpx.AsyncClient)
+
+    # SDKs too old to name their client use httpx itself
+    assert _httpx_for(types.SimpleNamespace()) is httpx
+
+def test_close_releases_the_pooled_clients():
+    pool = ClientPool()
+
+    async def open_and_close():
+        clients = [pool.openai("key", "http://localhost:1"), pool.anthropic("key", "http://localhost:1")]
+        await pool.aclose()
+        return clients
+
+    clients = asyncio.run(open_and_close())
+    assert pool._clients == {}
+    assert all(client._client.is_closed for client in clients)
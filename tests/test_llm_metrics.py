@@ -0,0 +1,76 @@
+import asyncio
+
+from benchmarks.stub_llm_server import start_stub
+from lib import llm_metrics
+from lib.llm_metrics import Histogram, LLMMetrics
+from lib.llm import llm_wrapper
+from lib.llm_clients import close_clients
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    histogram = Histogram((1, 2, 4))
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.counts == [1, 2, 1, 0]
+    assert histogram.quantile(0.5) == 1.5
+    assert histogram.quantile(1.0) == 4
+
+def test_metrics_persist_and_render_prometheus(tmp_path):
+    path = str(tmp_path / "metrics.json")
+    metrics = LLMMetrics(path=path)
+    metrics.record("openai", "gpt-4o", "ok", 0.8, ttft=0.2, usage={"input_tokens": 100, "output_tokens": 20})
+    metrics.record("openai", "gpt-4o", "error", 3.0)
+    metrics.save()
+
+    reloaded = LLMMetrics(path=path)
+    summary = {(s["provider"], s["outcome"]): s for s in reloaded.summary()["series"]}
+    assert summary[("openai", "ok")]["tokens"]["input_tokens"] == 100
+    assert summary[("openai", "ok")]["ttft_seconds"]["count"] == 1
+    assert summary[("openai", "error")]["latency_seconds"]["count"] == 1
+
+    text = reloaded.prometheus()
+    assert 'webwright_llm_request_seconds_bucket{provider="openai",model="gpt-4o",outcome="ok",le="1"} 1' in text
+    assert 'webwright_llm_request_seconds_bucket{provider="openai",model="gpt-4o",outcome="ok",le="+Inf"} 1' in text
+    assert 'webwright_llm_tokens_total{provider="openai",model="gpt-4o",outcome="ok",kind="input"} 100' in text
+
+def test_provider_calls_record_ttft_and_tokens(tmp_path, monkeypatch, make_config):
+    metrics = LLMMetrics(path=str(tmp_path / "metrics.json"))
+    monkeypatch.setattr(llm_metrics, "_metrics", metrics)
+
+    async def main():
+        runner, base_url = await start_stub(token_delay=0.01)
+        try:
+            llm = llm_wrapper(config=make_config({"OLLAMA_API_ENDPOINT": base_url, "OLLAMA_MODEL": "llama3"}))
+            history = [{"id": "q1", "type": "user_query", "content": "hello"}]
+            await llm.call_llm_api(history, tools=None, service_api="ollama", on_text=lambda text: None)
+        finally:
+            await close_clients()
+            await runner.cleanup()
+
+    asyncio.run(main())
+    series = metrics.series[("ollama", "llama3", "ok")]
+    assert series.calls == 1
+    assert series.ttft.count == 1
+    assert series.ttft.total <= series.latency.total
+    assert series.tokens["output_tokens"] > 0
+
+def test_two_shells_add_to_the_same_totals(tmp_path):
+    path = str(tmp_path / "metrics.json")
+    first, second = LLMMetrics(path=path), LLMMetrics(path=path)
+    first.record("openai", "gpt-4o", "ok", 0.5, usage={"input_tokens": 10})
+    second.record("openai", "gpt-4o", "ok", 1.5, usage={"input_tokens": 5})
+    first.save()
+    second.save()
+    # A second save adds nothing already saved
+    first.save()
+
+    series = LLMMetrics(path=path).series[("openai", "gpt-4o", "ok")]
+    assert series.calls == 2
+    assert series.tokens["input_tokens"] == 15
+    assert series.latency.count == 2
+    # Each shell now sees the other's calls too
+    assert second.series[("openai", "gpt-4o", "ok")].calls == 2
+
+    first.reset()
+    assert LLMMetrics(path=path).series == {}
@@ -0,0 +1,147 @@
+import time
+import asyncio
+import pytest
+import aiohttp
+
+from benchmarks.stub_llm_server import start_stub, STATS, FAULTS
+from lib.llm_resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    RetryPolicy,
+    StreamGuard,
+    call_with_resilience,
+)
+
+FAST = RetryPolicy(max_attempts=4, base_delay=0.01, max_delay=0.05, deadline=5)
+
+def run_against_stub(scenario, **stub_options):
+    async def main():
+        runner, base_url = await start_stub(**stub_options)
+        try:
+            async with aiohttp.ClientSession() as session:
+                async def request():
+                    async with session.post(f"{base_url}/api/chat", json={"model": "stub", "messages": []}) as response:
+                        response.raise_for_status()
+                        return await response.json()
+                return await scenario(runner.app, request)
+        finally:
+            await runner.cleanup()
+    return asyncio.run(main())
+
+def test_retries_transient_faults_then_succeeds():
+    async def scenario(app, request):
+        app[FAULTS].extend([(529, None), (503, None)])
+        result = await call_with_resilience("stub", request, FAST, breaker=CircuitBreaker("stub"))
+        return result, app[STATS]["requests"]
+
+    result, requests = run_against_stub(scenario)
+    assert result["done"] is True
+    assert requests == 3
+
+def test_client_errors_are_not_retried():
+    async def scenario(app, request):
+        app[FAULTS].append((400, None))
+        with pytest.raises(aiohttp.ClientResponseError):
+            await call_with_resilience("stub", request, FAST, breaker=CircuitBreaker("stub"))
+        return app[STATS]["requests"]
+
+    assert run_against_stub(scenario) == 1
+
+def test_retry_after_is_honoured():
+    async def scenario(app, request):
+        app[FAULTS].append((429, 0.3))
+        started = time.monotonic()
+        await call_with_resilience("stub", request, FAST, breaker=CircuitBreaker("stub"))
+        return time.monotonic() - started
+
+    assert run_against_stub(scenario) >= 0.3
+
+def test_breaker_opens_and_fails_fast():
+    async def scenario(app, request):
+        breaker = CircuitBreaker("stub", failure_threshold=3, recovery_timeout=60)
+        app[FAULTS].extend([(503, None)] * 10)
+        with pytest.raises(aiohttp.ClientResponseError):
+            await call_with_resilience("stub", request, RetryPolicy(max_attempts=3, base_delay=0.01, deadline=5), breaker=breaker)
+        requests = app[STATS]["requests"]
+        with pytest.raises(CircuitOpenError):
+            await call_with_resilience("stub", request, FAST, breaker=breaker)
+        return requests, app[STATS]["requests"], breaker.state
+
+    before, after, state = run_against_stub(scenario)
+    assert before == 3
+    assert after == before
+    assert state == CircuitBreaker.OPEN
+
+def test_half_open_trial_closes_breaker():
+    async def scenario(app, request):
+        breaker = CircuitBreaker("stub", failure_threshold=1, recovery_timeout=0.1)
+        app[FAULTS].append((503, None))
+        with pytest.raises(aiohttp.ClientResponseError):
+            await call_with_resilience("stub", request, RetryPolicy(max_attempts=1), breaker=breaker)
+        await asyncio.sleep(0.15)
+        await call_with_resilience("stub", request, FAST, breaker=breaker)
+        return breaker.state
+
+    assert run_against_stub(scenario) == CircuitBreaker.CLOSED
+
+def test_deadline_bounds_slow_requests():
+    async def scenario(app, request):
+        breaker = CircuitBreaker("stub")
+        with pytest.raises(DeadlineExceededError):
+            await call_with_resilience("stub", request, RetryPolicy(deadline=0.2), breaker=breaker)
+        # Running out of the caller's time is not held against the provider
+        return breaker.failures
+
+    assert run_against_stub(scenario, latency=1.0) == 0
+
+def test_streams_outlive_the_deadline_until_they_stall():
+    async def main():
+        guard = StreamGuard(lambda text: None)
+        breaker = CircuitBreaker("stub")
+        policy = RetryPolicy(max_attempts=1, deadline=0.1, idle_timeout=0.2)
+
+        async def streaming():
+            for _ in range(6):
+                await asyncio.sleep(0.05)
+                guard.chunk()
+            return "done"
+
+        async def stalling():
+            guard.chunk()
+            await asyncio.sleep(10)
+
+        result = await call_with_resilience("stub", streaming, policy, breaker=breaker, stream=guard)
+        with pytest.raises(asyncio.TimeoutError):
+            await call_with_resilience("stub", stalling, policy, breaker=breaker, stream=guard)
+        return result, breaker.failures
+
+    assert asyncio.run(main()) == ("done", 1)
+
+def test_cancelled_half_open_trial_lets_the_next_call_through():
+    async def main():
+        breaker = CircuitBreaker("stub", failure_threshold=1, recovery_timeout=0.1)
+
+        async def failing():
+            raise ConnectionError("down")
+
+        async def hanging():
+            await asyncio.sleep(10)
+
+        async def working():
+            return "ok"
+
+        with pytest.raises(ConnectionError):
+            await call_with_resilience("stub", failing, RetryPolicy(max_attempts=1), breaker=breaker)
+        await asyncio.sleep(0.15)
+
+        trial = asyncio.ensure_future(call_with_resilience("stub", hanging, FAST, breaker=breaker))
+        await asyncio.sleep(0.05)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        return await call_with_resilience("stub", working, FAST, breaker=breaker), breaker.state
+
+    assert asyncio.run(main()) == ("ok", CircuitBreaker.CLOSED)
@@ -0,0 +1,70 @@
+import time
+import asyncio
+import aiohttp
+
+from benchmarks.stub_llm_server import start_stub, FAULTS
+from lib.llm_router import Router, RouterPolicy
+
+def run_against_stubs(scenario, latencies):
+    """
+    Starts one stub server per provider and hands the scenario a
+    call(provider, model) that returns llm_wrapper-style result dicts.
+    """
+    async def main():
+        stubs = {provider: await start_stub(latency=latency) for provider, latency in latencies.items()}
+        try:
+            async with aiohttp.ClientSession() as session:
+                async def call(provider, model):
+                    runner, base_url = stubs[provider]
+                    try:
+                        async with session.post(f"{base_url}/api/chat", json={"model": model or "stub", "messages": []}) as response:
+                            response.raise_for_status()
+                            body = await response.json()
+                    except aiohttp.ClientResponseError as e:
+                        return {"content": None, "function_calls": [], "error": str(e)}
+                    return {"content": body["message"]["content"], "function_calls": [], "provider": provider}
+                apps = {provider: runner.app for provider, (runner, _) in stubs.items()}
+                return await scenario(apps, call)
+        finally:
+            for runner, _ in stubs.values():
+                await runner.cleanup()
+    return asyncio.run(main())
+
+def test_hedge_returns_first_response_and_cancels_slow_call(tmp_path):
+    router = Router(RouterPolicy([("slow", None), ("fast", None)], hedge_delay=0.05), path=str(tmp_path / "stats.json"))
+
+    async def scenario(apps, call):
+        started = time.monotonic()
+        result = await router.route(call)
+        return result, time.monotonic() - started
+
+    result, elapsed = run_against_stubs(scenario, {"slow": 1.0, "fast": 0.0})
+    assert result["provider"] == "fast"
+    assert elapsed < 0.5
+    # The abandoned call still counts as at least the hedge delay, so "fast" now ranks first
+    assert router.stats["slow"].latency >= 0.05
+    assert router.rank()[0] == ("fast", None)
+
+def test_falls_back_when_provider_errors(tmp_path):
+    router = Router(RouterPolicy([("primary", None), ("backup", None)]), path=str(tmp_path / "stats.json"))
+
+    async def scenario(apps, call):
+        apps["primary"][FAULTS].append((400, None))
+        return await router.route(call)
+
+    result = run_against_stubs(scenario, {"primary": 0.0, "backup": 0.0})
+    assert result["provider"] == "backup"
+    assert router.stats["primary"].errors == 1
+    assert router.stats["primary"].error_rate > 0
+
+def test_stats_persist_and_drive_ranking(tmp_path):
+    path = str(tmp_path / "stats.json")
+    policy = RouterPolicy([("anthropic", None), ("openai", "gpt-4o-mini")])
+    router = Router(policy, path=path)
+    router.stats_for(("anthropic", None)).record(3.0, ok=True)
+    router.stats_for(("openai", "gpt-4o-mini")).record(0.5, ok=True)
+    router.save()
+
+    reloaded = Router(policy, path=path)
+    assert reloaded.stats["openai:gpt-4o-mini"].latency == 0.5
+    assert reloaded.rank() == [("openai", "gpt-4o-mini"), ("anthropic", None)]
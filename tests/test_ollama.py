@@ -0,0 +1,61 @@
+import json
+import asyncio
+
+from benchmarks.stub_llm_server import start_stub
+from lib.llm import llm_wrapper
+from lib.llm_clients import close_clients
+from lib.llm_ollama import ollama_settings, request_body
+from lib.tool_schemas import tool_schemas
+
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "git_status",
+        "description": "Shows the working tree status",
+        "parameters": {"type": "object", "properties": {}, "required": []}
+    }
+}]
+
+def run_ollama(scenario, make_config):
+    async def main():
+        runner, base_url = await start_stub()
+        try:
+            config = make_config({"OLLAMA_API_ENDPOINT": base_url, "OLLAMA_MODEL": "llama3", "OLLAMA_KEEP_ALIVE": "-1"})
+            return await scenario(runner.app, llm_wrapper(service_api="ollama", config=config))
+        finally:
+            await close_clients()
+            await runner.cleanup()
+    return asyncio.run(main())
+
+def test_request_body_splices_compiled_tools():
+    compiled = tool_schemas.compile("ollama", TOOLS)
+    params = {"model": "llama3", "messages": [], "stream": True, **ollama_settings()}
+    assert json.loads(request_body(params, compiled)) == {**params, "tools": TOOLS}
+    assert params["options"]["num_ctx"] == 8192
+
+def test_tool_call_round_trip_streamed(make_config):
+    async def scenario(app, llm):
+        history = [{"id": "q1", "type": "user_query", "content": "what changed?"}]
+        streamed = []
+        first = await llm.call_llm_api(history, tools=TOOLS, service_api="ollama", on_text=streamed.append)
+
+        call = first["function_calls"][0]
+        history += [
+            {"id": "r1", "type": "llm_response", "content": [
+                {"type": "text", "text": ""},
+                {"type": "tool_use", "id": call["id"], "name": call["name"], "input": call["arguments"]},
+            ]},
+            {"id": "t1", "type": "tool_call", "content": [
+                {"type": "tool_result", "tool_call_id": call["id"], "name": call["name"], "output": "clean"},
+            ]},
+        ]
+        second = await llm.call_llm_api(history, tools=TOOLS, service_api="ollama", on_text=streamed.append)
+        return first, second, "".join(streamed)
+
+    first, second, streamed = run_ollama(scenario, make_config)
+    assert first["function_calls"][0]["name"] == "git_status"
+    assert first["function_calls"][0]["id"].startswith("call_")
+    assert first["usage"]["output_tokens"] > 0
+    # With the tool result in the history the model answers in text
+    assert second["function_calls"] == []
+    assert streamed == second["content"] == "Stub reply from the local test server."
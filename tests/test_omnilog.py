@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import time
+import textwrap
+import subprocess
+from datetime import datetime
+
+import chromadb
+import pytest
+
+from lib.omnilog_index import LEGACY_PARTITION
+
+# Chroma newer than the pinned 0.5.5 asks embedding functions for a name()
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning:chromadb")
+
+def entry(n, entry_type="user_query", content=None, day=1):
+    return {"id": f"{entry_type}-{n}", "type": entry_type, "timestamp": f"2024-01-{day:02d}T00:00:{n:02d}",
+            "content": content if content is not None else f"entry {n}"}
+
+def write_legacy_log(path, entries):
+    # The single collection and record format used before partitioning
+    client = chromadb.PersistentClient(path=path, settings=chromadb.config.Settings(anonymized_telemetry=False))
+    collection = client.get_or_create_collection(LEGACY_PARTITION, embedding_function=None)
+    collection.add(
+        ids=[e["id"] for e in entries],
+        documents=[e["content"] for e in entries],
+        embeddings=[[1.0] + [0.0] * 31 for _ in entries],
+        metadatas=[{"timestamp": e["timestamp"], "type": e["type"], "full_entry": json.dumps(e)} for e in entries]
+    )
+
+def test_legacy_entries_stay_in_project_scope(make_olog, tmp_path):
+    write_legacy_log(str(tmp_path / "omnilog"), [entry(0, content="legacy question"), entry(1, "llm_response", "legacy answer")])
+    olog = make_olog(write_behind=False)
+    olog.add_entry(entry(2, content="new question", day=2))
+
+    assert [e["id"] for e in olog.get_recent_entries(10)] == ["user_query-0", "llm_response-1", "user_query-2"]
+    assert [e["id"] for e in olog.get_recent_entries(10, scope="session")] == ["user_query-2"]
+    assert {e["content"] for e in olog.search_by_type("user_query")} == {"legacy question", "new question"}
+    in_range = olog.search_by_date_range(datetime(2024, 1, 1), datetime(2024, 1, 1, 23))
+    assert {e["content"] for e in in_range} == {"legacy question", "legacy answer"}
+
+    hits = olog.search_entries_with_context("legacy", top_k=2, lexical_weight=1)
+    assert {current["content"] for current, _ in hits} == {"legacy question", "legacy answer"}
+
+def test_date_range_is_filtered_by_epoch_a_page_at_a_time(make_olog):
+    olog = make_olog(write_behind=False)
+    for day in range(1, 11):
+        olog.add_entry(entry(day, day=day))
+
+    collection = olog.collection
+    pages = []
+
+    class Recording:
+        def get(self, **kwargs):
+            results = collection.get(**kwargs)
+            pages.append((kwargs["where"], len(results["ids"])))
+            return results
+
+    olog._collections[olog.partition] = Recording()
+    found = olog.search_by_date_range(datetime(2024, 1, 3), datetime(2024, 1, 7, 23), page_size=2)
+    assert sorted(e["content"] for e in found) == [f"entry {n}" for n in range(3, 8)]
+
+    # Chroma filters on the numeric epoch field; only matches are read
+    assert pages[0][0] == {"$and": [
+        {"epoch": {"$gte": datetime(2024, 1, 3).timestamp()}},
+        {"epoch": {"$lte": datetime(2024, 1, 7, 23).timestamp()}}
+    ]}
+    assert [count for _, count in pages] == [2, 2, 1]
+
+def test_entries_without_epochs_are_backfilled_on_open(make_olog):
+    olog = make_olog(write_behind=False)
+    for day in (1, 2):
+        olog.add_entry(entry(day, day=day))
+    # Records as written before the epoch field existed (None deletes a key)
+    ids = olog.collection.get()["ids"]
+    olog.collection.update(ids=ids, metadatas=[{"epoch": None} for _ in ids])
+    assert all("epoch" not in m for m in olog.collection.get(include=["metadatas"])["metadatas"])
+    olog.index.set_meta("epoch_backfilled", "")
+
+    reopened = make_olog(write_behind=False)
+    metadatas = reopened.collection.get(include=["metadatas"])["metadatas"]
+    expected = [datetime.fromisoformat(entry(day, day=day)["timestamp"]).timestamp() for day in (1, 2)]
+    assert sorted(m["epoch"] for m in metadatas) == expected
+    assert reopened.index.get_meta("epoch_backfilled") == "1"
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+def test_queued_entries_are_readable_before_they_are_flushed(make_olog):
+    olog = make_olog(flush_interval=60)
+    olog.add_entry(entry(0, content="queued question"))
+
+    assert olog.collection.count() == 0
+    assert olog.get("user_query-0")["content"] == "queued question"
+    assert [e["id"] for e in olog.get_recent_entries(5)] == ["user_query-0"]
+
+def test_searches_see_queued_entries_without_flushing(make_olog):
+    olog = make_olog(flush_interval=60)
+    olog.add_entry(entry(0, content="where is parse_config defined"))
+    olog.add_entry(entry(1, "llm_response", content="in lib/config.py"))
+
+    assert [e["content"] for e in olog.search_by_type("user_query")] == ["where is parse_config defined"]
+    assert len(list(olog.search_by_date_range(datetime(2024, 1, 1), datetime(2024, 1, 1, 23)))) == 2
+    for weight in (0, 0.5, 1):
+        hits = olog.search_entries_with_context("parse_config", top_k=1, lexical_weight=weight)
+        assert [(hit["content"], adjacent["content"]) for hit, adjacent in hits] == [
+            ("where is parse_config defined", "in lib/config.py")
+        ]
+    assert olog.collection.count() == 0
+
+    olog.flush()
+    olog.add_entry(entry(2, content="and parse_args?"))
+    assert [e["content"] for e in olog.search_by_type("user_query")] == ["where is parse_config defined", "and parse_args?"]
+    assert len(list(olog.search_by_date_range(datetime(2024, 1, 1), datetime(2024, 1, 1, 23)))) == 3
+
+def test_queue_flushes_in_batches_and_on_close(make_olog):
+    olog = make_olog(flush_interval=60, flush_batch_size=3)
+    for n in range(3):
+        olog.add_entry(entry(n))
+    # A full batch wakes the flusher without waiting for the interval
+    wait_for(lambda: olog.collection.count() == 3)
+    assert [len(batch) for batch in olog.embedder.batches] == [3]
+
+    olog.add_entry(entry(3))
+    olog.close()
+    assert olog.collection.count() == 4
+
+def test_queue_is_flushed_when_the_process_exits(tmp_path):
+    script = textwrap.dedent(f"""
+        from lib.embedding import Embedder
+        from lib.omnilog import OmniLogVectorStore
+
+        class Ones(Embedder):
+            name = "ones"
+            def embed(self, texts):
+                return [[1.0, 0.0] for _ in texts]
+
+        olog = OmniLogVectorStore(path={str(tmp_path)!r}, flush_interval=60, embedder=Ones())
+        olog.add_entry({{"id": "q", "type": "user_query", "timestamp": "2024-01-01T00:00:00", "content": "bye"}})
+    """)
+    subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   check=True, capture_output=True, timeout=120)
+
+    client = chromadb.PersistentClient(path=str(tmp_path), settings=chromadb.config.Settings(anonymized_telemetry=False))
+    assert sum(client.get_collection(c.name).count() for c in client.list_collections()) == 1
+
+def test_failed_store_leaves_no_index_row(make_olog, monkeypatch):
+    olog = make_olog(write_behind=False)
+
+    embed = olog.embedder.embed
+    monkeypatch.setattr(olog.embedder, "embed", lambda texts: 1 / 0)
+    with pytest.raises(Exception):
+        olog.add_entry(entry(0))
+    assert olog.index.count() == 0
+
+    monkeypatch.setattr(olog.embedder, "embed", embed)
+    olog.add_entry(entry(0))
+    assert olog.get("user_query-0")["content"] == "entry 0"
+
+def test_compact_records_decode_to_the_entries_written(make_olog):
+    olog = make_olog(write_behind=False, blob_threshold=1000, embedding_text_limit=100)
+    written = [
+        entry(0, content="plain text"),
+        {**entry(1, "tool_call"), "content": [{"tool_call_id": "t1", "output": "ok"}], "id": "tool_call-1", "extra_field": 7},
+        entry(2, "llm_response", content={"answer": 42}),
+        entry(4, content=["a list", "from a user query"]),
+        entry(3, "tool_call", content=[{"tool_call_id": "t2", "output": "z" * 5000}]),
+    ]
+    for item in written:
+        olog.add_entry(item)
+
+    stored = olog.collection.get(ids=["tool_call-3"], include=["documents", "metadatas"])
+    # The large payload lives in a blob; Chroma keeps only the embedding text
+    assert len(stored["documents"][0]) == 100
+    assert stored["metadatas"][0]["blob"] in set(olog.blobs.digests())
+
+    for item in written:
+        decoded = olog.get(item["id"])
+        assert decoded["content"] == item["content"]
+        assert decoded["type"] == item["type"] and decoded["timestamp"] == item["timestamp"]
+    assert olog.get("tool_call-1")["extra_field"] == 7
@@ -0,0 +1,41 @@
+import os
+import pytest
+
+from lib import omnilog_blobs
+from lib.omnilog_blobs import BlobStore
+
+DATA = b"repeated tool output\n" * 1000
+
+def test_zlib_round_trip_and_dedup(tmp_path, monkeypatch):
+    monkeypatch.setattr(omnilog_blobs, "zstandard", None)
+    blobs = BlobStore(str(tmp_path))
+
+    digest = blobs.put(DATA)
+    assert blobs.put(DATA) == digest
+    assert list(blobs.digests()) == [digest]
+    assert blobs.get(digest) == DATA
+    assert os.path.getsize(os.path.join(blobs.path, digest[:2], digest + ".zz")) < len(DATA) // 10
+
+    assert blobs.delete(digest) > 0
+    assert blobs.modified_at(digest) is None
+    with pytest.raises(KeyError):
+        blobs.get(digest)
+
+def test_zstd_round_trip(tmp_path):
+    pytest.importorskip("zstandard")
+    blobs = BlobStore(str(tmp_path))
+
+    digest = blobs.put(DATA)
+    assert os.path.exists(os.path.join(blobs.path, digest[:2], digest + ".zst"))
+    assert blobs.get(digest) == DATA
+
+def test_zstd_blob_without_zstandard_is_an_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(omnilog_blobs, "zstandard", None)
+    blobs = BlobStore(str(tmp_path))
+    digest = "ab" * 32
+    os.makedirs(os.path.join(blobs.path, "ab"))
+    with open(os.path.join(blobs.path, "ab", digest + ".zst"), "wb") as f:
+        f.write(b"\x28\xb5\x2f\xfd")
+
+    with pytest.raises(RuntimeError, match="zstandard"):
+        blobs.get(digest)
@@ -0,0 +1,118 @@
+import pytest
+from lib.omnilog_index import OmniLogIndex
+
+@pytest.fixture
+def index(tmp_path):
+    idx = OmniLogIndex(str(tmp_path))
+    yield idx
+    idx.close()
+
+def test_recent_ids_in_sequence_order(index):
+    for i in range(20):
+        index.add(f"id-{i}", f"2024-01-01T00:00:{i:02d}", "user_query")
+
+    assert index.recent_ids(3) == ["id-17", "id-18", "id-19"]
+    assert index.count() == 20
+
+def test_recent_ids_limit_larger_than_store(index):
+    index.add("a", "2024-01-01T00:00:00", "user_query")
+    index.add("b", "2024-01-01T00:00:01", "llm_response")
+
+    assert index.recent_ids(10) == ["a", "b"]
+    assert index.recent_ids(0) == []
+
+def test_duplicate_id_is_ignored(index):
+    assert index.add("a", "2024-01-01T00:00:00", "user_query") is not None
+    assert index.add("a", "2024-01-01T00:00:00", "user_query") is None
+    assert index.count() == 1
+
+def test_response_pairs_with_preceding_query(index):
+    index.add("q1", "2024-01-01T00:00:00", "user_query")
+    index.add("r1", "2024-01-01T00:00:01", "llm_response")
+    index.add("t1", "2024-01-01T00:00:02", "tool_call")
+    index.add("r2", "2024-01-01T00:00:03", "llm_response")
+
+    pairs = index.pair_ids(["q1", "r1", "t1", "r2"])
+    assert pairs["q1"] == "r1"  # a query keeps its first response
+    assert pairs["r1"] == "q1"
+    assert pairs["t1"] == "r1"
+    assert pairs["r2"] == "q1"
+
+def test_lookups_take_more_ids_than_one_statement_allows(index):
+    ids = [f"id-{i}" for i in range(1200)]
+    for i, entry_id in enumerate(ids):
+        index.add(entry_id, f"2024-01-01T00:00:{i % 60:02d}", "user_query" if i % 2 == 0 else "llm_response")
+    index.set_tokens({entry_id: 3 for entry_id in ids})
+
+    assert len(index.locate(ids)) == 1200
+    assert len(index.pair_ids(ids)) == 1200
+    assert len(index.get_tokens(ids)) == 1200
+    index.delete(ids)
+    assert index.count() == 0
+
+def test_unpaired_entries_are_omitted(index):
+    index.add("q1", "2024-01-01T00:00:00", "user_query")
+
+    assert index.pair_ids(["q1", "missing"]) == {}
+
+def test_recent_ids_scoped_by_partition_and_session(index):
+    index.add("a1", "2024-01-01T00:00:00", "user_query", partition="omnilog-a", session_id="s1")
+    index.add("b1", "2024-01-01T00:00:01", "user_query", partition="omnilog-b", session_id="s1")
+    index.add("a2", "2024-01-01T00:00:02", "user_query", partition="omnilog-a", session_id="s2")
+
+    assert index.recent_ids(10, partition="omnilog-a") == ["a1", "a2"]
+    assert index.recent_ids(10, partition="omnilog-a", session_id="s2") == ["a2"]
+    assert index.recent_ids(10) == ["a1", "b1", "a2"]
+    assert index.locate(["a1", "b1"]) == {"a1": "omnilog-a", "b1": "omnilog-b"}
+    assert sorted(index.partitions()) == ["omnilog-a", "omnilog-b"]
+
+def test_pairs_do_not_cross_partitions(index):
+    index.add("q1", "2024-01-01T00:00:00", "user_query", partition="omnilog-a")
+    index.add("r1", "2024-01-01T00:00:01", "llm_response", partition="omnilog-b")
+
+    assert index.pair_ids(["q1", "r1"]) == {}
+
+def test_pairs_do_not_cross_sessions(index):
+    index.add("q1", "2024-01-01T00:00:00", "user_query", partition="omnilog-a", session_id="s1")
+    index.add("q2", "2024-01-01T00:00:01", "user_query", partition="omnilog-a", session_id="s2")
+    index.add("r1", "2024-01-01T00:00:02", "llm_response", partition="omnilog-a", session_id="s1")
+
+    assert index.pair_ids(["q1", "q2", "r1"]) == {"q1": "r1", "r1": "q1"}
+
+def test_lexical_search_matches_exact_identifiers(index):
+    index.add("a", "2024-01-01T00:00:00", "tool_call", text="Traceback in get_recent_entries: KeyError E1101")
+    index.add("b", "2024-01-01T00:00:01", "tool_call", text="get the recent entries from the log")
+    index.add("c", "2024-01-01T00:00:02", "llm_response", text="nothing relevant here")
+
+    hits = index.lexical_search("get_recent_entries", limit=5)
+    assert [entry_id for entry_id, _ in hits] == ["a"]
+
+    hits = index.lexical_search("E1101 recent", limit=5)
+    assert [entry_id for entry_id, _ in hits][0] == "a"
+    assert {entry_id for entry_id, _ in hits} == {"a", "b"}
+
+def test_lexical_search_respects_partition_and_delete(index):
+    index.add("a", "2024-01-01T00:00:00", "tool_call", partition="omnilog-a", text="cat_file output")
+    index.add("b", "2024-01-01T00:00:01", "tool_call", partition="omnilog-b", text="cat_file output")
+
+    assert [entry_id for entry_id, _ in index.lexical_search("cat_file", partition="omnilog-b")] == ["b"]
+
+    index.delete(["b"])
+    assert index.lexical_search("cat_file", partition="omnilog-b") == []
+
+def test_lexical_search_ignores_punctuation_only_queries(index):
+    index.add("a", "2024-01-01T00:00:00", "tool_call", text="anything")
+
+    assert index.lexical_search("?!") == []
+
+def test_index_persists_across_instances(tmp_path):
+    first = OmniLogIndex(str(tmp_path))
+    first.add("a", "2024-01-01T00:00:00", "user_query")
+    first.close()
+
+    second = OmniLogIndex(str(tmp_path))
+    assert second.recent_ids(5) == ["a"]
+    second.close()
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+
+from lib import omnilog_retention
+from lib.omnilog_retention import RetentionPolicy, select_expired, vacuum
+
+# Chroma newer than the pinned 0.5.5 asks embedding functions for a name()
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning:chromadb")
+
+def entry(n, entry_type="tool_call", content=None, day=1):
+    return {"id": f"{entry_type}-{n}", "type": entry_type, "timestamp": f"2024-01-{day:02d}T00:00:{n:02d}",
+            "content": content if content is not None else f"output {n}"}
+
+@pytest.fixture
+def olog(make_olog, tmp_path, monkeypatch):
+    monkeypatch.setattr(omnilog_retention, "LOG_DIR", str(tmp_path))
+    return make_olog(write_behind=False)
+
+def expired_ids(olog, policy, now=None):
+    return [row[0] for row in select_expired(olog, {"tool_call": policy}, now=now)["tool_call"]]
+
+def test_entry_cap_keeps_the_newest(olog):
+    for n in range(5):
+        olog.add_entry(entry(n))
+
+    assert expired_ids(olog, RetentionPolicy(max_entries=2)) == ["tool_call-2", "tool_call-1", "tool_call-0"]
+
+def test_ttl_removes_only_old_entries(olog):
+    olog.add_entry(entry(0, day=1))
+    olog.add_entry(entry(1, day=20))
+
+    now = datetime(2024, 1, 25).timestamp()
+    assert expired_ids(olog, RetentionPolicy(ttl_days=10), now=now) == ["tool_call-0"]
+
+def test_byte_cap_drops_everything_older_than_the_first_overflow(olog):
+    olog.add_entry(entry(0))
+    olog.add_entry(entry(1, content="x" * 5000))
+    olog.add_entry(entry(2))
+    small = olog.index.entries_by_type("tool_call")[0][3]
+
+    # The large entry overflows; the small one before it goes too
+    assert expired_ids(olog, RetentionPolicy(max_bytes=small + 100)) == ["tool_call-1", "tool_call-0"]
+
+def test_vacuum_removes_expired_entries_and_their_blobs(olog):
+    olog.add_entry(entry(0, content="y" * 50000))
+    for n in range(1, 4):
+        olog.add_entry(entry(n))
+    assert len(list(olog.blobs.digests())) == 1
+
+    dry = vacuum(olog, {"tool_call": RetentionPolicy(max_entries=2)}, dry_run=True)
+    assert dry["removed_total"] == 2
+    assert olog.index.count() == 4
+
+    report = vacuum(olog, {"tool_call": RetentionPolicy(max_entries=2)})
+    assert report["removed_total"] == 2
+    assert report["blobs_removed"] == 1
+    assert report["partitions_rebuilt"] == [olog.partition]
+    assert [e["id"] for e in olog.get_recent_entries(10)] == ["tool_call-2", "tool_call-3"]
+    assert olog.collection.count() == 2
+    # The swap leaves no working collections behind
+    names = {c.name for c in olog.client.list_collections()}
+    assert names == {olog.partition}
+
+def test_interrupted_rebuild_is_restored(olog):
+    olog.add_entry(entry(0))
+    partition = olog.partition
+    # A vacuum that stopped after moving the live collection aside
+    olog.collection.modify(name=f"{partition}-backup")
+    olog._collections.clear()
+
+    vacuum(olog, {"tool_call": RetentionPolicy()})
+    assert [e["id"] for e in olog.get_recent_entries(10)] == ["tool_call-0"]
@@ -0,0 +1,81 @@
+import json
+import asyncio
+import pytest
+
+from lib import spill_store
+from lib.spill_store import SpillStore
+from lib.aifunc import execute_function_by_name
+
+def numbered(count):
+    return "".join(f"line {n}\n" for n in range(1, count + 1))
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SpillStore(str(tmp_path), threshold=1000, head_chars=100, tail_chars=50)
+    monkeypatch.setattr(spill_store, "_spill_store", store)
+    return store
+
+def test_small_results_pass_through_and_large_ones_are_replaced(store):
+    assert store.spill("cat_file", "short") == "short"
+
+    text = numbered(500)
+    stub = json.loads(store.spill("run_python_file", text))
+    assert stub["size"] == {"chars": len(text), "lines": 500, "bytes": len(text)}
+    assert stub["head"].startswith("line 1\n") and stub["head"].endswith("\n")
+    assert stub["tail"].endswith("line 500\n")
+    assert store.read(stub["spilled"]) == text
+
+def test_only_the_largest_fields_are_spilled(store):
+    result = json.dumps({"success": True, "contents": numbered(500), "path": "big.log"})
+    replaced = store.spill("cat_file", result)
+
+    assert len(replaced) <= store.threshold
+    parsed = json.loads(replaced)
+    assert parsed["success"] is True and parsed["path"] == "big.log"
+    assert store.read(parsed["contents"]["spilled"]) == numbered(500)
+
+def test_tool_results_are_spilled_and_read_back(store, tmp_path):
+    path = tmp_path / "big.log"
+    path.write_text(numbered(500))
+
+    result = json.loads(asyncio.run(execute_function_by_name("cat_file", None, None, file_path=str(path))))
+    handle = result["contents"]["spilled"]
+
+    lines = json.loads(asyncio.run(execute_function_by_name("read_spilled_result", None, None, handle=handle, start_line=10, end_line=12)))
+    assert lines["text"] == "line 10\nline 11\nline 12\n"
+    assert lines["total_lines"] == 500
+
+    chars = json.loads(asyncio.run(execute_function_by_name("read_spilled_result", None, None, handle=handle, offset=7, length=6)))
+    assert chars["text"] == "line 2"
+
+    missing = json.loads(asyncio.run(execute_function_by_name("read_spilled_result", None, None, handle="spill:../../etc/passwd")))
+    assert missing["success"] is False
+
+def test_reads_are_capped_at_the_store_threshold(store):
+    handle = json.loads(store.spill("run_python_file", numbered(500)))["spilled"]
+
+    def read(**kwargs):
+        return json.loads(asyncio.run(execute_function_by_name("read_spilled_result", None, None, handle=handle, **kwargs)))
+
+    # The position describes the text returned, not the range asked for
+    lines = read(start_line=1, end_line=400)
+    assert lines["truncated"] is True
+    assert len(lines["text"]) <= store.threshold
+    assert lines["text"].endswith(f"line {lines['end_line']}\n")
+
+    chars = read(offset=0, length=5000)
+    assert chars["truncated"] is True
+    assert chars["length"] == len(chars["text"]) == store.threshold
+
+def test_results_are_truncated_when_the_spill_cannot_be_written(store, tmp_path, monkeypatch):
+    path = tmp_path / "big.log"
+    path.write_text(numbered(500))
+
+    def disk_full(data):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(store.blobs, "put", disk_full)
+
+    result = asyncio.run(execute_function_by_name("cat_file", None, None, file_path=str(path)))
+    assert "spill:" not in result and "error" not in result
+    assert result.startswith('{"success": true') and "chars omitted" in result
+    assert len(result) < store.threshold
@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import asyncio
+import pytest
+
+from lib.function_wrapper import callable_registry
+from lib.tool_executor import ToolExecutor, ToolTimeout, WORKERS_SUPPORTED
+
+pytestmark = pytest.mark.skipif(not WORKERS_SUPPORTED, reason="tool workers need POSIX")
+
+SLEEPER = """
+import os, time
+with open("child.pid", "w") as f:
+    f.write(str(os.getpid()))
+time.sleep(60)
+"""
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed child may linger as a zombie until its parent is reaped
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split()[2] != "Z"
+    except OSError:
+        return True
+
+@pytest.fixture
+def executor():
+    executor = ToolExecutor(workers=1, memory_limit_mb=0)
+    executor.warm()
+    yield executor
+    executor.shutdown()
+
+@pytest.fixture
+def sleeper(tmp_path, monkeypatch):
+    (tmp_path / "sleeper.py").write_text(SLEEPER)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def wait_for_pid(path):
+    for _ in range(100):
+        if path.exists() and path.read_text():
+            return int(path.read_text())
+        time.sleep(0.05)
+    raise AssertionError("child did not start")
+
+def test_runs_in_worker_from_current_directory(executor, tmp_path, monkeypatch):
+    (tmp_path / "notes.txt").write_text("hello")
+    monkeypatch.chdir(tmp_path)
+    worker = executor.idle[0]
+
+    result = json.loads(asyncio.run(executor.run("cat_file", {"file_path": "notes.txt"})))
+    assert result == {"success": True, "contents": "hello"}
+    assert executor.idle == [worker]
+
+def test_calls_beyond_the_pool_wait_for_a_warm_worker(tmp_path, monkeypatch):
+    (tmp_path / "notes.txt").write_text("hello")
+    monkeypatch.chdir(tmp_path)
+    executor = ToolExecutor(workers=2, memory_limit_mb=0)
+    executor.warm()
+    pids = {worker.pid for worker in executor.idle}
+
+    async def stage():
+        return await asyncio.gather(*(executor.run("cat_file", {"file_path": "notes.txt"}) for _ in range(4)))
+
+    try:
+        assert all(json.loads(result)["success"] for result in asyncio.run(stage()))
+        assert {worker.pid for worker in executor.idle} == pids
+    finally:
+        executor.shutdown()
+
+def test_pool_matches_scheduler_concurrency(make_config):
+    executor = ToolExecutor.from_config(make_config({"TOOL_CONCURRENCY": "6"}))
+    assert executor.size == 6
+    assert executor.memory_limit_mb == 0
+
+def test_timeout_kills_worker_and_its_children(executor, sleeper, monkeypatch):
+    monkeypatch.setattr(callable_registry["run_python_file"], "timeout", 1)
+    worker = executor.idle[0]
+
+    started = time.monotonic()
+    with pytest.raises(ToolTimeout, match="within 1s"):
+        asyncio.run(executor.run("run_python_file", {"file_path": "sleeper.py"}))
+    assert time.monotonic() - started < 10
+
+    assert not alive(wait_for_pid(sleeper / "child.pid"))
+    assert executor.idle and executor.idle[0] is not worker
+
+def test_cancel_stops_the_call(executor, sleeper):
+    async def cancel_soon():
+        task = asyncio.ensure_future(executor.run("run_python_file", {"file_path": "sleeper.py"}))
+        child = await asyncio.to_thread(wait_for_pid, sleeper / "child.pid")
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return child
+
+    child = asyncio.run(cancel_soon())
+    assert not alive(child)
+    assert len(executor.idle) == 1
+
+def test_shell_state_tools_stay_in_process(executor):
+    assert not executor.in_process("cat_file")
+    assert executor.in_process("change_working_directory")
+    assert executor.in_process("search")
+    assert ToolExecutor(workers=0).in_process("cat_file")
@@ -0,0 +1,63 @@
+import asyncio
+
+from lib.tool_scheduler import ToolScheduler, is_read_only
+
+READ_ONLY = {"cat_file", "git_status", "get_project_files"}
+
+def calls(*names):
+    return [{"id": f"call_{i}", "name": name, "arguments": {}} for i, name in enumerate(names)]
+
+class Recorder:
+    """
+    Fake executor that records which calls overlap.
+    """
+
+    def __init__(self, delay=0.05, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.running = set()
+        self.max_running = 0
+        self.events = []
+
+    async def __call__(self, call):
+        self.running.add(call["id"])
+        self.max_running = max(self.max_running, len(self.running))
+        self.events.append(("start", call["id"], frozenset(self.running)))
+        await asyncio.sleep(self.delay)
+        self.running.discard(call["id"])
+        if call["name"] in self.fail:
+            raise RuntimeError(f"{call['name']} failed")
+        return f"{call['name']} result"
+
+def test_read_only_calls_run_concurrently_within_limit():
+    recorder = Recorder()
+    scheduler = ToolScheduler(recorder, max_concurrency=2, read_only=READ_ONLY.__contains__)
+    results = asyncio.run(scheduler.run(calls("cat_file", "cat_file", "cat_file", "git_status")))
+
+    assert recorder.max_running == 2
+    assert results == ["cat_file result"] * 3 + ["git_status result"]
+
+def test_mutating_call_is_a_barrier():
+    recorder = Recorder()
+    scheduler = ToolScheduler(recorder, read_only=READ_ONLY.__contains__)
+    function_calls = calls("cat_file", "git_status", "write_code_to_file", "cat_file", "get_project_files")
+
+    assert scheduler.plan(function_calls) == [[0, 1], [2], [3, 4]]
+    asyncio.run(scheduler.run(function_calls))
+    # The write started alone, and nothing started while it ran
+    start_of_write = next(event for event in recorder.events if event[1] == "call_2")
+    assert start_of_write[2] == {"call_2"}
+    assert [event[1] for event in recorder.events].index("call_2") == 2
+
+def test_exceptions_are_returned_in_place():
+    scheduler = ToolScheduler(Recorder(fail={"git_status"}), read_only=READ_ONLY.__contains__)
+    results = asyncio.run(scheduler.run(calls("cat_file", "git_status")))
+
+    assert results[0] == "cat_file result"
+    assert isinstance(results[1], RuntimeError)
+
+def test_registry_markers():
+    assert is_read_only("cat_file")
+    assert is_read_only("get_project_files")
+    assert not is_read_only("change_working_directory")
+    assert not is_read_only("no_such_tool")
@@ -0,0 +1,40 @@
+import json
+from lib import function_wrapper
+from lib.tool_schemas import ToolSchemaCompiler
+
+TOOLS = [
+    {"type": "function", "function": {
+        "name": "cat_file",
+        "description": "Reads a file.",
+        "parameters": {"type": "object", "properties": {"file_path": {"type": "string"}}, "required": ["file_path"]}
+    }},
+    {"type": "function", "function": {
+        "name": "git_status",
+        "description": "Shows git status.",
+        "parameters": {"type": "object", "properties": {}, "required": []}
+    }},
+]
+
+def test_compiled_payload_is_memoized():
+    compiler = ToolSchemaCompiler()
+    first = compiler.compile("anthropic", TOOLS)
+
+    assert compiler.compile("anthropic", TOOLS) is first
+    assert compiler.compile("openai", TOOLS) is not first
+    assert compiler.compile("anthropic", None) is None
+
+def test_anthropic_payload_and_cache_breakpoint():
+    compiled = ToolSchemaCompiler().compile("anthropic", TOOLS, cache_breakpoint=True)
+
+    assert compiled.names == ["cat_file", "git_status"]
+    assert compiled.payload[0]["input_schema"]["required"] == ["file_path"]
+    assert "cache_control" not in compiled.payload[0]
+    assert compiled.payload[-1]["cache_control"] == {"type": "ephemeral"}
+    assert json.loads(compiled.serialized) == compiled.payload
+
+def test_registry_change_recompiles(monkeypatch):
+    compiler = ToolSchemaCompiler()
+    first = compiler.compile("openai", TOOLS)
+    monkeypatch.setattr(function_wrapper, "registry_generation", function_wrapper.registry_generation + 1)
+
+    assert compiler.compile("openai", TOOLS) is not first
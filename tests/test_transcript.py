@@ -0,0 +1,72 @@
+from lib.transcript import Transcript, anthropic_fragment, openai_fragment
+
+def turn(n):
+    return [
+        {"id": f"q{n}", "type": "user_query", "content": f"question {n}"},
+        {"id": f"r{n}", "type": "llm_response", "content": [
+            {"type": "text", "text": "Running"},
+            {"type": "tool_use", "id": f"call_{n}", "name": "git_status", "input": {}},
+        ]},
+        {"id": f"t{n}", "type": "tool_call", "content": [
+            {"type": "tool_result", "tool_call_id": f"call_{n}", "name": "git_status", "output": "clean"},
+        ]},
+    ]
+
+def test_matches_full_conversion_and_only_converts_new_entries():
+    transcript = Transcript(openai_fragment)
+    history = turn(1) + turn(2)
+    messages, pending = transcript.convert(history)
+
+    assert [m["role"] for m in messages] == ["user", "assistant", "tool", "user", "assistant", "tool"]
+    assert pending is None
+    assert transcript.converted == 6
+
+    history += turn(3)
+    extended, _ = transcript.convert(history)
+    assert extended[:6] == messages
+    assert transcript.converted == 9
+
+def test_pending_tool_use_is_returned_until_results_arrive():
+    transcript = Transcript(openai_fragment)
+    messages, pending = transcript.convert(turn(1)[:2])
+
+    assert [m["role"] for m in messages] == ["user"]
+    assert pending["tool_calls"][0]["id"] == "call_1"
+
+    messages, pending = transcript.convert(turn(1))
+    assert [m["role"] for m in messages] == ["user", "assistant", "tool"]
+    assert pending is None
+
+def test_shifted_window_reuses_memoized_entries():
+    transcript = Transcript(openai_fragment)
+    transcript.convert(turn(1) + turn(2))
+    messages, _ = transcript.convert(turn(2))
+
+    assert [m["content"] for m in messages if m["role"] == "user"] == ["question 2"]
+    assert transcript.converted == 6
+
+def test_truncated_copy_is_converted_separately():
+    transcript = Transcript(openai_fragment)
+    entry = {"id": "q1", "type": "user_query", "content": "x" * 100}
+    transcript.convert([entry])
+    messages, _ = transcript.convert([{**entry, "content": "x...", "truncated": True, "truncated_to": 10}])
+
+    assert messages[0]["content"] == "x..."
+
+def batched_turn():
+    history = turn(1)
+    history[1]["content"].append({"type": "tool_use", "id": "call_1b", "name": "git_diff", "input": {}})
+    history[2]["content"].append({"type": "tool_result", "tool_call_id": "call_1b", "name": "git_diff", "output": {"diff": ""}})
+    return history
+
+def test_batched_turn_sends_every_tool_call():
+    messages, _ = Transcript(openai_fragment).convert(batched_turn())
+    assert [call["id"] for call in messages[1]["tool_calls"]] == ["call_1", "call_1b"]
+    assert [m["tool_call_id"] for m in messages[2:]] == ["call_1", "call_1b"]
+
+def test_anthropic_tool_results_are_paired_with_their_tool_uses():
+    messages, _ = Transcript(anthropic_fragment).convert(batched_turn())
+    assert [m["role"] for m in messages] == ["user", "assistant", "user"]
+    assert [block["id"] for block in messages[1]["content"] if block["type"] == "tool_use"] == ["call_1", "call_1b"]
+    assert [block["tool_use_id"] for block in messages[2]["content"]] == ["call_1", "call_1b"]
+    assert all(isinstance(block["content"], str) for block in messages[2]["content"])
@@ -3,6 +3,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import json
+import signal
+import argparse
 import traceback
 import asyncio
 from datetime import datetime
@@ -16,6 +18,12 @@ from prompt_toolkit.clipboard import ClipboardData
 from lib.config import Config
 from lib.util import get_logger, custom_style
 from lib.omnilog import OmniLogVectorStore
+from lib.embedding import create_embedder
+from lib.omnilog_retention import vacuum, load_policies
+from lib.llm_clients import close_clients
+from lib.llm_ollama import ollama_in_use, preload_model
+from lib.llm_metrics import LLMMetrics, save_metrics
+from lib.tool_executor import get_tool_executor, shutdown_tool_executor
 
 try:
     from lib.aifunc import ai
@@ -55,7 +63,11 @@ logger = get_logger()
 config = Config()
 
 # Initialize OmniLogVectorStore
-chat_log = OmniLogVectorStore(os.path.join(webwright_dir, 'chat_log_vector_store.json'))
+chat_log = OmniLogVectorStore(
+    os.path.join(webwright_dir, 'chat_log_vector_store.json'),
+    embedder=create_embedder(config.get_config_value("config", "OMNILOG_EMBEDDER")),
+    lexical_weight=float(config.get_config_value("config", "OMNILOG_LEXICAL_WEIGHT") or 0.5)
+)
 
 # User
 username = config.get_username()
@@ -112,9 +124,48 @@ async def process_shell_query(username, query, config, chat_log):
         print_formatted_text(FormattedText([('class:error', traceback.format_exc())]), style=custom_style)
         return False
 
+async def run_query(username, query, config, chat_log):
+    """
+    Runs one query as a task that Ctrl-C cancels, killing any tool it is
+    waiting on, while the shell keeps running.
+    """
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(process_shell_query(username, query, config, chat_log))
+    interrupted = []
+
+    def interrupt():
+        interrupted.append(True)
+        task.cancel()
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, interrupt)
+    except (NotImplementedError, RuntimeError):
+        # No signal handlers on Windows event loops; Ctrl-C ends the shell there
+        pass
+
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if not interrupted:
+            raise
+        print_formatted_text(FormattedText([('class:error', "system> Cancelled.")]), style=custom_style)
+        return False
+    finally:
+        try:
+            loop.remove_signal_handler(signal.SIGINT)
+        except (NotImplementedError, RuntimeError):
+            pass
+
 async def main(config):
     username = config.get_username()
 
+    if ollama_in_use(config):
+        # Load the local model while the user types the first question
+        asyncio.ensure_future(preload_model(config))
+
+    # Start the tool worker processes while the user types
+    get_tool_executor(config).warm()
+
     while True:
         try:
             # Reload the configuration at the start of each loop
@@ -128,6 +179,8 @@ async def main(config):
                 model_to_use = config.get_config_value("config", "OPENAI_MODEL")
             elif api_to_use == "anthropic":
                 model_to_use = config.get_config_value("config", "ANTHROPIC_MODEL")
+            elif api_to_use == "ollama":
+                model_to_use = config.get_config_value("config", "OLLAMA_MODEL")
             else:
                 api_to_use = "unknown"
                 model_to_use = "unknown"
@@ -147,7 +200,7 @@ async def main(config):
                 print("system> Bye!")
                 return
             
-            success = await process_shell_query(username, question, config, chat_log)
+            success = await run_query(username, question, config, chat_log)
             
         except Exception as e:
             print_formatted_text(FormattedText([('class:error', f"system> Error: {str(e)}")]), style=custom_style)
@@ -155,8 +208,43 @@ async def main(config):
             logger.error(traceback.format_exc())
             return
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="webwright", description="Webwright: The Ghost in Your Shell")
+    subparsers = parser.add_subparsers(dest="command")
+
+    vacuum_parser = subparsers.add_parser("vacuum", help="Apply OmniLog retention limits and rebuild its indexes")
+    vacuum_parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without changing anything")
+
+    stats_parser = subparsers.add_parser("stats", help="Show LLM call latency, time to first token and token counts")
+    stats_parser.add_argument("--format", choices=["json", "prometheus"], default="json", help="Output format (default: json)")
+    stats_parser.add_argument("--reset", action="store_true", help="Clear the recorded metrics after printing them")
+
+    return parser.parse_args(argv)
+
+def run_vacuum(config, dry_run=False):
+    report = vacuum(chat_log, load_policies(config), dry_run=dry_run)
+    chat_log.close()
+    print(json.dumps(report, indent=2))
+
+def run_stats(output_format="json", reset=False):
+    metrics = LLMMetrics()
+    if output_format == "prometheus":
+        print(metrics.prometheus(), end="")
+    else:
+        print(json.dumps(metrics.summary(), indent=2))
+    if reset:
+        metrics.reset()
+
 def entry_point():
+    args = parse_args()
     config = Config()
+
+    if args.command == "vacuum":
+        run_vacuum(config, dry_run=args.dry_run)
+        return
+    if args.command == "stats":
+        run_stats(args.format, reset=args.reset)
+        return
     api_to_use, openai_token, anthropic_token, model_to_use = config.determine_api_to_use()
 
     if api_to_use is None:
@@ -188,8 +276,15 @@ def entry_point():
             task.cancel()
         
         loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        # Close pooled LLM connections while their loop is still running
+        loop.run_until_complete(close_clients())
+        save_metrics()
+        shutdown_tool_executor()
         loop.run_until_complete(loop.shutdown_asyncgens())
         loop.close()
+
+        # Write any queued OmniLog entries before exiting
+        chat_log.close()
         print_formatted_text(FormattedText([('class:success', "system> Shutdown complete.")]), style=custom_style)
 
 if __name__ == "__main__":